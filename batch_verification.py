@@ -0,0 +1,133 @@
+from app.models import RegistryVersion
+from app.upload_stream import HashingSpooledFile
+from app import db
+from collections import deque
+from flask import current_app
+from concurrent.futures import Future, ThreadPoolExecutor
+from werkzeug.utils import secure_filename
+import zipfile
+import os
+
+def open_archive(stream, max_files=1000, max_bytes=1024 * 1024 * 1024):
+    """Open a ZIP upload and check its limits, returning the archive and its certificate members"""
+    archive = zipfile.ZipFile(stream)
+    members = [member for member in archive.infolist()
+               if not member.is_dir()
+               and not member.filename.startswith('__MACOSX/')
+               and secure_filename(os.path.basename(member.filename))]
+    
+    # Refuse archives that unpack to more than we are willing to verify
+    if len(members) > max_files or sum(member.file_size for member in members) > max_bytes:
+        archive.close()
+        raise ValueError(f"Archive exceeds the limit of {max_files} files or {max_bytes} bytes")
+    
+    return archive, members
+
+def iter_archive(archive, members, spool_size=4 * 1024 * 1024):
+    """Yield (filename, buffer) pairs, decompressing one member at a time into a hashing buffer"""
+    with archive:
+        for member in members:
+            buffer = HashingSpooledFile(spool_size)
+            with archive.open(member) as source:
+                for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                    buffer.write(chunk)
+            buffer.seek(0)
+            yield secure_filename(os.path.basename(member.filename)), buffer
+
+class BatchVerifier:
+    """Verifies many files with one verifier and one database session.
+    
+    OCR for upcoming files runs in a thread pool while the current file is matched
+    in the calling thread, and logs are written in batches of ``batch_size``.
+    Results are yielded in input order.
+    """
+    
+    def __init__(self, verifier=None, ocr_threads=4, batch_size=50, is_allowed=None):
+        if verifier is None:
+            from app.verification_engine import get_verifier
+            verifier = get_verifier()
+        self.verifier = verifier
+        self.ocr_threads = ocr_threads
+        self.batch_size = batch_size
+        self.is_allowed = is_allowed
+    
+    def verify(self, files, ip_address=None, user_agent=None):
+        """Verify (filename, source) pairs, yielding each response with its filename.
+        
+        A source is a file path or a binary file object; ``files`` may be a lazy iterator.
+        """
+        registry_version = RegistryVersion.current()
+        self.verifier.sync_registry(registry_version)
+        pending = deque()
+        unwritten = []
+        
+        with ThreadPoolExecutor(max_workers=self.ocr_threads, thread_name_prefix='batch-ocr') as executor:
+            for filename, source in files:
+                pending.append(self._start(executor, filename, source, registry_version))
+                
+                # Keep every OCR thread busy, but never run further ahead than that
+                while len(pending) > self.ocr_threads:
+                    unwritten.append(self._finish(pending.popleft(), registry_version))
+                    if len(unwritten) >= self.batch_size:
+                        yield from self._write(unwritten, registry_version, ip_address, user_agent)
+                        unwritten = []
+            
+            while pending:
+                unwritten.append(self._finish(pending.popleft(), registry_version))
+            yield from self._write(unwritten, registry_version, ip_address, user_agent)
+    
+    def _start(self, executor, filename, source, registry_version):
+        if self.is_allowed is not None and not self.is_allowed(filename):
+            return filename, None, {'status': 'ERROR', 'message': 'Invalid file type'}
+        
+        # Buffers filled by UploadRequest or iter_archive were hashed as they were written
+        file_hash = getattr(source, 'file_hash', None) or self.verifier.processor.hash_source(source)
+        
+        if self.verifier.cache is not None:
+            cached = self.verifier.cache.get(file_hash, registry_version, self.verifier.result_from_log)
+            if cached is not None:
+                return filename, file_hash, dict(cached, cache_hit=True)
+        
+        future = executor.submit(self.verifier.processor.process_document, source, filename, file_hash)
+        return filename, file_hash, future
+    
+    def _finish(self, started, registry_version):
+        filename, file_hash, outcome = started
+        if not isinstance(outcome, Future):
+            return filename, file_hash, outcome
+        
+        try:
+            result = self.verifier.evaluate_document(outcome.result())
+        except Exception as e:
+            db.session.rollback()
+            result = {'status': 'ERROR', 'message': 'Unexpected error during verification', 'error': str(e)}
+        
+        if self.verifier.cache is not None and result['status'] != 'ERROR':
+            self.verifier.cache.put(file_hash, registry_version, result)
+        
+        return filename, file_hash, dict(result, cache_hit=False)
+    
+    def _write(self, finished, registry_version, ip_address, user_agent):
+        # Rejected files were never hashed and get no log entry
+        hashed = [(filename, file_hash, result) for filename, file_hash, result in finished if file_hash is not None]
+        try:
+            # Earlier uploads are looked up for the whole write batch before it is recorded
+            answers = self.verifier.with_submissions_batch([(result, file_hash) for _, file_hash, result in hashed])
+            entries = [(result, filename, file_hash, registry_version)
+                       for (filename, file_hash, _), result in zip(hashed, answers)]
+            recorded = iter(self.verifier.record_results(entries, ip_address, user_agent) if entries else [])
+            error = None
+        except Exception as e:
+            # A verdict without its log is not a verification, so these files are reported as errors
+            db.session.rollback()
+            current_app.logger.exception("Error writing verification logs for %d files", len(hashed))
+            recorded, error = None, e
+        
+        for filename, file_hash, result in finished:
+            if file_hash is not None:
+                if recorded is not None:
+                    result = next(recorded)
+                else:
+                    result = {'status': 'ERROR', 'message': 'Failed to record verification', 'error': str(error),
+                              'cache_hit': result.get('cache_hit', False)}
+            yield dict(result, filename=filename)
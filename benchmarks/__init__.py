@@ -0,0 +1 @@
+"""Offline benchmarks for the verification pipeline (run with ``python -m benchmarks.<name>``)"""
@@ -0,0 +1,142 @@
+"""
+Recall of the candidate lookup against scoring the whole registry
+
+Every document is matched twice: through find_matching_certificates, which only scores
+the candidate blocks, and by scoring every certificate in the registry as the verifier
+did before candidates were blocked, with the trigram name index on and off. Name-only
+documents are included since their blocks are the largest. Differences in the best
+score and the status are reported; the run fails when one involves a full-scan match
+scoring at least the verifier's minimum confidence, i.e. one that could be accepted.
+Below that, only OCR errors in every name word escape the blocks, and both lookups
+reject the document.
+
+Two kinds of documents only reach a partial match, read with course and year, and
+each must get exactly the full scan's status and score: certificate numbers with an
+OCR error in their series (RV/2023/BSC/001234 for RU/2023/BSC/001234), without name or
+roll number, and registry names read within a longer name ("Rahul Kumar" in "Rahul
+Kumar Sharma S/O ..."), without certificate or roll number.
+    
+    python -m benchmarks.candidate_recall [--certificates 20000] [--documents 300]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import date
+
+import numpy as np
+
+from benchmarks.scoring import extracted_document, seed_registry
+
+PLACES = ['Ranchi', 'Dhanbad', 'Jamshedpur', 'Bokaro Steel City', 'Hazaribagh', 'Deoghar']
+
+SERIES_TYPO = {'certificate_number': 'RU/2023/BSC/001234', 'student_name': 'Anjali Oraon',
+               'roll_number': 'RU23BSC001234', 'course': 'Bachelor of Science in Computer Science', 'year': 2023}
+
+def full_scan_matches(verifier, extracted, certificates):
+    """find_matching_certificates over every certificate instead of the candidate blocks"""
+    scores, details = verifier.score_certificates(extracted, certificates, minimum_score=30)
+    keep = np.nonzero(scores >= 30)[0]
+    order = keep[np.argsort(-scores[keep], kind='stable')]
+    return [{'certificate': certificates[index], 'match_score': int(scores[index]), 'match_details': details[index]}
+            for index in order]
+
+def series_typo(rng, number):
+    """A certificate number with one character of its series misread"""
+    from app.match_keys import series_end
+    
+    position = rng.choice([index for index in range(series_end(number)) if number[index] not in '/-'])
+    replacement = rng.choice([char for char in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789' if char != number[position]])
+    return number[:position] + replacement + number[position + 1:]
+
+def seed_series_typo(db):
+    """The registry certificate of the reviewed series typo case, next to the synthetic ones"""
+    from app.models import Certificate
+    
+    fields = SERIES_TYPO
+    certificate = Certificate(certificate_number=fields['certificate_number'], student_name=fields['student_name'],
+                              student_roll_number=fields['roll_number'], course_name=fields['course'],
+                              degree_type='Bachelor', passing_year=fields['year'], issue_date=date(2023, 6, 1),
+                              institution_id=1)
+    db.session.add(certificate)
+    db.session.commit()
+    return certificate
+
+def outcome(verifier, extracted, matches):
+    best_match = matches[0] if matches else None
+    flags = verifier.detect_anomalies(extracted, best_match)
+    status, _ = verifier.calculate_verification_status(matches, flags, [])
+    return status, best_match['match_score'] if best_match else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--certificates', type=int, default=20000)
+    parser.add_argument('--documents', type=int, default=300)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        os.environ['SCHEMA_AUTO_UPGRADE'] = 'true'
+        os.environ['VERIFICATION_CACHE_ENABLED'] = 'false'
+        from app import create_app, db
+        from app.verification_engine import CertificateVerifier
+        
+        app = create_app(warm_up=False)
+        with app.app_context():
+            rng = random.Random(31)
+            certificates = seed_registry(db, args.certificates, rng)
+            documents = [extracted_document(rng, certificates) for _ in range(args.documents)]
+            for document in documents[:args.documents // 2]:
+                for field in ('certificate_number', 'roll_number'):
+                    document.pop(field, None)
+            certificates.append(seed_series_typo(db))
+            typos = [{'certificate_number': 'RV/2023/BSC/001234', 'course': SERIES_TYPO['course'], 'year': '2023'}]
+            for certificate in rng.sample(certificates, args.documents // 10):
+                typos.append({'certificate_number': series_typo(rng, certificate.certificate_number),
+                              'course': certificate.course_name, 'year': str(certificate.passing_year)})
+            within = []
+            for certificate in rng.sample(certificates, args.documents // 10):
+                father, place = rng.choice(certificates).student_name, rng.choice(PLACES)
+                within.append({'student_name': f"{certificate.student_name} S/O {father} R/O {place}",
+                               'course': certificate.course_name, 'year': str(certificate.passing_year)})
+            partial = [('series typos', typos), ('names within longer names', within)]
+            
+            verifier = CertificateVerifier()
+            expected = [outcome(verifier, extracted, full_scan_matches(verifier, extracted, certificates))
+                        for extracted in documents]
+            partial_expected = [[outcome(verifier, extracted, full_scan_matches(verifier, extracted, certificates))
+                                 for extracted in cases] for _, cases in partial]
+            
+            failures = 0
+            for name_index in (True, False):
+                app.config['NAME_INDEX_ENABLED'] = name_index
+                scores = statuses = acceptable = 0
+                for extracted, want in zip(documents, expected):
+                    got = outcome(verifier, extracted, verifier.find_matching_certificates(extracted))
+                    scores += got[1] != want[1]
+                    statuses += got[0] != want[0]
+                    if got != want and (want[1] or 0) >= verifier.minimum_confidence:
+                        acceptable += 1
+                        print(f"    missed: {extracted} (full scan {want}, candidates {got})")
+                print(f"name index {'on ' if name_index else 'off'}  of {len(documents)} documents, "
+                      f"{scores} differ in best score, {statuses} in status, {acceptable} with an acceptable match")
+                failures += acceptable
+                
+                for (label, cases), expected_cases in zip(partial, partial_expected):
+                    missed = 0
+                    for extracted, want in zip(cases, expected_cases):
+                        got = outcome(verifier, extracted, verifier.find_matching_certificates(extracted))
+                        if got != want:
+                            missed += 1
+                            print(f"    missed: {extracted} (full scan {want}, candidates {got})")
+                    print(f"name index {'on ' if name_index else 'off'}  of {len(cases)} {label}, {missed} differ")
+                    failures += missed
+            
+            if failures:
+                print("FAIL: the candidate lookup missed certificates a full scan would match")
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
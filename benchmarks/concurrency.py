@@ -0,0 +1,107 @@
+"""
+Parallel uploads against a dashboard poller, per SQLite journal configuration
+
+Upload threads post documents to /upload (OCR replaced by each document's fields) while
+a poller keeps reading /api/stats through the read-only engine. Reports upload
+throughput, latency percentiles for both sides and failed requests, such as
+"database is locked" errors.
+    
+    python -m benchmarks.concurrency [--uploaders 8] [--uploads 40] [--certificates 2000]
+        [--modes DELETE:FULL WAL:NORMAL]
+"""
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.scoring import extracted_document, seed_registry
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def run(directory, journal_mode, synchronous, args):
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, f'{journal_mode}-{synchronous}.db')}"
+    os.environ['SCHEMA_AUTO_UPGRADE'] = 'true'
+    os.environ['DATABASE_READ_URL'] = os.environ['DATABASE_URL']
+    os.environ['SQLITE_JOURNAL_MODE'] = journal_mode
+    os.environ['SQLITE_SYNCHRONOUS'] = synchronous
+    os.environ['VERIFICATION_CACHE_ENABLED'] = 'false'
+    from app import create_app, db
+    from app.ocr_utils import DocumentProcessor
+    
+    app = create_app(warm_up=False)
+    with app.app_context():
+        rng = random.Random(15)
+        certificates = seed_registry(db, args.certificates, rng)
+        documents = [extracted_document(rng, certificates) for _ in range(args.uploaders * args.uploads)]
+    
+    # Each upload's bytes name the document whose fields "OCR" returns
+    def process_document(self, source, filename, file_hash=None):
+        return {'extracted_data': documents[int(source.read())], 'forgery_flags': []}
+    DocumentProcessor.process_document = process_document
+    
+    upload_times, poll_times, failures = [], [], []
+    done = threading.Event()
+    
+    def upload(worker):
+        client = app.test_client()
+        for serial in range(worker * args.uploads, (worker + 1) * args.uploads):
+            started = time.perf_counter()
+            response = client.post('/upload', data={
+                'certificate': (io.BytesIO(str(serial).encode()), f'{serial}.png')})
+            upload_times.append(time.perf_counter() - started)
+            if response.status_code != 200 or response.json.get('status') in ('ERROR', 'error'):
+                failures.append(response.json.get('error') or response.json.get('message'))
+    
+    def poll():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            response = client.get('/api/stats')
+            poll_times.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                failures.append(f'/api/stats returned {response.status_code}')
+    
+    poller = threading.Thread(target=poll)
+    uploaders = [threading.Thread(target=upload, args=(worker,)) for worker in range(args.uploaders)]
+    started = time.perf_counter()
+    poller.start()
+    for thread in uploaders:
+        thread.start()
+    for thread in uploaders:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    poller.join()
+    
+    label = f"{journal_mode}/{synchronous}"
+    print(f"{label:<14} {len(upload_times) / elapsed:7.1f} uploads/s  "
+          f"upload p50 {percentile(upload_times, 0.5) * 1000:7.1f} ms  p95 {percentile(upload_times, 0.95) * 1000:7.1f} ms  "
+          f"stats p50 {percentile(poll_times, 0.5) * 1000:6.1f} ms  p95 {percentile(poll_times, 0.95) * 1000:6.1f} ms  "
+          f"({len(poll_times)} polls)  failed {len(failures)}")
+    for message in sorted(set(map(str, failures)))[:3]:
+        print(f"{'':<14} {message}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uploaders', type=int, default=8)
+    parser.add_argument('--uploads', type=int, default=40, help='uploads per uploader')
+    parser.add_argument('--certificates', type=int, default=2000)
+    parser.add_argument('--modes', nargs='+', default=['DELETE:FULL', 'WAL:NORMAL'],
+                        help='journal_mode:synchronous pairs to compare')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in args.modes:
+            journal_mode, synchronous = mode.upper().split(':')
+            run(directory, journal_mode, synchronous, args)
+
+if __name__ == '__main__':
+    main()
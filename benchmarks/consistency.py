@@ -0,0 +1,112 @@
+"""
+Consistency of verification answers across the in-memory caches
+
+Runs scenarios where a stale cache would change an answer and exits non-zero when one
+does. OCR is replaced by fixed fields, so each scenario takes well under a second.
+
+- deactivated institution: a certificate verifies VALID, its institution is deactivated
+  by another process (no local invalidation), and the same file is verified again
+  inside INSTITUTION_CACHE_CHECK_INTERVAL and once more from the result cache.
+- batch duplicates: a certificate is uploaded once, then a batch re-submits that file and
+  another presenting its number with a different student name; the batch answers must
+  carry the same submissions and CERT_NUMBER_NAME_CONFLICT as single uploads do.
+    
+    python -m benchmarks.consistency
+"""
+
+import io
+import os
+import sys
+import tempfile
+from datetime import date
+
+FIELDS = {
+    'certificate_number': 'RU/2020/BSC/000001',
+    'student_name': 'Priya Tirkey',
+    'roll_number': 'RU20BSC000001',
+    'course': 'Bachelor of Science',
+    'year': '2020'
+}
+
+def seed(db):
+    from app.models import Certificate, Institution
+    
+    institution = Institution(name='Ranchi University', code='RU', type='University')
+    db.session.add(institution)
+    db.session.flush()
+    db.session.add(Certificate(certificate_number=FIELDS['certificate_number'], student_name=FIELDS['student_name'],
+                               student_roll_number=FIELDS['roll_number'], course_name=FIELDS['course'],
+                               degree_type='Bachelor', passing_year=int(FIELDS['year']),
+                               issue_date=date(2020, 6, 1), institution_id=institution.id))
+    db.session.commit()
+    return institution
+
+def verify(verifier, content, fields=FIELDS):
+    verifier.processor.process_document = lambda source, filename, file_hash=None: {
+        'extracted_data': dict(fields), 'forgery_flags': []}
+    return verifier.verify_certificate(io.BytesIO(content), 'certificate.png', ip_address='192.0.2.1')
+
+def deactivated_institution(app, db, verifier):
+    from app.models import Institution, bump_registry_version
+    
+    institution = seed(db)
+    answers = [verify(verifier, b'deactivated institution')]
+    
+    # As another process would: the registry version moves, this process is not told
+    db.session.query(Institution).filter_by(id=institution.id).update({'is_active': False})
+    bump_registry_version(db.session.connection())
+    bump_registry_version(db.session.connection(), 'institutions')
+    db.session.commit()
+    
+    answers.append(verify(verifier, b'deactivated institution'))
+    answers.append(verify(verifier, b'deactivated institution'))
+    
+    got = [(answer['status'], 'INACTIVE_INSTITUTION' in answer['flags'], answer['cache_hit']) for answer in answers]
+    want = [('VALID', False, False), ('INVALID', True, False), ('INVALID', True, True)]
+    return got == want, f"(status, inactive flag, cache hit) {got}, expected {want}"
+
+def batch_duplicates(app, db, verifier):
+    from app.batch_verification import BatchVerifier
+    
+    seed(db)
+    impostor = dict(FIELDS, student_name='Rahul Mehta')
+    verify(verifier, b'original upload')
+    
+    documents = {'original.png': FIELDS, 'impostor.png': impostor}
+    verifier.processor.process_document = lambda source, filename, file_hash=None: {
+        'extracted_data': dict(documents[filename]), 'forgery_flags': []}
+    batch = BatchVerifier(verifier, ocr_threads=1)
+    answers = list(batch.verify([('original.png', io.BytesIO(b'original upload')),
+                                 ('impostor.png', io.BytesIO(b'impostor upload'))], ip_address='192.0.2.2'))
+    answers.append(verify(verifier, b'impostor upload', impostor))
+    
+    got = [(answer.get('submissions', {}).get('seen_count'), 'CERT_NUMBER_NAME_CONFLICT' in answer['flags'],
+            [claim['student_name'] for claim in answer.get('conflicting_names', [])]) for answer in answers]
+    want = [(1, False, []), (0, True, [FIELDS['student_name']]), (1, True, [FIELDS['student_name']])]
+    return got == want, f"(earlier uploads, conflict flag, conflicting names) {got}, expected {want}"
+
+SCENARIOS = [('deactivated institution', deactivated_institution), ('batch duplicates', batch_duplicates)]
+
+def main():
+    failures = 0
+    for name, scenario in SCENARIOS:
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+            os.environ['SCHEMA_AUTO_UPGRADE'] = 'true'
+            from app import create_app, db
+            from app.verification_engine import CertificateVerifier
+            
+            app = create_app(warm_up=False)
+            app.config['INSTITUTION_CACHE_CHECK_INTERVAL'] = 60
+            with app.app_context():
+                passed, detail = scenario(app, db, CertificateVerifier())
+                db.session.remove()
+                db.engine.dispose()
+        
+        print(f"{'ok  ' if passed else 'FAIL'} {name}: {detail}")
+        failures += not passed
+    
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Dashboard statistics from the counters table against COUNT(*) over verification_logs
+    
+    python -m benchmarks.dashboard_stats [--logs 1000000] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+def seed_logs(db, count, rng):
+    from app.models import VerificationLog
+    
+    statuses = ['VALID', 'VALID', 'VALID', 'INVALID', 'SUSPICIOUS', 'ERROR']
+    started = datetime.utcnow() - timedelta(days=365)
+    table = VerificationLog.__table__
+    for offset in range(0, count, 50000):
+        rows = [{
+            'uploaded_filename': f'certificate_{offset + i}.png',
+            'verification_status': rng.choice(statuses),
+            'confidence_score': 0.0,
+            'created_at': started + timedelta(seconds=rng.randint(0, 365 * 86400)),
+        } for i in range(min(50000, count - offset))]
+        db.session.execute(table.insert(), rows)
+    db.session.commit()
+
+def counting_stats():
+    """The dashboard's previous per-status COUNT(*) queries"""
+    from app.models import Institution, VerificationLog
+    
+    return {
+        'total_verifications': VerificationLog.query.count(),
+        'valid_count': VerificationLog.query.filter_by(verification_status='VALID').count(),
+        'invalid_count': VerificationLog.query.filter_by(verification_status='INVALID').count(),
+        'suspicious_count': VerificationLog.query.filter_by(verification_status='SUSPICIOUS').count(),
+        'total_institutions': Institution.query.count(),
+        'active_institutions': Institution.query.filter_by(is_active=True).count()
+    }
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, sorted(samples)[len(samples) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logs', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        os.environ['SCHEMA_AUTO_UPGRADE'] = 'true'
+        from app import create_app, db
+        from app.stats import read_stats, rebuild_counters
+        
+        app = create_app(warm_up=False)
+        with app.app_context():
+            seed_logs(db, args.logs, random.Random(3))
+            
+            started = time.perf_counter()
+            rebuild_counters()
+            print(f"backfill of {args.logs:,} logs: {time.perf_counter() - started:.2f}s")
+            
+            counted, counting_ms = timed(counting_stats, args.repeat)
+            stored, counters_ms = timed(read_stats, args.repeat)
+            assert all(stored[key] == value for key, value in counted.items()), (stored, counted)
+            
+            print(f"COUNT(*) queries: {counting_ms:8.2f}ms")
+            print(f"counters table:   {counters_ms:8.2f}ms  ({counting_ms / counters_ms:.0f}x faster)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""
+End-to-end verification benchmark on a synthetic registry
+
+Builds a registry of N institutions and M certificates, renders certificate scans (PNG
+and image-only PDF) of genuine, degraded and forged variants, then verifies every
+document through CertificateVerifier.verify_certificate and/or the /upload route.
+Reports throughput, p50/p95/p99 latency, mean time per stage, memory and accuracy
+(forged documents must not come out VALID, genuine ones must).
+
+Everything is seeded, so runs on the same machine are comparable across commits: save
+one with --json and compare a later run against it with --compare.
+
+Without a tesseract binary (or with --ocr simulated) OCR returns the printed text of
+each document, with character noise for degraded scans; image decoding and
+preprocessing still run, but OCR time is not measured.
+    
+    python -m benchmarks.end_to_end [--institutions 12] [--certificates 50000]
+        [--documents 300] [--driver verifier|upload|both] [--format png|pdf|mixed]
+        [--ocr auto|tesseract|simulated] [--dpi 200] [--seed 22]
+        [--json results.json] [--compare baseline.json]
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+
+from benchmarks.synthetic import (VARIANTS, certificate_lines, certificate_variant, degrade_image, institutions,
+                                  ocr_noise, registry_ledger, render_certificate_image)
+
+class SimulatedOCR:
+    """Stands in for pytesseract.image_to_string, returning the text of the document being verified"""
+    
+    def __init__(self):
+        self.local = threading.local()
+    
+    def __call__(self, image, config='', timeout=0, **kwargs):
+        return getattr(self.local, 'text', '')
+    
+    def document(self, text):
+        self.local.text = text
+
+def tesseract_available():
+    import pytesseract
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def seed_registry(db, institution_count, certificate_count, rng):
+    """Registry rows by certificate number, loaded through the bulk registry import"""
+    from app.models import Institution
+    from app.registry_import import import_certificates
+    
+    chosen = institutions(institution_count)
+    db.session.add_all([Institution(name=name, code=code, type=kind) for name, code, kind in chosen])
+    db.session.commit()
+    
+    rows = [row for _, row in registry_ledger(rng, [code for _, code, _ in chosen], certificate_count)]
+    report = import_certificates(enumerate(rows, 2))
+    if report.errors:
+        raise RuntimeError(f"Registry import rejected {len(report.errors)} rows: {report.errors[:3]}")
+    return rows, {code: name for name, code, _ in chosen}
+
+def build_documents(rng, rows, institution_names, count, file_format, dpi):
+    """(filename, file bytes, printed text, variant, expected VALID) for ``count`` documents"""
+    variants = list(VARIANTS)
+    documents = []
+    for serial in range(count):
+        variant = variants[serial % len(variants)]
+        row, other_row = rng.choice(rows), rng.choice(rows)
+        fields = certificate_variant(rng, row, other_row, variant)
+        institution_name = ('Jharkhand International University' if variant == 'fabricated'
+                            else institution_names[row['institution_code']])
+        
+        image = render_certificate_image(fields, institution_name, dpi=dpi)
+        text = '\n'.join(certificate_lines(fields, institution_name))
+        if variant == 'degraded':
+            image = degrade_image(image, rng)
+            text = '\n'.join(ocr_noise(line, rng, error_rate=0.02) for line in text.split('\n'))
+        
+        extension = file_format if file_format != 'mixed' else ('pdf' if serial % 2 else 'png')
+        buffer = io.BytesIO()
+        if extension == 'pdf':
+            image.save(buffer, 'PDF', resolution=dpi)
+        else:
+            image.save(buffer, 'PNG', dpi=(dpi, dpi))
+        documents.append((f'{variant}_{serial:05d}.{extension}', buffer.getvalue(), text, variant, VARIANTS[variant]))
+    return documents
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def rss_megabytes():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+def stage_means():
+    """Mean milliseconds per call of each timed stage so far, from the metrics registry"""
+    from app.metrics import stage_seconds
+    
+    with stage_seconds.lock:
+        values = {labels[0]: (sum(counts), total) for labels, (counts, total) in stage_seconds.values.items()}
+    return {name: total * 1000 / count for name, (count, total) in values.items() if count}
+
+def run_driver(driver, app, documents, simulated):
+    """Verify every document through ``driver``; returns the measurements"""
+    from app.metrics import stage_seconds
+    from app.verification_engine import CertificateVerifier
+    
+    with stage_seconds.lock:
+        stage_seconds.values.clear()
+    
+    verifier = CertificateVerifier()
+    client = app.test_client()
+    latencies = []
+    outcomes = {variant: {} for variant in VARIANTS}
+    correct = false_accepts = false_rejects = 0
+    rss_before = rss_megabytes()
+    
+    started = time.perf_counter()
+    for filename, data, text, variant, should_be_valid in documents:
+        if simulated:
+            simulated.document(text)
+        request_started = time.perf_counter()
+        if driver == 'verifier':
+            result = verifier.verify_certificate(io.BytesIO(data), filename, '127.0.0.1', 'benchmark')
+        else:
+            response = client.post('/upload', data={'certificate': (io.BytesIO(data), filename)},
+                                   content_type='multipart/form-data')
+            result = response.get_json()
+        latencies.append(time.perf_counter() - request_started)
+        
+        status = result.get('status', 'ERROR')
+        outcomes[variant][status] = outcomes[variant].get(status, 0) + 1
+        if (status == 'VALID') == should_be_valid:
+            correct += 1
+        elif should_be_valid:
+            false_rejects += 1
+        else:
+            false_accepts += 1
+    elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    genuine = sum(1 for *_, should_be_valid in documents if should_be_valid)
+    return {
+        'documents': len(documents),
+        'throughput_per_second': len(documents) / elapsed,
+        'latency_ms': {'mean': sum(latencies) * 1000 / len(latencies),
+                       'p50': percentile(latencies, 0.50) * 1000,
+                       'p95': percentile(latencies, 0.95) * 1000,
+                       'p99': percentile(latencies, 0.99) * 1000},
+        'stage_mean_ms': stage_means(),
+        'memory_mb': {'rss_before': rss_before, 'rss_after': rss_megabytes(),
+                      'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024},
+        'accuracy': correct / len(documents),
+        'false_accept_rate': false_accepts / (len(documents) - genuine) if len(documents) > genuine else 0.0,
+        'false_reject_rate': false_rejects / genuine if genuine else 0.0,
+        'outcomes': outcomes
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+def print_results(driver, results):
+    latency = results['latency_ms']
+    memory = results['memory_mb']
+    print(f"{driver}: {results['documents']} documents, {results['throughput_per_second']:.1f} documents/s")
+    print(f"  latency ms   mean {latency['mean']:8.1f}  p50 {latency['p50']:8.1f}  "
+          f"p95 {latency['p95']:8.1f}  p99 {latency['p99']:8.1f}")
+    print("  stages ms    " + '  '.join(f"{name} {mean:.1f}" for name, mean in
+                                        sorted(results['stage_mean_ms'].items(), key=lambda item: -item[1])))
+    print(f"  memory MB    rss {memory['rss_before']:.0f} -> {memory['rss_after']:.0f}, peak {memory['peak_rss']:.0f}")
+    print(f"  accuracy     {results['accuracy']:.1%}  (false accepts {results['false_accept_rate']:.1%}, "
+          f"false rejects {results['false_reject_rate']:.1%})")
+    for variant, statuses in results['outcomes'].items():
+        print(f"    {variant:<14} " + ', '.join(f'{count} {status}' for status, count in sorted(statuses.items())))
+
+def print_comparison(report, baseline):
+    print(f"compared with {baseline.get('commit') or 'baseline'}:")
+    if baseline.get('parameters') != report['parameters']:
+        print("  (parameters differ, numbers are not directly comparable)")
+    for driver, results in report['drivers'].items():
+        before = baseline.get('drivers', {}).get(driver)
+        if before is None:
+            continue
+        rows = [('documents/s', before['throughput_per_second'], results['throughput_per_second'])]
+        rows += [(f'{name} ms', before['latency_ms'][name], results['latency_ms'][name]) for name in ('p50', 'p95', 'p99')]
+        rows += [('peak rss MB', before['memory_mb']['peak_rss'], results['memory_mb']['peak_rss']),
+                 ('accuracy %', before['accuracy'] * 100, results['accuracy'] * 100)]
+        for label, old, new in rows:
+            change = f"{(new - old) / old:+.1%}" if old else 'n/a'
+            print(f"  {driver:<9} {label:<12} {old:10.2f} -> {new:10.2f}  {change}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--institutions', type=int, default=12)
+    parser.add_argument('--certificates', type=int, default=50000)
+    parser.add_argument('--documents', type=int, default=300)
+    parser.add_argument('--driver', choices=['verifier', 'upload', 'both'], default='both')
+    parser.add_argument('--format', choices=['png', 'pdf', 'mixed'], default='mixed')
+    parser.add_argument('--ocr', choices=['auto', 'tesseract', 'simulated'], default='auto')
+    parser.add_argument('--dpi', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=22)
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare with')
+    args = parser.parse_args()
+    
+    ocr = args.ocr
+    if ocr == 'auto':
+        ocr = 'tesseract' if tesseract_available() else 'simulated'
+    
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        os.environ['SCHEMA_AUTO_UPGRADE'] = 'true'
+        os.environ['UPLOAD_FOLDER'] = os.path.join(directory, 'uploads')
+        # Every document is new, so the result cache would only add lookups
+        os.environ['VERIFICATION_CACHE_ENABLED'] = 'false'
+        
+        simulated = None
+        if ocr == 'simulated':
+            import pytesseract
+            os.environ['OCR_WORKERS'] = '0'  # Worker processes would not see the simulated text
+            simulated = pytesseract.image_to_string = SimulatedOCR()
+        
+        from app import create_app, db
+        
+        app = create_app(warm_up=False)
+        with app.app_context():
+            rng = random.Random(args.seed)
+            started = time.perf_counter()
+            rows, institution_names = seed_registry(db, args.institutions, args.certificates, rng)
+            print(f"registry: {args.institutions} institutions, {len(rows):,} certificates "
+                  f"({time.perf_counter() - started:.1f}s)")
+            
+            started = time.perf_counter()
+            documents = build_documents(rng, rows, institution_names, args.documents, args.format, args.dpi)
+            print(f"documents: {len(documents)} {args.format} at {args.dpi} dpi, "
+                  f"{len(VARIANTS)} variants ({time.perf_counter() - started:.1f}s); OCR: {ocr}")
+            
+            report = {
+                'commit': git_commit(),
+                'parameters': {name: value for name, value in vars(args).items() if name not in ('json', 'compare')},
+                'ocr': ocr,
+                'environment': {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                                'machine': platform.machine(), 'cpus': os.cpu_count()},
+                'drivers': {}
+            }
+            drivers = ['verifier', 'upload'] if args.driver == 'both' else [args.driver]
+            for driver in drivers:
+                report['drivers'][driver] = run_driver(driver, app, documents, simulated)
+                print_results(driver, report['drivers'][driver])
+    
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as baseline:
+            print_comparison(report, json.load(baseline))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Field extraction from long noisy OCR text: one search per pattern against the compiled extractor
+    
+    python -m benchmarks.field_extraction [--documents 2000] [--kilobytes 4 64 512]
+"""
+
+import argparse
+import random
+import re
+import time
+
+from app.ocr_utils import DocumentProcessor
+from benchmarks.synthetic import COURSES, certificate_fields, ocr_noise
+
+FRAGMENTS = [
+    'name', 'name:', 'student name', 'student id', 'this is to certify that', 'mr', 'mr./ms.', 'ms',
+    'certificate no', 'cert. no.', 'registration no:', 'reg no', 'roll no', 'enrollment no',
+    'course', 'degree', 'bachelor of', 'master of', 'diploma in', 'year', 'passing year',
+    'session', '2019 session', 'grade', 'class', 'division', 'marks', 'mark:', 'percentage',
+    '%', '78.5', '1.2.3', '12.%', '4.5.6 %', '2023', '12345', ':', '/', '-', '.', 'RU/2023/BSC/001', 'ſession',
+]
+
+def previous_extract(patterns, text):
+    """extract_data_patterns before the compiled extractor"""
+    extracted_data = {}
+    text_clean = re.sub(r'\s+', ' ', text.lower().strip())
+    for field, field_patterns in patterns.items():
+        for pattern in field_patterns:
+            match = re.search(pattern, text_clean, re.IGNORECASE)
+            if match:
+                extracted_data[field] = match.group(1).strip()
+                break
+    return extracted_data
+
+def certificate_text(rng, serial):
+    fields = certificate_fields(rng, serial)
+    lines = [
+        'Ranchi University',
+        f"Certificate No: {fields['certificate_number']}",
+        f"This is to certify that {fields['student_name']}",
+        f"Roll No: {fields['roll_number']}",
+        f"has been awarded the degree of {fields['course']}",
+        f"Passing Year: {fields['year']}",
+        f"Grade: {fields['grade']}  Marks: {rng.randint(40, 99)}.{rng.randint(0, 9)}%",
+    ]
+    return '\n'.join(ocr_noise(line, rng) for line in lines)
+
+def noisy_text(rng, size):
+    """OCR-like text of about ``size`` characters with certificate fields buried in noise"""
+    parts = []
+    length = 0
+    while length < size:
+        roll = rng.random()
+        if roll < 0.05:
+            part = certificate_text(rng, rng.randint(0, 999999))
+        elif roll < 0.5:
+            part = rng.choice(FRAGMENTS)
+        elif roll < 0.8:
+            part = ocr_noise(rng.choice(COURSES), rng, error_rate=0.2)
+        else:
+            part = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789 .:%/-\n') for _ in range(rng.randint(1, 40)))
+        parts.append(part)
+        length += len(part) + 1
+    return rng.choice([' ', '\n', '  ']).join(parts)
+
+def timed(function, texts, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            function(text)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000 / len(texts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=2000)
+    parser.add_argument('--kilobytes', type=int, nargs='+', default=[4, 64, 512])
+    args = parser.parse_args()
+    
+    processor = DocumentProcessor()
+    patterns = DocumentProcessor.patterns
+    rng = random.Random(5)
+    
+    # Same output on short documents of every shape, including ones with no fields at all
+    mismatches = 0
+    for serial in range(args.documents):
+        text = certificate_text(rng, serial) if serial % 2 else noisy_text(rng, rng.randint(0, 600))
+        if processor.extract_data_patterns(text) != previous_extract(patterns, text):
+            mismatches += 1
+    print(f"{args.documents} documents, {mismatches} results differ from re.search per pattern")
+    
+    for kilobytes in args.kilobytes:
+        texts = [noisy_text(rng, kilobytes * 1024) for _ in range(5)]
+        assert all(processor.extract_data_patterns(text) == previous_extract(patterns, text) for text in texts)
+        before = timed(lambda text: previous_extract(patterns, text), texts)
+        after = timed(processor.extract_data_patterns, texts)
+        print(f"{kilobytes:>4} KB noisy OCR text   per pattern {before:8.2f} ms   compiled {after:8.2f} ms   "
+              f"speedup {before / after:5.1f}x")
+    
+    # Long digit runs make the percentage pattern backtrack from every digit
+    for digits in [250, 500, 1000]:
+        texts = ['name ' + '7' * digits + ' end']
+        before = timed(lambda text: previous_extract(patterns, text), texts, repeat=1)
+        after = timed(processor.extract_data_patterns, texts, repeat=1)
+        print(f"{digits:>6}-digit run        per pattern {before:8.2f} ms   compiled {after:8.2f} ms")
+
+if __name__ == '__main__':
+    main()
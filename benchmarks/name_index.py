@@ -0,0 +1,59 @@
+"""
+Lookup latency of the trigram name index at different registry sizes
+    
+    python -m benchmarks.name_index [--sizes 10000 100000 1000000] [--queries 500]
+"""
+
+import argparse
+import random
+import time
+
+from app.name_index import NameTrigramIndex
+from app.verification_engine import CertificateVerifier
+from benchmarks.synthetic import student_names, ocr_noise
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def run(size, queries, verifier):
+    names = student_names(size, seed=size)
+    
+    started = time.perf_counter()
+    index = NameTrigramIndex(verifier.normalize_text)
+    for cert_id, name in enumerate(names, 1):
+        index.add(cert_id, name)
+    build_seconds = time.perf_counter() - started
+    
+    rng = random.Random(42)
+    latencies = []
+    found = 0
+    for _ in range(queries):
+        cert_id = rng.randint(1, size)
+        query = ocr_noise(names[cert_id - 1], rng)
+        
+        started = time.perf_counter()
+        hits = index.search(query, verifier.scorer.name_similarity, threshold=verifier.name_threshold,
+                            top_k=verifier.candidate_limit)
+        latencies.append((time.perf_counter() - started) * 1000)
+        
+        # Synthetic names repeat, so any hit with the same name counts as found
+        if any(names[hit - 1] == names[cert_id - 1] for hit, _ in hits):
+            found += 1
+    
+    print(f"{size:>9,} names  build {build_seconds:7.2f}s  "
+          f"p50 {percentile(latencies, 0.50):7.2f}ms  p99 {percentile(latencies, 0.99):7.2f}ms  "
+          f"recall {found / queries:.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+    
+    verifier = CertificateVerifier()
+    for size in args.sizes:
+        run(size, args.queries, verifier)
+
+if __name__ == '__main__':
+    main()
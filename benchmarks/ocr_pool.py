@@ -0,0 +1,65 @@
+"""
+OCR throughput of the worker pool against in-thread OCR on sample certificate images
+    
+    python -m benchmarks.ocr_pool [--images 32] [--workers 1 2 4 8]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.ocr_utils import DocumentProcessor
+from app.ocr_pool import OCRWorkerPool
+from benchmarks.synthetic import certificate_fields, render_certificate_image
+
+def write_images(directory, count):
+    rng = random.Random(7)
+    paths = []
+    for serial in range(count):
+        path = os.path.join(directory, f'certificate_{serial}.png')
+        render_certificate_image(certificate_fields(rng, serial)).save(path, dpi=(300, 300))
+        paths.append(path)
+    return paths
+
+def in_thread(paths):
+    processor = DocumentProcessor()
+    started = time.perf_counter()
+    for path in paths:
+        processor.extract_text_from_image(path)
+    return time.perf_counter() - started
+
+def pooled(paths, workers):
+    pool = OCRWorkerPool(workers, queue_size=len(paths))
+    processor = DocumentProcessor(ocr_pool=pool)
+    try:
+        # Submit from as many request threads as there are workers, like a threaded server would
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers * 2) as requests:
+            list(requests.map(processor.extract_text_from_image, paths))
+        return time.perf_counter() - started, pool.stats()
+    finally:
+        pool.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=32)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_images(directory, args.images)
+        
+        baseline = in_thread(paths)
+        print(f"in-thread       {args.images / baseline:6.2f} images/s")
+        
+        for workers in sorted(set(args.workers)):
+            seconds, stats = pooled(paths, workers)
+            print(f"pool {workers:>2} workers {args.images / seconds:6.2f} images/s  "
+                  f"speedup {baseline / seconds:4.1f}x  peak in flight {stats['peak_in_flight']}  "
+                  f"failed {stats['failed']}  timed out {stats['timed_out']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Page fetch time by depth: OFFSET with COUNT (previous paginate()) against keyset pagination
+
+For each table size, verification_logs is filled with synthetic rows and pages at
+increasing depths are fetched both ways. Keyset pages cost the same at any depth and
+any table size; OFFSET pages grow with the number of rows skipped.
+    
+    python -m benchmarks.pagination [--rows 10000 1000000] [--per-page 20]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+def fill(db, VerificationLog, count, batch=50000):
+    from sqlalchemy import insert
+    
+    start = datetime(2024, 1, 1)
+    for first in range(0, count, batch):
+        db.session.execute(insert(VerificationLog), [
+            dict(uploaded_filename=f'{serial}.png', verification_status='VALID', confidence_score=95.0,
+                 created_at=start + timedelta(seconds=serial // 2))  # Pairs share a timestamp
+            for serial in range(first, min(first + batch, count))])
+        db.session.commit()
+
+def timed(function, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000])
+    parser.add_argument('--per-page', type=int, default=20)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        os.environ['SCHEMA_AUTO_UPGRADE'] = 'true'
+        from app import create_app, db
+        from app.models import VerificationLog
+        from app.pagination import encode_cursor, keyset_page
+        
+        app = create_app(warm_up=False)
+        with app.app_context():
+            filled = 0
+            for rows in sorted(args.rows):
+                fill(db, VerificationLog, rows - filled)
+                filled = rows
+                db.session.execute(db.text('ANALYZE'))
+                
+                query = lambda: VerificationLog.query
+                newest_first = (VerificationLog.created_at.desc(), VerificationLog.id.desc())
+                print(f"{rows:,} rows, {args.per_page} per page")
+                for fraction in (0, 0.5, 0.99):
+                    depth = int(rows * fraction) // args.per_page * args.per_page
+                    
+                    # The cursor a client would hold after reading the first `depth` rows
+                    cursor = None
+                    if depth:
+                        last = query().order_by(*newest_first).offset(depth - 1).first()
+                        cursor = encode_cursor(last.created_at, last.id)
+                    
+                    offset_ms = timed(lambda: query().order_by(*newest_first).paginate(
+                        page=depth // args.per_page + 1, per_page=args.per_page, error_out=False).items)
+                    keyset_ms = timed(lambda: keyset_page(query(), VerificationLog, cursor, args.per_page).items)
+                    
+                    offset_items = query().order_by(*newest_first).offset(depth).limit(args.per_page).all()
+                    same = offset_items == keyset_page(query(), VerificationLog, cursor, args.per_page).items
+                    print(f"  page at row {depth:>9,}   OFFSET+COUNT {offset_ms:8.2f} ms   keyset {keyset_ms:6.2f} ms   "
+                          f"same rows: {same}")
+
+if __name__ == '__main__':
+    main()
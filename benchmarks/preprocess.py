@@ -0,0 +1,117 @@
+"""
+Image preprocessing cost per stage on 300-dpi A4 scans, per-image against batch
+    
+    python -m benchmarks.preprocess [--pages 20] [--target-dpi 300 200 150]
+"""
+
+import argparse
+import io
+import random
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.ocr_utils import DocumentProcessor
+from benchmarks.synthetic import certificate_fields, render_certificate_image
+
+def scanned_pages(count, dpi=300):
+    """RGB JPEG scans with a slight skew, decoded the way an upload would be"""
+    rng = random.Random(11)
+    pages = []
+    for serial in range(count):
+        page = render_certificate_image(certificate_fields(rng, serial), dpi=dpi)
+        page = page.rotate(rng.uniform(-2, 2), fillcolor=255, expand=False).convert('RGB')
+        buffer = io.BytesIO()
+        page.save(buffer, 'JPEG', quality=85, dpi=(dpi, dpi))
+        buffer.seek(0)
+        pages.append(Image.open(buffer))
+        pages[-1].load()
+    return pages
+
+def per_image(image):
+    """The previous preprocess_image: a new CLAHE and full-resolution filters for every page"""
+    img_array = np.array(image)
+    gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY) if len(img_array.shape) == 3 else img_array
+    denoised = cv2.medianBlur(gray, 3)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+    enhanced = clahe.apply(denoised)
+    _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+def stage_timings(processor, pages):
+    """Milliseconds per page for each stage of preprocess_images"""
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+    totals = dict.fromkeys(['grayscale', 'downscale', 'median', 'clahe', 'threshold', 'deskew', 'crop'], 0.0)
+    
+    for image in pages:
+        started = time.perf_counter()
+        gray = processor.to_grayscale(image)
+        checkpoint = time.perf_counter(); totals['grayscale'] += checkpoint - started; started = checkpoint
+        
+        gray = processor.downscale(gray, image)
+        checkpoint = time.perf_counter(); totals['downscale'] += checkpoint - started; started = checkpoint
+        
+        denoised = cv2.medianBlur(gray, 3)
+        checkpoint = time.perf_counter(); totals['median'] += checkpoint - started; started = checkpoint
+        
+        enhanced = clahe.apply(denoised)
+        checkpoint = time.perf_counter(); totals['clahe'] += checkpoint - started; started = checkpoint
+        
+        cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=enhanced)
+        checkpoint = time.perf_counter(); totals['threshold'] += checkpoint - started; started = checkpoint
+        
+        if processor.deskew:
+            enhanced = processor.deskew_page(enhanced)
+        checkpoint = time.perf_counter(); totals['deskew'] += checkpoint - started; started = checkpoint
+        
+        if processor.crop:
+            enhanced = processor.crop_to_text(enhanced)
+        totals['crop'] += time.perf_counter() - started
+    
+    return {stage: seconds * 1000 / len(pages) for stage, seconds in totals.items()}
+
+def measure(run, pages):
+    """Milliseconds per page and peak traced memory in MB for one pass over the pages"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    results = run(pages)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds * 1000 / len(pages), peak / (1024 * 1024), results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--target-dpi', type=int, nargs='+', default=[300, 200, 150])
+    args = parser.parse_args()
+    
+    pages = scanned_pages(args.pages)
+    print(f"{args.pages} pages of {pages[0].size[0]}x{pages[0].size[1]} at 300 dpi")
+    
+    # Both paths keep every processed page, as a batch handed to OCR would
+    ms, peak, _ = measure(lambda batch: [per_image(image) for image in batch], pages)
+    print(f"{'per-image (previous)':<28} {ms:8.1f} ms/page  peak {peak:7.1f} MB")
+    
+    configurations = [(dpi, False, False) for dpi in args.target_dpi] + [(args.target_dpi[0], True, True)]
+    for target_dpi, deskew, crop in configurations:
+        processor = DocumentProcessor(target_dpi=target_dpi, deskew=deskew, crop=crop)
+        label = f"batch {target_dpi} dpi" + (" +deskew +crop" if deskew else "")
+        
+        ms, peak, processed = measure(processor.preprocess_images, pages)
+        stages = stage_timings(processor, pages)
+        breakdown = '  '.join(f"{stage} {value:.1f}" for stage, value in stages.items() if value >= 0.05)
+        print(f"{label:<28} {ms:8.1f} ms/page  peak {peak:7.1f} MB  output {processed[0].shape[1]}x{processed[0].shape[0]}")
+        print(f"{'':<28} stages (ms/page): {breakdown}")
+    
+    # Without downscaling or geometry fixes the batch path must match the previous output exactly
+    processor = DocumentProcessor(target_dpi=0)
+    identical = all(np.array_equal(per_image(image), processed)
+                    for image, processed in zip(pages, processor.preprocess_images(pages)))
+    print(f"identical to previous output at full resolution: {identical}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+SQL statements issued per verification, with and without the institution cache
+
+Every document goes through verify_certificate (OCR replaced by the document's fields)
+while a cursor hook counts the statements sent to the database. Exits non-zero when
+any verification with the institution cache exceeds --max-statements, or, with duplicate
+detection on, --max-statements plus --max-duplicate-statements.
+    
+    python -m benchmarks.query_count [--certificates 5000] [--documents 500] [--max-statements 9]
+                                     [--max-duplicate-statements 6]
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+from collections import Counter
+
+from benchmarks.scoring import extracted_document, seed_registry
+
+class StatementCounter:
+    """Counts statements executed on an engine while enabled"""
+    
+    def __init__(self, engine):
+        from sqlalchemy import event
+        
+        self.count = 0
+        self.enabled = False
+        event.listen(engine, 'before_cursor_execute', self.executed)
+    
+    def executed(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            self.count += 1
+    
+    def measure(self, function, *args, **kwargs):
+        self.count = 0
+        self.enabled = True
+        try:
+            function(*args, **kwargs)
+        finally:
+            self.enabled = False
+        return self.count
+
+def verify_documents(verifier, counter, documents):
+    """Statement count of each verification"""
+    counts = []
+    for serial, extracted in enumerate(documents):
+        processing_result = {'extracted_data': extracted, 'forgery_flags': []}
+        verifier.processor.process_document = lambda source, filename, file_hash=None: processing_result
+        upload = io.BytesIO(f'{id(verifier)}-{serial}'.encode())
+        counts.append(counter.measure(verifier.verify_certificate, upload, f'{serial}.png'))
+    return counts
+
+def summary(label, counts):
+    distribution = Counter(counts)
+    print(f"{label:<28} mean {sum(counts) / len(counts):5.2f}  max {max(counts):3d}  statements per verification  "
+          f"({', '.join(f'{count}: {times}' for count, times in sorted(distribution.items()))})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--certificates', type=int, default=5000)
+    parser.add_argument('--documents', type=int, default=500)
+    parser.add_argument('--max-statements', type=int, default=9)
+    parser.add_argument('--max-duplicate-statements', type=int, default=6,
+                        help='Statements duplicate detection may add (three lookups, three upserts)')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        os.environ['SCHEMA_AUTO_UPGRADE'] = 'true'
+        os.environ['VERIFICATION_CACHE_ENABLED'] = 'false'
+        from app import create_app, db
+        from app.verification_engine import CertificateVerifier
+        
+        app = create_app(warm_up=False)
+        with app.app_context():
+            rng = random.Random(14)
+            certificates = seed_registry(db, args.certificates, rng)
+            documents = [extracted_document(rng, certificates) for _ in range(args.documents)]
+            counter = StatementCounter(db.engine)
+            app.config['DUPLICATE_DETECTION_ENABLED'] = False
+            
+            # Previous behaviour: the matched certificate's institution is lazy-loaded
+            lazy = CertificateVerifier()
+            lazy.institutions = None
+            summary('lazy institution load', verify_documents(lazy, counter, documents))
+            
+            cached = CertificateVerifier()
+            counts = verify_documents(cached, counter, documents)
+            summary('institution cache', counts)
+            print(f"institution cache loads: {cached.institutions.stats()['loads']}")
+            
+            app.config['DUPLICATE_DETECTION_ENABLED'] = True
+            duplicate_counts = verify_documents(cached, counter, documents)
+            summary('with duplicate detection', duplicate_counts)
+            
+            failures = []
+            if max(counts) > args.max_statements:
+                failures.append(f"a verification issued {max(counts)} statements (limit {args.max_statements})")
+            duplicate_limit = args.max_statements + args.max_duplicate_statements
+            if max(duplicate_counts) > duplicate_limit:
+                failures.append(f"a verification with duplicate detection issued {max(duplicate_counts)} "
+                                f"statements (limit {duplicate_limit})")
+            for failure in failures:
+                print(f"FAIL: {failure}")
+            if failures:
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Registry import throughput for CSV and Excel ledgers
+
+Writes a synthetic ledger, imports it into an empty registry, imports it again unchanged,
+then imports a copy where a tenth of the rows changed and a few are invalid, reporting
+rows per second and the outcome counts of each run.
+    
+    python -m benchmarks.registry_import [--rows 100000] [--excel-rows 20000]
+"""
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.synthetic import certificate_fields
+
+HEADER = ['Certificate Number', 'Student Name', 'Roll No', 'Course', 'Degree Type', 'Passing Year',
+          'Grade', 'Percentage', 'Issue Date']
+
+def ledger_rows(count, seed=20, changed=0.0, invalid=0):
+    rng = random.Random(seed)
+    change = random.Random(seed + 1)
+    rows = []
+    for serial in range(count):
+        fields = certificate_fields(rng, serial)
+        percentage = round(rng.uniform(45, 95), 1)
+        if change.random() < changed:
+            percentage = round(percentage + 1, 1)
+        rows.append([fields['certificate_number'], fields['student_name'], fields['roll_number'], fields['course'],
+                     fields['course'].split()[0], fields['year'], fields['grade'], percentage,
+                     f"{fields['year']}-06-30"])
+    for row in change.sample(rows, invalid):
+        row[5] = 'unknown'
+    return rows
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as ledger:
+        writer = csv.writer(ledger)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+def write_excel(path, rows):
+    from openpyxl import Workbook
+    
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+def run(label, path, institution_code):
+    from app.registry_import import import_certificates, read_ledger
+    
+    started = time.perf_counter()
+    with open(path, 'rb') as ledger:
+        report = import_certificates(read_ledger(ledger, path), institution_code=institution_code)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<28} {report.rows / elapsed:8,.0f} rows/s   inserted {report.inserted:>7,}  "
+          f"updated {report.updated:>6,}  unchanged {report.unchanged:>7,}  errors {len(report.errors):>3}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--excel-rows', type=int, default=20000, help='0 skips the Excel runs')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        os.environ['SCHEMA_AUTO_UPGRADE'] = 'true'
+        from app import create_app, db
+        from app.models import Certificate, Institution
+        
+        app = create_app(warm_up=False)
+        with app.app_context():
+            db.session.add_all([Institution(name='Ranchi University', code='RU', type='University'),
+                                Institution(name='Birla Institute of Technology', code='BIT', type='Institute')])
+            db.session.commit()
+            
+            for extension, count, write in [('csv', args.rows, write_csv), ('xlsx', args.excel_rows, write_excel)]:
+                if not count:
+                    continue
+                code = 'RU' if extension == 'csv' else 'BIT'
+                original = os.path.join(directory, f'ledger.{extension}')
+                revised = os.path.join(directory, f'revised.{extension}')
+                write(original, ledger_rows(count))
+                write(revised, ledger_rows(count, changed=0.1, invalid=5))
+                
+                print(f"{count:,} rows, {extension}")
+                run('into an empty registry', original, code)
+                run('again, unchanged', original, code)
+                run('10% changed, 5 invalid', revised, code)
+            
+            print(f"{Certificate.query.count():,} certificates in the registry")
+
+if __name__ == '__main__':
+    main()
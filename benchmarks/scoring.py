@@ -0,0 +1,118 @@
+"""
+Parity and speed of the scoring backends on a synthetic registry
+
+Every document is verified with both backends; the status, confidence, best match and
+every candidate's score and details must be identical.
+    
+    python -m benchmarks.scoring [--certificates 20000] [--documents 2000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+from benchmarks.synthetic import certificate_fields, ocr_noise
+
+def seed_registry(db, count, rng):
+    from app.models import Certificate, Institution
+    
+    institutions = [Institution(name=f'Institution {code}', code=code, type='University')
+                    for code in ['RU', 'BIT', 'XIM', 'NIT', 'VBU', 'SKMU']]
+    db.session.add_all(institutions)
+    db.session.flush()
+    
+    certificates = []
+    for serial in range(count):
+        institution = rng.choice(institutions)
+        fields = certificate_fields(rng, serial, institution_code=institution.code)
+        certificates.append(Certificate(
+            certificate_number=fields['certificate_number'], student_name=fields['student_name'],
+            student_roll_number=fields['roll_number'], course_name=fields['course'],
+            degree_type=fields['course'].split()[0], passing_year=fields['year'],
+            grade=fields['grade'], issue_date=date(fields['year'], 6, 1), institution_id=institution.id))
+    db.session.add_all(certificates)
+    db.session.commit()
+    return certificates
+
+def extracted_document(rng, certificates):
+    """Fields as OCR might read them from a genuine, altered or invented certificate"""
+    certificate = rng.choice(certificates)
+    fields = {
+        'certificate_number': certificate.certificate_number,
+        'student_name': certificate.student_name,
+        'roll_number': certificate.student_roll_number,
+        'course': certificate.course_name,
+        'year': str(certificate.passing_year),
+    }
+    if rng.random() < 0.2:
+        fields['student_name'] = rng.choice(certificates).student_name  # Name swapped onto a real number
+    if rng.random() < 0.2:
+        fields['year'] = str(int(fields['year']) + rng.choice([-2, -1, 1, 8]))
+    if rng.random() < 0.1:
+        fields['certificate_number'] = fields['certificate_number'][:-3] + f'{rng.randint(0, 999):03d}'
+    
+    extracted = {}
+    for field, value in fields.items():
+        if rng.random() < 0.8:
+            extracted[field] = ocr_noise(value, rng, error_rate=rng.choice([0.0, 0.03, 0.1])).strip()
+    return extracted
+
+def verdict(verifier, extracted):
+    matches = verifier.find_matching_certificates(extracted)
+    best_match = matches[0] if matches else None
+    flags = verifier.detect_anomalies(extracted, best_match)
+    status, confidence = verifier.calculate_verification_status(matches, flags, [])
+    scored = [(match['certificate'].id, match['match_score'], match['match_details']) for match in matches]
+    return status, confidence, scored
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--certificates', type=int, default=20000)
+    parser.add_argument('--documents', type=int, default=2000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        os.environ['SCHEMA_AUTO_UPGRADE'] = 'true'
+        os.environ['VERIFICATION_CACHE_ENABLED'] = 'false'
+        from app import create_app, db
+        from app.verification_engine import CertificateVerifier
+        
+        app = create_app(warm_up=False)
+        with app.app_context():
+            rng = random.Random(9)
+            certificates = seed_registry(db, args.certificates, rng)
+            documents = [extracted_document(rng, certificates) for _ in range(args.documents)]
+            
+            reference = CertificateVerifier(scoring_backend='fuzzywuzzy')
+            batched = CertificateVerifier(scoring_backend='rapidfuzz')
+            
+            outcomes = {}
+            differences = 0
+            candidates = []
+            for extracted in documents:
+                expected = verdict(reference, extracted)
+                if verdict(batched, extracted) != expected:
+                    differences += 1
+                outcomes[expected[0]] = outcomes.get(expected[0], 0) + 1
+                candidates.append(reference.find_candidate_certificates(extracted))
+            
+            print(f"{args.documents} documents against {args.certificates:,} certificates: "
+                  f"{', '.join(f'{count} {status}' for status, count in sorted(outcomes.items()))}")
+            print(f"documents with a different outcome or score: {differences}")
+            
+            # Scoring alone, on the candidate sets the verifier retrieved
+            average = sum(len(certs) for certs in candidates) / len(candidates)
+            for verifier in (reference, batched):
+                started = time.perf_counter()
+                for extracted, certs in zip(documents, candidates):
+                    if certs:
+                        verifier.score_certificates(extracted, certs, minimum_score=30)
+                elapsed = (time.perf_counter() - started) * 1000 / len(documents)
+                print(f"{verifier.scorer.name:<10} scoring {elapsed:7.3f} ms/document ({average:.0f} candidates on average)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Full-text search latency on a large registry against LIKE scans
+
+Fills the registry with synthetic certificates through bulk inserts, builds the search
+index, then times ranked searches by certificate number, full name, name prefix and
+roll number next to the equivalent case-insensitive LIKE query.
+    
+    python -m benchmarks.search [--certificates 200000] [--queries 200]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+from benchmarks.synthetic import certificate_fields
+
+def fill(db, count, rng, batch=20000):
+    from app.match_keys import certificate_match_keys
+    from app.models import Certificate, Institution
+    from sqlalchemy import insert
+    
+    codes = ['RU', 'BIT', 'XIM', 'NIT', 'VBU', 'SKMU']
+    db.session.add_all([Institution(name=f'Institution {code}', code=code, type='University') for code in codes])
+    db.session.commit()
+    institution_ids = {institution.code: institution.id for institution in Institution.query.all()}
+    
+    sample = []
+    for first in range(0, count, batch):
+        rows = []
+        for serial in range(first, min(first + batch, count)):
+            code = rng.choice(codes)
+            fields = certificate_fields(rng, serial, institution_code=code)
+            rows.append(dict(
+                certificate_number=fields['certificate_number'], student_name=fields['student_name'],
+                student_roll_number=fields['roll_number'], course_name=fields['course'],
+                degree_type=fields['course'].split()[0], passing_year=fields['year'], grade=fields['grade'],
+                issue_date=date(fields['year'], 6, 1), institution_id=institution_ids[code],
+                **certificate_match_keys(fields['certificate_number'], fields['student_name'],
+                                         fields['roll_number'], fields['course'])))
+        # Core inserts skip the model events, so the index is rebuilt afterwards
+        db.session.execute(insert(Certificate.__table__), rows)
+        db.session.commit()
+        sample.extend(rng.sample(rows, min(50, len(rows))))
+    return sample
+
+def timed(run, queries):
+    times = []
+    for query in queries:
+        started = time.perf_counter()
+        found = run(query)
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return times[len(times) // 2], times[int(len(times) * 0.95)], found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--certificates', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        os.environ['SCHEMA_AUTO_UPGRADE'] = 'true'
+        from app import create_app, db
+        from app.models import Certificate
+        from app.search_index import rebuild_search_index, search
+        
+        app = create_app(warm_up=False)
+        with app.app_context():
+            rng = random.Random(19)
+            sample = fill(db, args.certificates, rng)
+            
+            started = time.perf_counter()
+            indexed = rebuild_search_index()
+            print(f"indexed {indexed:,} certificates in {time.perf_counter() - started:.1f} s")
+            
+            picks = [rng.choice(sample) for _ in range(args.queries)]
+            cases = [
+                ('certificate number', [row['certificate_number'] for row in picks], Certificate.certificate_number),
+                ('full name', [row['student_name'] for row in picks], Certificate.student_name),
+                ('name prefix', [row['student_name'].split()[0][:4] for row in picks], Certificate.student_name),
+                ('roll number', [row['student_roll_number'] for row in picks], Certificate.student_roll_number),
+            ]
+            for label, queries, column in cases:
+                fts_p50, fts_p95, _ = timed(lambda query: search(query, 'certificates', 20), queries)
+                like_p50, like_p95, _ = timed(
+                    lambda query: Certificate.query.filter(column.ilike(f'%{query}%')).limit(20).all(), queries[:20])
+                recall = ''
+                if label != 'name prefix':
+                    # Names repeat across certificates, so for them the top hit only has to carry the name
+                    hits = 0
+                    for query, row in zip(queries, picks):
+                        ranked = [rowid for rowid, _ in search(query, 'certificates', 20)]
+                        top = db.session.get(Certificate, ranked[0]) if ranked else None
+                        hits += top is not None and getattr(top, column.key) == row[column.key]
+                    recall = f"  top hit matches: {hits}/{len(queries)}"
+                print(f"{label:<20} full-text p50 {fts_p50:6.2f} ms  p95 {fts_p95:6.2f} ms   "
+                      f"LIKE p50 {like_p50:7.2f} ms  p95 {like_p95:7.2f} ms{recall}")
+
+if __name__ == '__main__':
+    main()
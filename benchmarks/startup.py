@@ -0,0 +1,108 @@
+"""
+Startup import time and memory, checked against a budget
+
+Starts fresh interpreters under ``python -X importtime`` that import the application and
+create it, as a web node (APP_ROLE=all) and a dashboard node (APP_ROLE=dashboard, which
+also serves the stats, listing and health APIs), and reports the import time of each
+top-level module, the wall time and the resident memory. The OCR and vision stack must
+stay unloaded in both until something is verified; the last row shows what importing it
+costs. Exits non-zero when a startup imports more than --budget-ms or loads the stack.
+    
+    python -m benchmarks.startup [--budget-ms 1200] [--top 8]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Modules that only verification needs
+OCR_STACK = ['cv2', 'numpy', 'pytesseract', 'PyPDF2', 'PIL.Image', 'fuzzywuzzy', 'rapidfuzz']
+
+APP = """
+from app import create_app
+app = create_app(warm_up=False)
+"""
+
+DASHBOARD = APP + """
+client = app.test_client()
+for path in ('/api/stats', '/api/certificates', '/api/verification_logs', '/api/ocr/stats', '/metrics',
+             '/healthz/ready'):
+    assert client.get(path).status_code == 200, path
+assert client.post('/upload').status_code == 503
+"""
+
+VERIFICATION = APP + """
+import app.verification_engine
+"""
+
+REPORT = """
+import json, os, sys, time
+print(json.dumps({
+    'seconds': time.perf_counter() - started,
+    'loaded': [name for name in %r if name in sys.modules],
+    'rss_mb': int(open('/proc/self/statm').read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+}))
+""" % (OCR_STACK,)
+
+SCENARIOS = [
+    ('web node', {'APP_ROLE': 'all'}, APP, True),
+    ('dashboard node', {'APP_ROLE': 'dashboard'}, DASHBOARD, True),
+    ('verification stack', {'APP_ROLE': 'all'}, VERIFICATION, False),
+]
+
+def import_times(stderr):
+    """(module, self microseconds, cumulative microseconds, depth) from -X importtime output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_time), int(cumulative), (len(name) - len(name.lstrip())) // 2))
+    return modules
+
+def run(code, environment):
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                              'import time; started = time.perf_counter()\n' + code + REPORT],
+                             env=environment, capture_output=True, text=True)
+    if process.returncode:
+        raise RuntimeError(process.stderr[-2000:])
+    return json.loads(process.stdout.strip().splitlines()[-1]), import_times(process.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=1200, help='Import time allowed for a startup')
+    parser.add_argument('--top', type=int, default=8, help='Slowest top-level imports listed per startup')
+    args = parser.parse_args()
+    
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        base = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(directory, 'benchmark.db')}",
+                    UPLOAD_FOLDER=os.path.join(directory, 'uploads'))
+        # Create the schema first so the runs below measure a restart
+        run(APP, dict(base, SCHEMA_AUTO_UPGRADE='true'))
+        
+        for label, variables, code, checked in SCENARIOS:
+            report, modules = run(code, dict(base, **variables))
+            top_level = [module for module in modules if module[3] == 0]
+            import_ms = sum(cumulative for _, _, cumulative, _ in top_level) / 1000
+            print(f"{label:<20} imports {import_ms:7.0f} ms   wall {report['seconds'] * 1000:7.0f} ms   "
+                  f"rss {report['rss_mb']:5.0f} MB   {len(modules)} modules")
+            for name, _, cumulative, _ in sorted(top_level, key=lambda module: -module[2])[:args.top]:
+                print(f"    {cumulative / 1000:7.1f} ms  {name}")
+            
+            if not checked:
+                continue
+            if report['loaded']:
+                failures.append(f"{label} loaded {', '.join(report['loaded'])}")
+            if import_ms > args.budget_ms:
+                failures.append(f"{label} spent {import_ms:.0f} ms importing (budget {args.budget_ms:.0f} ms)")
+    
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
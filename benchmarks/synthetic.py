@@ -0,0 +1,176 @@
+"""
+Synthetic registry data for benchmarks
+"""
+
+import random
+
+# Common given names and surnames in Jharkhand, roughly weighted by frequency
+FIRST_NAMES = [
+    ('Rahul', 30), ('Amit', 28), ('Priya', 26), ('Ravi', 24), ('Sunita', 22), ('Ankit', 20),
+    ('Pooja', 20), ('Vikash', 18), ('Neha', 18), ('Sanjay', 16), ('Anjali', 16), ('Deepak', 15),
+    ('Kiran', 14), ('Suresh', 14), ('Rekha', 12), ('Manoj', 12), ('Kavita', 11), ('Rajesh', 11),
+    ('Deepika', 10), ('Abhishek', 10), ('Shweta', 9), ('Nitesh', 9), ('Puja', 9), ('Sonu', 8),
+    ('Rinki', 7), ('Birsa', 5), ('Sukhram', 4), ('Jitendra', 6), ('Mamta', 6), ('Pankaj', 7),
+    ('Anita', 8), ('Santosh', 7), ('Ranjit', 5), ('Lakshmi', 5), ('Shiv', 4), ('Komal', 6),
+]
+
+MIDDLE_NAMES = [('', 70), ('Kumar', 20), ('Kumari', 6), ('Prasad', 2), ('Nath', 2)]
+
+SURNAMES = [
+    ('Kumar', 30), ('Singh', 26), ('Mahto', 18), ('Sharma', 16), ('Oraon', 14), ('Munda', 14),
+    ('Gupta', 12), ('Devi', 12), ('Kumari', 12), ('Verma', 10), ('Prasad', 10), ('Yadav', 10),
+    ('Soren', 9), ('Hembrom', 8), ('Tirkey', 8), ('Ekka', 7), ('Minz', 7), ('Lakra', 6),
+    ('Sahu', 9), ('Mishra', 8), ('Pandey', 8), ('Sinha', 7), ('Das', 7), ('Ghosh', 5),
+    ('Murmu', 6), ('Tudu', 6), ('Kisku', 5), ('Bhagat', 5), ('Choudhary', 5), ('Jha', 6),
+]
+
+def _weighted(rng, choices):
+    names, weights = zip(*choices)
+    return rng.choices(names, weights=weights)[0]
+
+def student_name(rng):
+    """A random student name"""
+    parts = [_weighted(rng, FIRST_NAMES), _weighted(rng, MIDDLE_NAMES), _weighted(rng, SURNAMES)]
+    return ' '.join(part for part in parts if part)
+
+def student_names(count, seed=0):
+    """A reproducible list of student names"""
+    rng = random.Random(seed)
+    return [student_name(rng) for _ in range(count)]
+
+def ocr_noise(text, rng, error_rate=0.05):
+    """Simulate OCR character confusions, drops and case changes"""
+    confusions = {'i': 'l', 'l': 'i', 'o': '0', 'a': 'e', 'e': 'c', 'n': 'm', 'm': 'n', 'u': 'v', 's': '5'}
+    chars = []
+    for char in text.lower():
+        roll = rng.random()
+        if roll < error_rate / 2 and char in confusions:
+            chars.append(confusions[char])
+        elif roll < error_rate * 0.7:
+            continue
+        else:
+            chars.append(char)
+    return ''.join(chars)
+
+COURSES = [
+    'Bachelor of Science in Computer Science', 'Bachelor of Arts in English', 'Bachelor of Commerce',
+    'Bachelor of Technology in Mechanical Engineering', 'Master of Arts in Economics',
+    'Master of Science in Physics', 'Diploma in Civil Engineering', 'Master of Business Administration',
+]
+
+def certificate_fields(rng, serial, institution_code='RU', year=None):
+    """Field values for one synthetic certificate"""
+    year = year or rng.randint(2005, 2024)
+    course = rng.choice(COURSES)
+    short = ''.join(word[0] for word in course.split() if word[0].isupper())[:4]
+    return {
+        'certificate_number': f'{institution_code}/{year}/{short}/{serial:06d}',
+        'student_name': student_name(rng),
+        'roll_number': f'{institution_code}{year % 100:02d}{short}{serial:06d}',
+        'course': course,
+        'year': year,
+        'grade': rng.choice(['A', 'B', 'C']),
+    }
+
+def certificate_lines(fields, institution_name='Ranchi University'):
+    """Lines of text printed on a rendered certificate, title lines first"""
+    return [
+        institution_name,
+        'Degree Certificate',
+        f"Certificate No: {fields['certificate_number']}",
+        f"This is to certify that {fields['student_name']}",
+        f"Roll No: {fields['roll_number']}",
+        f"has been awarded the degree of {fields['course']}",
+        f"Passing Year: {fields['year']}",
+        f"Grade: {fields['grade']}",
+    ]
+
+def render_certificate_image(fields, institution_name='Ranchi University', dpi=300):
+    """Render certificate fields onto an A4 page the way a scan would look"""
+    from PIL import Image, ImageDraw, ImageFont
+    
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.truetype('DejaVuSans.ttf', dpi // 6)
+        title_font = ImageFont.truetype('DejaVuSans.ttf', dpi // 4)
+    except OSError:
+        font = title_font = ImageFont.load_default()
+    
+    y = height // 8
+    for number, text in enumerate(certificate_lines(fields, institution_name)):
+        draw.text((width // 10, y), text, fill=0, font=title_font if number < 2 else font)
+        y += dpi // 2
+    
+    return image
+
+# Universities and colleges of Jharkhand as (name, code, type)
+INSTITUTIONS = [
+    ('Ranchi University', 'RU', 'University'), ('Birla Institute of Technology', 'BIT', 'Institute'),
+    ('Central University of Jharkhand', 'CUJ', 'University'), ("St. Xavier's College", 'SXC', 'College'),
+    ('Vinoba Bhave University', 'VBU', 'University'), ('Sido Kanhu Murmu University', 'SKMU', 'University'),
+    ('Kolhan University', 'KU', 'University'), ('Nilamber-Pitamber University', 'NPU', 'University'),
+    ('Binod Bihari Mahto Koyalanchal University', 'BBMKU', 'University'),
+    ('Government Polytechnic Ranchi', 'GPR', 'Polytechnic'), ('Xavier Institute of Social Service', 'XISS', 'Institute'),
+    ('Dr. Shyama Prasad Mukherjee University', 'DSPMU', 'University'),
+]
+
+def institutions(count):
+    """(name, code, type) of ``count`` institutions, numbering further campuses when needed"""
+    chosen = []
+    for index in range(count):
+        name, code, kind = INSTITUTIONS[index % len(INSTITUTIONS)]
+        campus = index // len(INSTITUTIONS)
+        chosen.append((f'{name} Campus {campus + 1}', f'{code}{campus + 1}', kind) if campus else (name, code, kind))
+    return chosen
+
+def registry_ledger(rng, institution_codes, count):
+    """Ledger rows (as read from a registry file) of ``count`` certificates spread over institutions"""
+    for serial in range(count):
+        code = rng.choice(institution_codes)
+        fields = certificate_fields(rng, serial, institution_code=code)
+        yield serial + 2, {
+            'certificate_number': fields['certificate_number'], 'student_name': fields['student_name'],
+            'student_roll_number': fields['roll_number'], 'course_name': fields['course'],
+            'degree_type': fields['course'].split()[0], 'passing_year': fields['year'], 'grade': fields['grade'],
+            'issue_date': f"{fields['year']}-06-30", 'institution_code': code
+        }
+
+# Document variants: whether each should verify as VALID, and how it is derived from a registry row
+VARIANTS = {
+    'genuine': True,  # Clean scan of a registered certificate
+    'degraded': True,  # Same, rotated, blurred and speckled like a phone photo
+    'forged_name': False,  # Real certificate number with another student's name
+    'forged_year': False,  # Passing year changed
+    'forged_number': False,  # Certificate number that was never issued
+    'fabricated': False,  # Invented institution, number and student
+}
+
+def certificate_variant(rng, row, other_row, variant):
+    """Printed fields of a document of ``variant`` for registry row ``row``"""
+    fields = {'certificate_number': row['certificate_number'], 'student_name': row['student_name'],
+              'roll_number': row['student_roll_number'], 'course': row['course_name'],
+              'year': row['passing_year'], 'grade': row['grade']}
+    if variant == 'forged_name':
+        fields['student_name'] = other_row['student_name']
+    elif variant == 'forged_year':
+        fields['year'] = int(fields['year']) + rng.choice([-3, -2, 2, 3])
+    elif variant == 'forged_number':
+        fields['certificate_number'] = fields['certificate_number'][:-6] + f'{rng.randint(900000, 999999):06d}'
+    elif variant == 'fabricated':
+        fields = certificate_fields(rng, rng.randint(900000, 999999), institution_code='JIU')
+    return fields
+
+def degrade_image(image, rng):
+    """Rotate, blur and speckle a rendered page the way a phone photo of a certificate looks"""
+    from PIL import Image, ImageFilter
+    import numpy as np
+    
+    image = image.rotate(rng.uniform(-2.5, 2.5), expand=True, fillcolor=255)
+    image = image.filter(ImageFilter.GaussianBlur(rng.uniform(0.6, 1.4)))
+    pixels = np.asarray(image).copy()
+    noise = np.random.default_rng(rng.randrange(2 ** 32)).random(pixels.shape)
+    pixels[noise < 0.01] = 0
+    pixels[noise > 0.99] = 255
+    return Image.fromarray(pixels)
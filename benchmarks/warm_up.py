@@ -0,0 +1,139 @@
+"""
+First-request latency of a cold process against a warmed-up one
+
+Seeds a registry once, then starts a fresh interpreter per WARMUP_MODE and measures
+the time to import the application, create it, and have /healthz/ready answer 200,
+followed by the latency of the first upload and of the uploads after it. In preload
+mode the measuring process is forked after create_app, as gunicorn --preload does.
+
+OCR is replaced by the documents' printed text unless a tesseract binary is installed.
+    
+    python -m benchmarks.warm_up [--certificates 50000] [--uploads 10] [--runs 3]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import median
+
+from benchmarks.end_to_end import SimulatedOCR, seed_registry, tesseract_available
+from benchmarks.synthetic import certificate_lines, certificate_variant, render_certificate_image
+
+MODES = ['lazy', 'background', 'preload']
+
+def prepare(directory, certificates, uploads):
+    """Seed the registry and write ``uploads`` rendered certificates with their printed text"""
+    from app import create_app, db
+    from app.schema import create_schema
+    
+    app = create_app(warm_up=False)
+    with app.app_context():
+        create_schema()
+        rng = random.Random(23)
+        rows, institution_names = seed_registry(db, 12, certificates, rng)
+    
+    documents = []
+    for serial, row in enumerate(rng.sample(rows, uploads)):
+        fields = certificate_variant(rng, row, row, 'genuine')
+        institution_name = institution_names[row['institution_code']]
+        path = os.path.join(directory, f'certificate_{serial}.png')
+        render_certificate_image(fields, institution_name, dpi=150).save(path)
+        documents.append((path, '\n'.join(certificate_lines(fields, institution_name))))
+    return documents
+
+def measure(mode, documents, simulate):
+    """Timings of one process starting in ``mode``; runs in a fresh interpreter"""
+    started = time.perf_counter()
+    if simulate:
+        import pytesseract
+        simulated = pytesseract.image_to_string = SimulatedOCR()
+    from app import create_app
+    imported = time.perf_counter()
+    
+    app = create_app()
+    created = time.perf_counter()
+    if mode == 'preload' and os.fork():
+        # The measurement continues in the forked worker
+        _, status = os.wait()
+        os._exit(os.waitstatus_to_exitcode(status))
+    
+    client = app.test_client()
+    while client.get('/healthz/ready').status_code != 200:
+        time.sleep(0.01)
+    ready = time.perf_counter()
+    
+    latencies = []
+    for path, text in documents:
+        if simulate:
+            simulated.document(text)
+        with open(path, 'rb') as document:
+            request_started = time.perf_counter()
+            response = client.post('/upload', data={'certificate': (io.BytesIO(document.read()), os.path.basename(path))},
+                                   content_type='multipart/form-data')
+            latencies.append(time.perf_counter() - request_started)
+        if response.get_json().get('status') != 'VALID':
+            raise RuntimeError(f"{path} did not verify: {response.get_json()}")
+    
+    with open('/proc/self/statm') as statm:
+        rss = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    print(json.dumps({
+        'import_seconds': imported - started,
+        'create_app_seconds': created - imported,
+        'ready_seconds': ready - created,
+        'first_request_ms': latencies[0] * 1000,
+        'later_request_ms': median(latencies[1:]) * 1000 if len(latencies) > 1 else None,
+        'rss_mb': rss
+    }))
+    sys.stdout.flush()
+    os._exit(0)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--certificates', type=int, default=50000)
+    parser.add_argument('--uploads', type=int, default=10)
+    parser.add_argument('--runs', type=int, default=3, help='Processes started per mode; medians are reported')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        request = json.loads(args.child)
+        measure(request['mode'], request['documents'], request['simulate'])
+        return
+    
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        os.environ['UPLOAD_FOLDER'] = os.path.join(directory, 'uploads')
+        # Every upload must run the whole pipeline, and logs are written before the response
+        os.environ['VERIFICATION_CACHE_ENABLED'] = 'false'
+        os.environ['WRITE_BEHIND_ENABLED'] = 'false'
+        simulate = not tesseract_available()
+        if simulate:
+            os.environ['OCR_WORKERS'] = '0'  # Worker processes would not see the simulated text
+        
+        documents = prepare(directory, args.certificates, args.uploads)
+        print(f"{args.certificates:,} certificates, {args.uploads} uploads per process, "
+              f"OCR {'simulated' if simulate else 'tesseract'}")
+        print(f"{'mode':<11} {'import s':>9} {'create s':>9} {'ready s':>8} {'first ms':>9} {'later ms':>9} {'rss MB':>7}")
+        
+        for mode in MODES:
+            environment = dict(os.environ, WARMUP_MODE=mode)
+            request = json.dumps({'mode': mode, 'documents': documents, 'simulate': simulate})
+            runs = []
+            for _ in range(args.runs):
+                output = subprocess.run([sys.executable, '-m', 'benchmarks.warm_up', '--child', request],
+                                        env=environment, capture_output=True, text=True, check=True).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            
+            result = {key: median(run[key] for run in runs) for key in runs[0]}
+            print(f"{mode:<11} {result['import_seconds']:9.2f} {result['create_app_seconds']:9.2f} "
+                  f"{result['ready_seconds']:8.2f} {result['first_request_ms']:9.1f} "
+                  f"{result['later_request_ms']:9.1f} {result['rss_mb']:7.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Cost of recording verification results, and the durability of the write-behind buffer
+
+Records the same verification responses (about a third of them with suspicious-activity
+flags) through the previous ORM path (log object, flush, one object per flag, commit),
+the bulk path with one commit per verification, and the write-behind buffer from
+parallel request threads, with and without waiting for the commit.
+
+With waiting, every returned log_id must already be readable from another connection.
+Without it, every log must be in the database once the buffer is closed.
+    
+    python -m benchmarks.write_path [--verifications 2000] [--threads 8]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+def responses(count, rng):
+    statuses = ['VALID'] * 6 + ['SUSPICIOUS'] * 2 + ['INVALID'] * 2
+    flags = ['CERT_NUMBER_YEAR_MISMATCH', 'GRADE_PERCENTAGE_MISMATCH', 'INVALID_PERCENTAGE_FORMAT', 'FUTURE_DATE']
+    results = []
+    for serial in range(count):
+        status = rng.choice(statuses)
+        results.append({
+            'status': status,
+            'confidence_score': {'VALID': 95, 'SUSPICIOUS': 70, 'INVALID': 10}[status],
+            'extracted_data': {'certificate_number': f'RU/2023/BSC/{serial:06d}', 'student_name': 'Priya Sharma'},
+            'flags': rng.sample(flags, rng.randint(1, 3)) if status != 'VALID' else []
+        })
+    return results
+
+def previous_record(db, result, filename, file_hash):
+    """record_result before the bulk write path"""
+    from app.models import SuspiciousActivity, VerificationLog
+    from app.stats import record_verifications
+    
+    log = VerificationLog(uploaded_filename=filename, file_hash=file_hash, registry_version=1,
+                          extracted_data=result['extracted_data'], verification_status=result['status'],
+                          confidence_score=result['confidence_score'], flags=result['flags'])
+    db.session.add(log)
+    db.session.flush()
+    if result['status'] in ['INVALID', 'SUSPICIOUS']:
+        for flag in result['flags']:
+            db.session.add(SuspiciousActivity(verification_log_id=log.id, activity_type=flag,
+                                              description=f"Detected {flag} in certificate verification",
+                                              severity='HIGH' if result['status'] == 'INVALID' else 'MEDIUM'))
+    record_verifications([result['status']])
+    db.session.commit()
+    return dict(result, log_id=log.id)
+
+def report(label, count, seconds, extra=''):
+    print(f"{label:<34} {count / seconds:8.0f} verifications/s  {seconds * 1000 / count:6.2f} ms each  {extra}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--verifications', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        os.environ['SCHEMA_AUTO_UPGRADE'] = 'true'
+        from app import create_app, db
+        from app.database import read_engine
+        from app.models import VerificationLog
+        from app.verification_engine import CertificateVerifier
+        from app.write_behind import WriteBehindBuffer
+        from sqlalchemy import func, select
+        
+        app = create_app(warm_up=False)
+        results = responses(args.verifications, random.Random(16))
+        
+        with app.app_context():
+            verifier = CertificateVerifier()
+            
+            started = time.perf_counter()
+            for serial, result in enumerate(results):
+                previous_record(db, result, f'{serial}.png', f'orm-{serial}')
+            report('ORM objects, commit each', len(results), time.perf_counter() - started)
+            
+            started = time.perf_counter()
+            for serial, result in enumerate(results):
+                verifier.record_result(result, f'{serial}.png', f'bulk-{serial}', 1)
+            report('bulk statements, commit each', len(results), time.perf_counter() - started)
+            
+            def logged(prefix):
+                return db.session.scalar(select(func.count(VerificationLog.id))
+                                         .where(VerificationLog.file_hash.like(f'{prefix}-%')))
+        
+        for wait in (True, False):
+            prefix = 'wait' if wait else 'nowait'
+            buffer = WriteBehindBuffer(app, verifier.record_results, wait=wait)
+            missing = []
+            
+            def request_thread(worker):
+                with app.app_context(), read_engine().connect() as connection:
+                    for serial in range(worker, len(results), args.threads):
+                        recorded = buffer.record((results[serial], f'{serial}.png', f'{prefix}-{serial}', 1, None, None))
+                        if wait and connection.scalar(select(VerificationLog.id)
+                                                      .where(VerificationLog.id == recorded['log_id'])) is None:
+                            missing.append(serial)
+            
+            threads = [threading.Thread(target=request_thread, args=(worker,)) for worker in range(args.threads)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            acknowledged = time.perf_counter() - started
+            buffer.close()
+            written = time.perf_counter() - started
+            
+            with app.app_context():
+                stored = logged(prefix)
+            stats = buffer.stats()
+            label = f"write-behind, {'wait for commit' if wait else 'no wait'}, {args.threads} threads"
+            report(label, len(results), written,
+                   f"{stats['batches']} transactions, {stored}/{len(results)} logs stored")
+            if wait:
+                print(f"{'':<34} acknowledged logs not yet readable: {len(missing)}")
+            else:
+                print(f"{'':<34} all responses returned after {acknowledged * 1000:.0f} ms, "
+                      f"written by close() after {written * 1000:.0f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+from app import db
+from flask.globals import app_ctx
+from flask_sqlalchemy.query import Query
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, scoped_session
+
+SQLITE_JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SQLITE_SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+def is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+def is_sqlite_memory(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def engine_options(config, url, read_only=False):
+    """create_engine options for ``url`` from the DB_* settings.
+    
+    SQLite keeps Flask-SQLAlchemy's pool defaults and is tuned per connection instead
+    (see init_engines). Server databases get a bounded pool that checks connections
+    before use, and on PostgreSQL a statement timeout and, for the read-only engine,
+    read-only transactions.
+    """
+    if is_sqlite(url):
+        return {}
+    
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING']
+    }
+    
+    if make_url(url).get_backend_name() == 'postgresql':
+        settings = []
+        if config['DB_STATEMENT_TIMEOUT']:
+            settings.append(f"-c statement_timeout={int(config['DB_STATEMENT_TIMEOUT'])}")
+        if read_only:
+            settings.append('-c default_transaction_read_only=on')
+        if settings:
+            options['connect_args'] = {'options': ' '.join(settings)}
+    
+    return options
+
+def _sqlite_pragmas(config, read_only):
+    journal_mode = config['SQLITE_JOURNAL_MODE'].upper()
+    synchronous = config['SQLITE_SYNCHRONOUS'].upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f"Unsupported SQLITE_JOURNAL_MODE: {journal_mode}")
+    if synchronous not in SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f"Unsupported SQLITE_SYNCHRONOUS: {synchronous}")
+    
+    pragmas = [f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}"]
+    if read_only:
+        pragmas.append('PRAGMA query_only=ON')
+    else:
+        # The journal mode is stored in the database file, so the writer sets it
+        pragmas.append(f"PRAGMA journal_mode={journal_mode}")
+    pragmas.append(f"PRAGMA synchronous={synchronous}")
+    return pragmas
+
+def _configure_sqlite(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def _connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def init_engines(app):
+    """Tune SQLite connections and tear down read sessions; call after db.init_app"""
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if engine.dialect.name == 'sqlite':
+                _configure_sqlite(engine, _sqlite_pragmas(app.config, read_only=key == 'readonly'))
+    
+    app.teardown_appcontext(lambda exception: read_session.remove())
+
+def read_engine():
+    """Engine for dashboard and report queries; the primary one when no read-only bind exists"""
+    return db.engines.get('readonly', db.engine)
+
+def _app_ctx_id():
+    return id(app_ctx._get_current_object())
+
+# Session for read-only pages, one per application context like db.session. On SQLite its
+# connections are query_only; on PostgreSQL its transactions are read-only, and with
+# DATABASE_READ_URL it can point at a replica.
+read_session = scoped_session(lambda: Session(bind=read_engine(), query_cls=Query, autoflush=False),
+                              scopefunc=_app_ctx_id)
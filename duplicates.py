@@ -0,0 +1,193 @@
+from app.models import FileSubmission, FileSource, CertificateClaim, VerificationLog, LogArchive
+from app.match_keys import normalize_number, normalize_text
+from app import db
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import aliased
+
+# Earliest sources of a file and names of a certificate number listed per lookup
+MAX_SOURCES = 10
+MAX_NAMES = 10
+
+# Keys per grouped lookup statement, below SQLite's limit of 500 compound SELECTs
+_KEY_BATCH = 200
+
+def _upsert(model, key_columns, rows, executor):
+    """Add the rows' seen_count to existing rows, keeping first_seen_at and moving last_seen_at"""
+    if not rows:
+        return
+    
+    table = model.__table__
+    dialect = executor.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        statement = insert(table)
+        # In key order so concurrent writers lock rows alike
+        executor.execute(statement.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={'seen_count': table.c.seen_count + statement.excluded.seen_count,
+                  'last_seen_at': statement.excluded.last_seen_at}
+        ), sorted(rows, key=lambda row: [row[column] for column in key_columns]))
+    else:
+        for row in sorted(rows, key=lambda row: [row[column] for column in key_columns]):
+            result = executor.execute(
+                update(table).where(*[table.c[column] == row[column] for column in key_columns])
+                .values(seen_count=table.c.seen_count + row['seen_count'], last_seen_at=row['last_seen_at'])
+            )
+            if result.rowcount == 0:
+                executor.execute(table.insert().values(**row))
+
+def _add(aggregates, key, values, seen_at):
+    row = aggregates.get(key)
+    if row is None:
+        aggregates[key] = dict(values, seen_count=1, first_seen_at=seen_at, last_seen_at=seen_at)
+    else:
+        row['seen_count'] += 1
+        row['first_seen_at'] = min(row['first_seen_at'], seen_at)
+        row['last_seen_at'] = max(row['last_seen_at'], seen_at)
+
+def claim_keys(extracted_data):
+    """(certificate number key, student name key) an upload presents, or None without both"""
+    extracted_data = extracted_data or {}
+    number = normalize_number(extracted_data.get('certificate_number'))
+    name = normalize_text(extracted_data.get('student_name'))
+    if not number or not name:
+        return None
+    
+    # OCR can read anything, so keys are cut to the column sizes
+    return (number[:CertificateClaim.certificate_number_key.type.length],
+            name[:CertificateClaim.student_name_key.type.length])
+
+def record_submissions(submissions, session=None):
+    """Count uploads in the current transaction.
+    
+    ``submissions`` are (file_hash, ip_address, extracted_data, seen_at) tuples, one per
+    verification log; they are aggregated so each row takes one upsert.
+    """
+    files, sources, claims = {}, {}, {}
+    for file_hash, ip_address, extracted_data, seen_at in submissions:
+        seen_at = seen_at or datetime.utcnow()
+        if file_hash:
+            _add(files, file_hash, {'file_hash': file_hash}, seen_at)
+            _add(sources, (file_hash, ip_address or ''), {'file_hash': file_hash, 'ip_address': ip_address or ''},
+                 seen_at)
+        
+        keys = claim_keys(extracted_data)
+        if keys:
+            student_name = extracted_data['student_name'].strip()[:CertificateClaim.student_name.type.length]
+            _add(claims, keys, {'certificate_number_key': keys[0], 'student_name_key': keys[1],
+                                'student_name': student_name}, seen_at)
+    
+    executor = session or db.session
+    _upsert(FileSubmission, ['file_hash'], list(files.values()), executor)
+    _upsert(FileSource, ['file_hash', 'ip_address'], list(sources.values()), executor)
+    _upsert(CertificateClaim, ['certificate_number_key', 'student_name_key'], list(claims.values()), executor)
+
+def _first_rows(session, model, key, keys, order_by, limit):
+    """The first ``limit`` rows of each key by ``order_by``, as {key value: rows}.
+    
+    One statement per _KEY_BATCH keys: a UNION ALL of one index range scan with LIMIT per
+    key, so a key with many rows costs no more than one with few.
+    """
+    found = defaultdict(list)
+    keys = sorted(set(keys))
+    for start in range(0, len(keys), _KEY_BATCH):
+        selects = [select(model.__table__).where(key == value).order_by(*order_by).limit(limit).subquery().select()
+                   for value in keys[start:start + _KEY_BATCH]]
+        rows = aliased(model, union_all(*selects).subquery() if len(selects) > 1 else selects[0].subquery())
+        for row in session.query(rows):
+            found[getattr(row, key.key)].append(row)
+    
+    for rows in found.values():
+        rows.sort(key=lambda row: [getattr(row, column.key) for column in order_by])
+    return found
+
+def _no_submissions():
+    return {'seen_count': 0, 'first_seen_at': None, 'last_seen_at': None, 'sources': [], 'more_sources': False}
+
+def files_submissions(file_hashes, session=None):
+    """Earlier uploads of many files, as {file_hash: file_submissions(file_hash)}.
+    
+    Two grouped index lookups whatever the number of files: their rows by primary key,
+    then the first MAX_SOURCES sources of each file seen before by (file_hash, first_seen_at).
+    """
+    session = session or db.session
+    file_hashes = sorted({file_hash for file_hash in file_hashes if file_hash})
+    submissions = {}
+    for start in range(0, len(file_hashes), _KEY_BATCH):
+        submissions.update((submission.file_hash, submission) for submission in session.query(FileSubmission)
+                           .filter(FileSubmission.file_hash.in_(file_hashes[start:start + _KEY_BATCH])))
+    
+    sources = _first_rows(session, FileSource, FileSource.file_hash, submissions,
+                          [FileSource.first_seen_at, FileSource.ip_address], MAX_SOURCES + 1) if submissions else {}
+    found = {}
+    for file_hash in file_hashes:
+        submission = submissions.get(file_hash)
+        if submission is None:
+            found[file_hash] = _no_submissions()
+            continue
+        file_sources = sources.get(file_hash, [])
+        found[file_hash] = {
+            'seen_count': submission.seen_count,
+            'first_seen_at': submission.first_seen_at.isoformat(),
+            'last_seen_at': submission.last_seen_at.isoformat(),
+            'sources': [source.to_dict() for source in file_sources[:MAX_SOURCES]],
+            'more_sources': len(file_sources) > MAX_SOURCES
+        }
+    return found
+
+def file_submissions(file_hash, session=None):
+    """Earlier uploads of a file: how many, when, and its earliest sources"""
+    return files_submissions([file_hash], session).get(file_hash) or _no_submissions()
+
+def certificates_claims(certificate_number_keys, session=None):
+    """Distinct student names presented with each certificate number, as {key: claims}"""
+    keys = [key for key in certificate_number_keys if key]
+    if not keys:
+        return {}
+    return _first_rows(session or db.session, CertificateClaim, CertificateClaim.certificate_number_key, keys,
+                       [CertificateClaim.first_seen_at, CertificateClaim.student_name_key], MAX_NAMES)
+
+def certificate_claims(certificate_number_key, session=None):
+    """Distinct student names uploads have presented with a certificate number, earliest first"""
+    return certificates_claims([certificate_number_key], session).get(certificate_number_key, [])
+
+def rebuild_submissions(batch_size=10000):
+    """Recompute the submission and claim tables from verification logs, hot and archived.
+    
+    Run while no verifications are being written, since it replaces the tables.
+    """
+    from app.log_archive import decode_records
+    
+    for model in (FileSubmission, FileSource, CertificateClaim):
+        model.query.delete()
+    
+    count = 0
+    batch = []
+    
+    def flush():
+        record_submissions(batch)
+        batch.clear()
+    
+    # Archived logs are older than the hot ones, so first_seen_at comes out right
+    for (data,) in db.session.query(LogArchive.data).order_by(LogArchive.id).execution_options(yield_per=1):
+        for record in decode_records(data):
+            created_at = datetime.fromisoformat(record['created_at']) if record.get('created_at') else None
+            batch.append((record.get('file_hash'), record.get('ip_address'), record.get('extracted_data'), created_at))
+            count += 1
+        if len(batch) >= batch_size:
+            flush()
+    
+    logs = db.session.query(VerificationLog.file_hash, VerificationLog.ip_address, VerificationLog.extracted_data,
+                            VerificationLog.created_at).order_by(VerificationLog.id).execution_options(yield_per=batch_size)
+    for row in logs:
+        batch.append(tuple(row))
+        count += 1
+        if len(batch) >= batch_size:
+            flush()
+    
+    flush()
+    db.session.commit()
+    return count
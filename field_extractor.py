@@ -0,0 +1,61 @@
+import re
+
+# A decimal number that opens a pattern, and the same number with its digits matched atomically
+_NUMBER = r'(\d+\.?\d*)'
+_ATOMIC_NUMBER = r'(?<!\d)((?=(\d+))\2\.?(?=(\d*))\3)'
+
+class FieldExtractor:
+    """Extracts certificate fields from OCR text with a pattern set compiled once.
+    
+    For each field the first pattern (in priority order) that matches anywhere in the
+    cleaned text wins, exactly as with ``re.search`` per pattern. Patterns are
+    compiled when the extractor is built, the text is cleaned once, and patterns
+    that would backtrack over long digit runs are rewritten to equivalent forms
+    that match in linear time.
+    """
+    
+    def __init__(self, patterns, flags=re.IGNORECASE):
+        self.patterns = {
+            field: [re.compile(self.linear_pattern(pattern), flags) for pattern in field_patterns]
+            for field, field_patterns in patterns.items()
+        }
+    
+    @staticmethod
+    def linear_pattern(pattern):
+        """Rewrite a pattern that opens with a decimal number so it matches in linear time.
+        
+        When the number can only be followed by optional whitespace and a character that
+        cannot continue it (as in ``(\\d+\\.?\\d*)\\s*%``), the only split of the digits
+        that can match is the greedy one, but ``re`` tries every other split of every
+        digit run first. Lookahead-backreference pairs make the digits atomic, and since
+        the leftmost match always starts at the first digit of a run, it may only start there.
+        """
+        if not pattern.startswith(_NUMBER):
+            return pattern
+        
+        rest = pattern[len(_NUMBER):]
+        follow = rest[len(r'\s*'):] if rest.startswith(r'\s*') else rest
+        if not follow or follow[0] in '\\.[(?*+{|0123456789':
+            return pattern
+        
+        return _ATOMIC_NUMBER + rest
+    
+    @staticmethod
+    def clean(text):
+        """Lowercase text with whitespace runs collapsed to single spaces"""
+        # Same result as re.sub(r'\s+', ' ', text.lower().strip()), without the regex
+        return ' '.join(text.lower().split())
+    
+    def extract(self, text):
+        """Map each field to the first group of its highest-priority matching pattern"""
+        text_clean = self.clean(text)
+        extracted_data = {}
+        
+        for field, patterns in self.patterns.items():
+            for pattern in patterns:
+                match = pattern.search(text_clean)
+                if match:
+                    extracted_data[field] = match.group(1).strip()
+                    break  # Use first matching pattern
+        
+        return extracted_data
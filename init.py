@@ -9,28 +9,109 @@ load_dotenv()
 # Initialize extensions
 db = SQLAlchemy()
 
-def create_app():
+# all serves every page and API; dashboard serves everything but verification
+APP_ROLES = ('all', 'dashboard')
+
+def create_app(warm_up=True, manage_schema=True):
+    """Create the application.
+    
+    Command-line tools and job workers pass ``warm_up=False`` (engine objects are then
+    built on first use), and processes started by an already running application pass
+    ``manage_schema=False``.
+    """
     app = Flask(__name__, template_folder='../templates')
     
+    # Receive uploads into hashing in-memory buffers instead of saving them to disk
+    from app.upload_stream import UploadRequest
+    app.request_class = UploadRequest
+    
     # Configuration
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///certificates.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['DATABASE_READ_URL'] = os.getenv('DATABASE_READ_URL', app.config['SQLALCHEMY_DATABASE_URI'])  # Dashboard and reports
+    app.config['SQLITE_JOURNAL_MODE'] = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_BUSY_TIMEOUT'] = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # Milliseconds
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    app.config['DB_STATEMENT_TIMEOUT'] = int(os.getenv('DB_STATEMENT_TIMEOUT', 30000))  # Milliseconds, 0 disables
     app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
     app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 16777216))  # 16MB
+    app.config['UPLOAD_SPOOL_SIZE'] = int(os.getenv('UPLOAD_SPOOL_SIZE', 4194304))  # Uploads above 4MB spill to a temp file
+    app.config['NAME_INDEX_ENABLED'] = os.getenv('NAME_INDEX_ENABLED', 'true').lower() == 'true'
+    app.config['SCORING_BACKEND'] = os.getenv('SCORING_BACKEND', 'rapidfuzz')  # rapidfuzz or fuzzywuzzy
+    app.config['JOB_QUEUE_BACKEND'] = os.getenv('JOB_QUEUE_BACKEND', 'sql')  # sql or memory
+    app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 2))
+    app.config['OCR_WORKERS'] = int(os.getenv('OCR_WORKERS', 0))  # 0 runs OCR in the request thread
+    app.config['OCR_QUEUE_SIZE'] = int(os.getenv('OCR_QUEUE_SIZE', app.config['OCR_WORKERS'] * 2))
+    app.config['OCR_TIMEOUT'] = int(os.getenv('OCR_TIMEOUT', 30))
+    app.config['OCR_SUBMIT_TIMEOUT'] = float(os.getenv('OCR_SUBMIT_TIMEOUT', 5))
+    app.config['OCR_TARGET_DPI'] = int(os.getenv('OCR_TARGET_DPI', 300))  # 0 keeps scans at full resolution
+    app.config['OCR_DESKEW'] = os.getenv('OCR_DESKEW', 'false').lower() == 'true'
+    app.config['OCR_CROP'] = os.getenv('OCR_CROP', 'false').lower() == 'true'
+    app.config['VERIFICATION_CACHE_ENABLED'] = os.getenv('VERIFICATION_CACHE_ENABLED', 'true').lower() == 'true'
+    app.config['VERIFICATION_CACHE_SIZE'] = int(os.getenv('VERIFICATION_CACHE_SIZE', 1024))
+    app.config['INSTITUTION_CACHE_CHECK_INTERVAL'] = float(os.getenv('INSTITUTION_CACHE_CHECK_INTERVAL', 5))  # Seconds between version checks
+    app.config['WRITE_BEHIND_ENABLED'] = os.getenv('WRITE_BEHIND_ENABLED', 'false').lower() == 'true'
+    app.config['WRITE_BEHIND_BATCH_SIZE'] = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 100))
+    app.config['WRITE_BEHIND_INTERVAL'] = float(os.getenv('WRITE_BEHIND_INTERVAL', 0.05))  # Seconds an entry may wait without WRITE_BEHIND_WAIT
+    app.config['WRITE_BEHIND_WAIT'] = os.getenv('WRITE_BEHIND_WAIT', 'true').lower() == 'true'  # false: respond before commit
+    app.config['LOG_RETENTION_DAYS'] = int(os.getenv('LOG_RETENTION_DAYS', 90))  # Days logs stay in verification_logs
+    app.config['LOG_ARCHIVE_RETENTION_DAYS'] = int(os.getenv('LOG_ARCHIVE_RETENTION_DAYS', 0))  # 0 keeps archives forever
+    app.config['LOG_ARCHIVE_CHUNK_SIZE'] = int(os.getenv('LOG_ARCHIVE_CHUNK_SIZE', 10000))
+    app.config['SEARCH_INDEX_ENABLED'] = os.getenv('SEARCH_INDEX_ENABLED', 'true').lower() == 'true'
+    app.config['REGISTRY_IMPORT_CHUNK_SIZE'] = int(os.getenv('REGISTRY_IMPORT_CHUNK_SIZE', 5000))  # Rows per import transaction
+    app.config['METRICS_LOG_STAGE_TIMINGS'] = os.getenv('METRICS_LOG_STAGE_TIMINGS', 'false').lower() == 'true'  # Store stage timings on each log
+    app.config['DUPLICATE_DETECTION_ENABLED'] = os.getenv('DUPLICATE_DETECTION_ENABLED', 'true').lower() == 'true'  # Count uploads per file and names per certificate number
+    app.config['APP_ROLE'] = os.getenv('APP_ROLE', 'all')  # all, or dashboard for nodes that never verify
+    app.config['WARMUP_MODE'] = os.getenv('WARMUP_MODE', 'background')  # background, preload or lazy
+    app.config['SCHEMA_AUTO_UPGRADE'] = os.getenv('SCHEMA_AUTO_UPGRADE', 'false').lower() == 'true'  # true: create and upgrade the schema on start (development)
+    app.config['BATCH_OCR_THREADS'] = int(os.getenv('BATCH_OCR_THREADS', 4))
+    app.config['BATCH_WRITE_SIZE'] = int(os.getenv('BATCH_WRITE_SIZE', 50))
+    app.config['BATCH_MAX_FILES'] = int(os.getenv('BATCH_MAX_FILES', 1000))
+    
+    # Dashboard nodes never load the OCR stack: no OCR workers, nothing to warm up, and
+    # the verification endpoints answer 503
+    if app.config['APP_ROLE'] not in APP_ROLES:
+        raise ValueError(f"Unsupported APP_ROLE: {app.config['APP_ROLE']}")
+    if app.config['APP_ROLE'] == 'dashboard':
+        app.config['OCR_WORKERS'] = 0
+        app.config['WARMUP_MODE'] = 'lazy'
+    
+    # Engine options for the primary database and the read-only engine
+    from app.database import engine_options, is_sqlite_memory
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI'])
+    if not is_sqlite_memory(app.config['DATABASE_READ_URL']):
+        app.config['SQLALCHEMY_BINDS'] = {'readonly': dict(
+            engine_options(app.config, app.config['DATABASE_READ_URL'], read_only=True),
+            url=app.config['DATABASE_READ_URL'])}
     
     # Create upload directory
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
     # Initialize extensions with app
     db.init_app(app)
+    from app.database import init_engines
+    init_engines(app)
     
     # Register blueprints
     from app.routes import main
     app.register_blueprint(main)
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
+    # Create database tables and any indexes missing from existing tables; deployments run
+    # manage.py upgrade-schema once instead of every worker doing it on start
+    if manage_schema and app.config['SCHEMA_AUTO_UPGRADE']:
+        with app.app_context():
+            from app.schema import create_schema
+            create_schema()
+    
+    # Build the verifier, indexes and caches before the first request instead of during it
+    if warm_up:
+        from app.warmup import init_warm_up
+        init_warm_up(app)
     
     return app
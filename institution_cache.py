@@ -0,0 +1,106 @@
+from app.models import Institution, RegistryVersion
+from app import db
+from collections import namedtuple
+from flask import current_app, has_app_context
+import threading
+import time
+
+# Detached, read-only copy of an institution row, safe to share between requests and threads
+CachedInstitution = namedtuple('CachedInstitution', ['id', 'name', 'code', 'type', 'is_active'])
+
+_cache_lock = threading.Lock()
+
+class InstitutionCache:
+    """Read-through cache of the whole institutions table.
+    
+    Institutions are few and rarely change, so verification reads them from memory
+    instead of lazy-loading ``certificate.institution`` per response. Every institution
+    write bumps the 'institutions' counter in registry_versions; the cache compares
+    its version with the stored one at most every ``check_interval`` seconds and
+    reloads when they differ, so other processes pick up changes within that interval.
+    A caller passing the registry version it read gets the check at once whenever that
+    version moved since the last one, so results cached under a version never reflect
+    institutions older than it. ``invalidate()`` drops the local copy at once, e.g.
+    right after add_institution.
+    """
+    
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.institutions = None
+        self.version = None
+        self.checked_at = 0.0
+        self.registry_version = None  # Newest registry version checked against
+        
+        self.loads = 0
+    
+    def all(self, registry_version=None):
+        """Map of institution id to CachedInstitution, reloaded when the version changed"""
+        with self.lock:
+            institutions, version, checked_at = self.institutions, self.version, self.checked_at
+            checked_registry_version = self.registry_version
+        
+        now = time.monotonic()
+        registry_moved = registry_version is not None and (checked_registry_version is None
+                                                           or registry_version > checked_registry_version)
+        if institutions is not None and now - checked_at < self.check_interval and not registry_moved:
+            return institutions
+        
+        # Read the version before the rows: a write in between only causes one extra reload
+        current = RegistryVersion.current('institutions')
+        if institutions is not None and current == version:
+            with self.lock:
+                self.checked_at = now
+                if registry_moved:
+                    self.registry_version = max(registry_version, self.registry_version or 0)
+            return institutions
+        
+        rows = db.session.query(Institution.id, Institution.name, Institution.code,
+                                Institution.type, Institution.is_active).all()
+        institutions = {row.id: CachedInstitution(*row) for row in rows}
+        
+        with self.lock:
+            self.institutions = institutions
+            self.version = current
+            self.checked_at = now
+            if registry_version is not None:
+                self.registry_version = max(registry_version, self.registry_version or 0)
+            self.loads += 1
+        
+        return institutions
+    
+    def get(self, institution_id):
+        """Cached institution by id, reloading once for an id added since the last load"""
+        institution = self.all().get(institution_id)
+        if institution is None and institution_id is not None:
+            self.invalidate()
+            institution = self.all().get(institution_id)
+        return institution
+    
+    def invalidate(self):
+        with self.lock:
+            self.institutions = None
+            self.version = None
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'institutions': len(self.institutions) if self.institutions is not None else 0,
+                'version': self.version,
+                'loads': self.loads
+            }
+
+def get_institution_cache():
+    """Return the application's institution cache, or None outside an application context"""
+    if not has_app_context():
+        return None
+    
+    cache = current_app.extensions.get('institution_cache')
+    if cache is None:
+        with _cache_lock:
+            cache = current_app.extensions.get('institution_cache')
+            if cache is None:
+                cache = InstitutionCache(current_app.config.get('INSTITUTION_CACHE_CHECK_INTERVAL', 5.0))
+                current_app.extensions['institution_cache'] = cache
+    
+    return cache
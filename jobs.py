@@ -0,0 +1,244 @@
+from app.models import VerificationJob
+from app import db
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from flask import current_app
+import multiprocessing
+import threading
+import uuid
+import os
+
+class SQLJobStore:
+    """Job store backed by the verification_jobs table (requires an app context)"""
+    
+    def create(self, job_id, filename):
+        db.session.add(VerificationJob(id=job_id, uploaded_filename=filename, status='QUEUED'))
+        db.session.commit()
+    
+    def _update(self, job_id, **fields):
+        try:
+            VerificationJob.query.filter_by(id=job_id).update(fields)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    
+    def start(self, job_id):
+        self._update(job_id, status='RUNNING', started_at=datetime.utcnow())
+    
+    def finish(self, job_id, result):
+        self._update(job_id, status='COMPLETED', result=result, finished_at=datetime.utcnow())
+    
+    def fail(self, job_id, error):
+        self._update(job_id, status='FAILED', error=error, finished_at=datetime.utcnow())
+    
+    def get(self, job_id):
+        job = db.session.get(VerificationJob, job_id)
+        return job.to_dict() if job else None
+
+class MemoryJobStore:
+    """In-process stand-in for the job store, used for local runs and tests"""
+    
+    def __init__(self):
+        self.jobs = {}
+        self.lock = threading.Lock()
+    
+    def create(self, job_id, filename):
+        with self.lock:
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'filename': filename,
+                'status': 'QUEUED',
+                'result': None,
+                'error': None,
+                'created_at': datetime.utcnow().isoformat(),
+                'started_at': None,
+                'finished_at': None
+            }
+    
+    def _update(self, job_id, **fields):
+        with self.lock:
+            self.jobs[job_id].update(fields)
+    
+    def start(self, job_id):
+        self._update(job_id, status='RUNNING', started_at=datetime.utcnow().isoformat())
+    
+    def finish(self, job_id, result):
+        self._update(job_id, status='COMPLETED', result=result, finished_at=datetime.utcnow().isoformat())
+    
+    def fail(self, job_id, error):
+        self._update(job_id, status='FAILED', error=error, finished_at=datetime.utcnow().isoformat())
+    
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+def remove_upload(file_path):
+    """Delete a job's stored upload if it is still there"""
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+def run_verification_job(store, job_id, file_path, filename, ip_address=None, user_agent=None):
+    """Verify an uploaded file and record the outcome on the job (requires an app context)"""
+    # Imported on first use so processes that only report job status never load the OCR stack
+    from app.verification_engine import get_verifier
+    
+    try:
+        store.start(job_id)
+        result = get_verifier().verify_certificate(file_path, filename, ip_address, user_agent)
+        store.finish(job_id, result)
+    except Exception as e:
+        store.fail(job_id, str(e))
+    finally:
+        # Clean up uploaded file
+        remove_upload(file_path)
+
+# Application used by each worker process, created once by the pool initializer
+_worker_app = None
+
+def _init_worker():
+    global _worker_app
+    from app import create_app
+    # The schema is created by manage.py upgrade-schema, never by a worker
+    _worker_app = create_app(warm_up=False, manage_schema=False)
+    
+    # Job workers are already separate processes, so each runs OCR in-process
+    _worker_app.config['OCR_WORKERS'] = 0
+
+def _run_job_in_worker(job_id, file_path, filename, ip_address, user_agent):
+    with _worker_app.app_context():
+        run_verification_job(SQLJobStore(), job_id, file_path, filename, ip_address, user_agent)
+
+class VerificationJobQueue:
+    """Runs verifications in the background and tracks them as jobs.
+    
+    The ``sql`` backend stores jobs in the database and verifies in a pool of worker
+    processes. The ``memory`` backend keeps jobs in a dict and verifies in threads of
+    this process, so the queue can be exercised without any external services.
+    
+    A worker process that dies (out of memory, a crash in Tesseract or a PDF parser)
+    breaks the whole process pool. The pool is then replaced: jobs that had started
+    fail, and jobs still waiting are queued again on the new pool.
+    """
+    
+    # Times a waiting job is queued again after its pool broke, e.g. when workers fail to start
+    max_requeues = 2
+    
+    def __init__(self, app):
+        self.app = app
+        self.backend = app.config.get('JOB_QUEUE_BACKEND', 'sql')
+        self.workers = app.config.get('JOB_WORKERS', 2)
+        self.executor_lock = threading.Lock()
+        self.rebuilds = 0
+        
+        if self.backend == 'memory':
+            self.store = MemoryJobStore()
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='verification-job')
+        elif self.backend == 'sql':
+            self.store = SQLJobStore()
+            self.executor = self._new_process_pool()
+        else:
+            raise ValueError(f"Unsupported job queue backend: {self.backend}")
+    
+    def _new_process_pool(self):
+        # Spawn rather than fork so workers never inherit the web server's threads or connections
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_worker)
+    
+    def _replace_broken(self, executor):
+        """Replace ``executor`` after its pool broke, unless another thread already did"""
+        with self.executor_lock:
+            if self.executor is executor:
+                executor.shutdown(wait=False)
+                self.executor = self._new_process_pool()
+                self.rebuilds += 1
+            return self.executor
+    
+    def submit(self, file_path, filename, ip_address=None, user_agent=None, job_id=None):
+        """Queue a stored upload for verification and return its job id.
+        
+        The queue owns the file from here on and removes it once the job is over,
+        however it ends. ``job_id`` may be chosen beforehand, e.g. to name the file.
+        """
+        job_id = job_id or new_job_id()
+        try:
+            self.store.create(job_id, filename)
+            self._dispatch((job_id, file_path, filename, ip_address, user_agent))
+        except Exception:
+            remove_upload(file_path)
+            raise
+        
+        return job_id
+    
+    def _dispatch(self, job, requeues=0):
+        if self.backend == 'memory':
+            future = self.executor.submit(self._run_in_thread, *job)
+            executor = self.executor
+        else:
+            executor = self.executor
+            try:
+                future = executor.submit(_run_job_in_worker, *job)
+            except BrokenProcessPool:
+                executor = self._replace_broken(executor)
+                future = executor.submit(_run_job_in_worker, *job)
+        
+        future.add_done_callback(lambda f: self._check_crashed(job, requeues, executor, f))
+    
+    def _run_in_thread(self, job_id, file_path, filename, ip_address, user_agent):
+        with self.app.app_context():
+            run_verification_job(self.store, job_id, file_path, filename, ip_address, user_agent)
+    
+    def _check_crashed(self, job, requeues, executor, future):
+        # run_verification_job records its own failures and removes the file; this catches
+        # a worker that died mid-job or a job cancelled before it started
+        job_id, file_path = job[0], job[1]
+        if future.cancelled():
+            remove_upload(file_path)
+            return
+        
+        error = future.exception()
+        if error is None:
+            return
+        
+        with self.app.app_context():
+            if isinstance(error, BrokenProcessPool):
+                # Every job of a broken pool ends here; only those a worker had started were running
+                self._replace_broken(executor)
+                waiting = (self.store.get(job_id) or {}).get('status') == 'QUEUED'
+                if waiting and requeues < self.max_requeues:
+                    try:
+                        self._dispatch(job, requeues + 1)
+                        return
+                    except Exception as e:
+                        error = e
+            
+            remove_upload(file_path)
+            self.store.fail(job_id, f"Worker failed: {error}")
+    
+    def get(self, job_id):
+        """Return the job as a dict, or None if it does not exist"""
+        return self.store.get(job_id)
+    
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """Return the application's job queue, starting its workers on first use"""
+    queue = current_app.extensions.get('job_queue')
+    if queue is None:
+        with _queue_lock:
+            queue = current_app.extensions.get('job_queue')
+            if queue is None:
+                queue = VerificationJobQueue(current_app._get_current_object())
+                current_app.extensions['job_queue'] = queue
+    
+    return queue
@@ -0,0 +1,175 @@
+from app.models import VerificationLog, SuspiciousActivity, LogArchive, ArchivedLog
+from app.search_index import unindex_logs
+from app import db
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, exists, insert, select, update
+import json
+import zlib
+
+# Logs with activities still under investigation stay in verification_logs
+OPEN_ACTIVITY_STATUSES = ('PENDING', 'INVESTIGATING')
+ACTIVITY_STATUSES = OPEN_ACTIVITY_STATUSES + ('RESOLVED', 'FALSE_POSITIVE')
+
+# Rows per IN (...) list, well below SQLite's bound parameter limit
+_ID_BATCH = 500
+
+def month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot archive value of type {type(value).__name__}")
+
+def encode_records(records):
+    """Compress records as zlib'd JSON lines"""
+    lines = '\n'.join(json.dumps(record, default=_json_default, separators=(',', ':')) for record in records)
+    return zlib.compress(lines.encode('utf-8'), 6)
+
+def decode_records(data):
+    return [json.loads(line) for line in zlib.decompress(data).decode('utf-8').split('\n') if line]
+
+def _batches(ids):
+    for start in range(0, len(ids), _ID_BATCH):
+        yield ids[start:start + _ID_BATCH]
+
+def rotate_logs(retention_days=90, chunk_size=10000, now=None):
+    """Move verification logs older than the retention window into compressed archives.
+    
+    Whole months are archived: a log is moved once the month it was written in ended
+    more than ``retention_days`` ago. Each log is stored with its suspicious activities
+    in a LogArchive chunk of at most ``chunk_size`` logs from one month, indexed by log
+    ID and file hash in archived_logs, and deleted from the hot tables in the same
+    transaction. Logs with open suspicious activities are kept until those are resolved.
+    Returns the number of logs archived.
+    """
+    cutoff = month_start((now or datetime.utcnow()) - timedelta(days=retention_days))
+    logs = VerificationLog.__table__
+    activities = SuspiciousActivity.__table__
+    open_activity = exists().where(activities.c.verification_log_id == logs.c.id,
+                                   activities.c.status.in_(OPEN_ACTIVITY_STATUSES))
+    
+    archived = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(logs).where(logs.c.created_at < cutoff, logs.c.id > last_id, ~open_activity)
+            .order_by(logs.c.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        ids = [row.id for row in rows]
+        
+        flagged = defaultdict(list)
+        for batch in _batches(ids):
+            for activity in db.session.execute(select(activities).where(activities.c.verification_log_id.in_(batch))):
+                flagged[activity.verification_log_id].append(activity._asdict())
+        
+        by_period = defaultdict(list)
+        for row in rows:
+            by_period[row.created_at.strftime('%Y-%m')].append(row)
+        
+        for period, period_rows in sorted(by_period.items()):
+            records = [dict(row._asdict(), suspicious_activities=flagged.get(row.id, [])) for row in period_rows]
+            archive = LogArchive(period=period, first_log_id=period_rows[0].id, last_log_id=period_rows[-1].id,
+                                 row_count=len(period_rows), data=encode_records(records))
+            db.session.add(archive)
+            db.session.flush()
+            
+            db.session.execute(insert(ArchivedLog), [
+                dict(log_id=row.id, archive_id=archive.id, file_hash=row.file_hash,
+                     verification_status=row.verification_status, created_at=row.created_at)
+                for row in period_rows])
+        
+        for batch in _batches(ids):
+            db.session.execute(delete(activities).where(activities.c.verification_log_id.in_(batch)))
+            db.session.execute(delete(logs).where(logs.c.id.in_(batch)))
+            unindex_logs(db.session, batch)
+        db.session.commit()
+        archived += len(rows)
+    
+    return archived
+
+def update_activities(status, activity_ids=None, older_than_days=None, investigated_by=None, notes=None, now=None):
+    """Set the investigation status of suspicious activities; returns how many changed.
+    
+    Activities are picked by ID, or as every open activity created more than
+    ``older_than_days`` ago. Once none of a log's activities is open, rotate_logs
+    archives the log with the others of its month.
+    """
+    if status not in ACTIVITY_STATUSES:
+        raise ValueError(f"Unsupported activity status: {status}")
+    
+    now = now or datetime.utcnow()
+    activities = SuspiciousActivity.__table__
+    values = {'status': status, 'updated_at': now}
+    if investigated_by is not None:
+        values['investigated_by'] = investigated_by
+    if notes is not None:
+        values['investigation_notes'] = notes
+    
+    changed = 0
+    if activity_ids is not None:
+        for batch in _batches(list(activity_ids)):
+            changed += db.session.execute(update(activities).where(activities.c.id.in_(batch)).values(values)).rowcount
+    elif older_than_days is not None:
+        changed = db.session.execute(update(activities).where(
+            activities.c.status.in_(OPEN_ACTIVITY_STATUSES),
+            activities.c.created_at < now - timedelta(days=older_than_days)).values(values)).rowcount
+    db.session.commit()
+    
+    return changed
+
+def purge_archives(retention_days, now=None):
+    """Delete archives of months that ended more than ``retention_days`` ago; returns how many"""
+    cutoff = month_start((now or datetime.utcnow()) - timedelta(days=retention_days)).strftime('%Y-%m')
+    expired = [archive_id for (archive_id,) in
+               db.session.query(LogArchive.id).filter(LogArchive.period < cutoff).all()]
+    
+    for batch in _batches(expired):
+        db.session.execute(delete(ArchivedLog.__table__).where(ArchivedLog.archive_id.in_(batch)))
+        db.session.execute(delete(LogArchive.__table__).where(LogArchive.id.in_(batch)))
+    db.session.commit()
+    
+    return len(expired)
+
+def log_from_record(record):
+    """Transient VerificationLog for an archived record; it is never added to a session"""
+    values = {column.name: record.get(column.name) for column in VerificationLog.__table__.columns}
+    if values['created_at']:
+        values['created_at'] = datetime.fromisoformat(values['created_at'])
+    return VerificationLog(**values)
+
+def archived_log_dict(record):
+    """An archived record in the shape of VerificationLog.to_dict, with its activities"""
+    return dict(log_from_record(record).to_dict(), archived=True,
+                suspicious_activities=record.get('suspicious_activities', []))
+
+def _archived_records(index_rows, session):
+    """Archived records for archived_logs rows, decompressing each archive once"""
+    wanted = defaultdict(set)
+    for row in index_rows:
+        wanted[row.archive_id].add(row.log_id)
+    
+    records = []
+    for archive_id, log_ids in wanted.items():
+        data = session.query(LogArchive.data).filter_by(id=archive_id).scalar()
+        if data is not None:
+            records.extend(record for record in decode_records(data) if record['id'] in log_ids)
+    return sorted(records, key=lambda record: record['id'])
+
+def find_archived_log(log_id, session=None):
+    """Archived record of a log (columns plus its suspicious_activities), or None"""
+    session = session or db.session
+    row = session.get(ArchivedLog, log_id)
+    if row is None:
+        return None
+    records = _archived_records([row], session)
+    return records[0] if records else None
+
+def find_archived_logs(file_hash, session=None):
+    """Archived records of every log of a file, oldest first"""
+    session = session or db.session
+    return _archived_records(session.query(ArchivedLog).filter_by(file_hash=file_hash).all(), session)
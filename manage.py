@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the Certificate Verification System
+    
+    python manage.py upgrade-schema
+    python manage.py rebuild-stats
+    python manage.py backfill-match-keys [--all]
+    python manage.py rotate-logs [--retention-days 90] [--archive-retention-days 0] [--vacuum]
+    python manage.py find-log (--id LOG_ID | --hash FILE_HASH)
+    python manage.py resolve-activities --status RESOLVED (--id ID [ID ...] | --older-than-days DAYS) [--by NAME] [--notes TEXT]
+    python manage.py rebuild-search-index
+    python manage.py rebuild-submissions
+    python manage.py import-certificates LEDGER [--institution CODE] [--insert-only] [--dry-run]
+"""
+
+from app import create_app, db
+import argparse
+import json
+import sys
+import time
+
+def upgrade_schema(args):
+    """Create missing tables, columns and indexes (run once per deploy, before the workers start)"""
+    from app.schema import create_schema
+    
+    started = time.perf_counter()
+    create_schema()
+    print(f"Schema is up to date ({time.perf_counter() - started:.1f}s)")
+
+def rebuild_stats(args):
+    """Rebuild the dashboard counters from the existing verification logs"""
+    from app.stats import rebuild_counters, read_stats
+    
+    count = rebuild_counters()
+    print(f"Rebuilt {count} counters")
+    for name, value in read_stats().items():
+        print(f"  {name}: {value}")
+
+def backfill_match_keys(args):
+    """Compute the normalized match keys of existing certificates"""
+    from app.match_keys import backfill_match_keys as backfill
+    
+    count = backfill(recompute=args.all)
+    print(f"Updated match keys of {count} certificates")
+
+def rotate_logs(args):
+    """Archive verification logs past retention and purge expired archives"""
+    from app.log_archive import rotate_logs as rotate, purge_archives
+    from flask import current_app
+    from sqlalchemy import text
+    
+    config = current_app.config
+    retention_days = args.retention_days if args.retention_days is not None else config['LOG_RETENTION_DAYS']
+    archive_retention_days = (args.archive_retention_days if args.archive_retention_days is not None
+                              else config['LOG_ARCHIVE_RETENTION_DAYS'])
+    
+    count = rotate(retention_days, config['LOG_ARCHIVE_CHUNK_SIZE'])
+    print(f"Archived {count} verification logs older than {retention_days} days")
+    
+    if archive_retention_days:
+        purged = purge_archives(archive_retention_days)
+        print(f"Deleted {purged} archives older than {archive_retention_days} days")
+    
+    # SQLite keeps freed pages in the file until it is rebuilt
+    if args.vacuum and db.engine.dialect.name == 'sqlite':
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text('VACUUM'))
+        print("Vacuumed database")
+
+def resolve_activities(args):
+    """Record the outcome of investigating suspicious activities so their logs can be archived"""
+    from app.log_archive import update_activities
+    
+    count = update_activities(args.status, activity_ids=args.id, older_than_days=args.older_than_days,
+                              investigated_by=args.by, notes=args.notes)
+    print(f"Set {count} suspicious activities to {args.status}")
+
+def find_log(args):
+    """Print verification logs by ID or file hash, including archived ones"""
+    from app.models import VerificationLog
+    from app.log_archive import archived_log_dict, find_archived_log, find_archived_logs
+    
+    if args.id is not None:
+        log = db.session.get(VerificationLog, args.id)
+        archived = [find_archived_log(args.id)] if log is None else []
+    else:
+        log = None
+        archived = find_archived_logs(args.hash)
+    
+    records = [archived_log_dict(record) for record in archived if record]
+    if log is not None:
+        records.append(dict(log.to_dict(), archived=False))
+    elif args.hash:
+        logs = VerificationLog.query.filter_by(file_hash=args.hash).order_by(VerificationLog.id).all()
+        records += [dict(log.to_dict(), archived=False) for log in logs]
+    
+    for record in records:
+        print(json.dumps(record, default=str))
+    if not records:
+        print("No verification logs found")
+
+def rebuild_search_index(args):
+    """Re-create the full-text search index from certificates and verification logs"""
+    from app.search_index import rebuild_search_index as rebuild
+    
+    count = rebuild()
+    print(f"Indexed {count} certificates and verification logs")
+
+def rebuild_submissions(args):
+    """Recompute upload counts per file and student names per certificate number from the logs"""
+    from app.duplicates import rebuild_submissions as rebuild
+    
+    started = time.perf_counter()
+    count = rebuild()
+    print(f"Counted {count} verification logs in {time.perf_counter() - started:.1f}s")
+
+def import_certificates(args):
+    """Import certificates from a CSV or Excel ledger, updating changed ones"""
+    from app.registry_import import import_certificates as run_import, read_ledger
+    from flask import current_app
+    
+    started = time.perf_counter()
+    
+    def progress(report):
+        print(f"  {report.rows} rows read, {report.inserted} inserted, {report.updated} updated, "
+              f"{report.unchanged} unchanged, {len(report.errors)} errors")
+    
+    with open(args.ledger, 'rb') as ledger:
+        report = run_import(read_ledger(ledger, args.ledger), institution_code=args.institution,
+                            update=not args.insert_only, dry_run=args.dry_run,
+                            chunk_size=args.chunk_size or current_app.config['REGISTRY_IMPORT_CHUNK_SIZE'],
+                            progress=progress)
+    
+    for row, message in report.errors:
+        print(f"Row {row}: {message}")
+    elapsed = time.perf_counter() - started
+    print(f"{'Validated' if args.dry_run else 'Imported'} {report.rows} rows in {elapsed:.1f}s "
+          f"({report.rows / elapsed if elapsed else 0:.0f} rows/s)")
+    if report.errors:
+        sys.exit(2)
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Certificate Verification System maintenance')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    commands.add_parser('upgrade-schema', help=upgrade_schema.__doc__).set_defaults(handler=upgrade_schema)
+    
+    commands.add_parser('rebuild-stats', help=rebuild_stats.__doc__).set_defaults(handler=rebuild_stats)
+    
+    backfill_parser = commands.add_parser('backfill-match-keys', help=backfill_match_keys.__doc__)
+    backfill_parser.add_argument('--all', action='store_true', help='Recompute keys that are already set')
+    backfill_parser.set_defaults(handler=backfill_match_keys)
+    
+    rotate_parser = commands.add_parser('rotate-logs', help=rotate_logs.__doc__)
+    rotate_parser.add_argument('--retention-days', type=int, help='Override LOG_RETENTION_DAYS')
+    rotate_parser.add_argument('--archive-retention-days', type=int, help='Override LOG_ARCHIVE_RETENTION_DAYS (0 keeps archives)')
+    rotate_parser.add_argument('--vacuum', action='store_true', help='Reclaim freed space afterwards (SQLite)')
+    rotate_parser.set_defaults(handler=rotate_logs)
+    
+    resolve_parser = commands.add_parser('resolve-activities', help=resolve_activities.__doc__)
+    resolve_parser.add_argument('--status', required=True, choices=['RESOLVED', 'FALSE_POSITIVE', 'INVESTIGATING', 'PENDING'])
+    selection = resolve_parser.add_mutually_exclusive_group(required=True)
+    selection.add_argument('--id', type=int, nargs='+', help='Suspicious activity IDs')
+    selection.add_argument('--older-than-days', type=int, help='Every open activity created longer ago than this')
+    resolve_parser.add_argument('--by', help='Investigator recorded as investigated_by')
+    resolve_parser.add_argument('--notes', help='Investigation notes')
+    resolve_parser.set_defaults(handler=resolve_activities)
+    
+    find_parser = commands.add_parser('find-log', help=find_log.__doc__)
+    lookup = find_parser.add_mutually_exclusive_group(required=True)
+    lookup.add_argument('--id', type=int, help='Verification log ID')
+    lookup.add_argument('--hash', help='SHA-256 hash of the uploaded file')
+    find_parser.set_defaults(handler=find_log)
+    
+    commands.add_parser('rebuild-search-index', help=rebuild_search_index.__doc__).set_defaults(handler=rebuild_search_index)
+    
+    commands.add_parser('rebuild-submissions', help=rebuild_submissions.__doc__).set_defaults(handler=rebuild_submissions)
+    
+    import_parser = commands.add_parser('import-certificates', help=import_certificates.__doc__)
+    import_parser.add_argument('ledger', help='CSV or .xlsx file with a header row')
+    import_parser.add_argument('--institution', help='Institution code of rows without an institution_code column')
+    import_parser.add_argument('--insert-only', action='store_true', help='Report existing certificates instead of updating them')
+    import_parser.add_argument('--dry-run', action='store_true', help='Only validate the rows')
+    import_parser.add_argument('--chunk-size', type=int, help='Override REGISTRY_IMPORT_CHUNK_SIZE')
+    import_parser.set_defaults(handler=import_certificates)
+    
+    args = parser.parse_args()
+    app = create_app(warm_up=False, manage_schema=args.handler is not upgrade_schema)
+    
+    with app.app_context():
+        try:
+            args.handler(args)
+        except Exception as e:
+            print(f"Error: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+from functools import lru_cache
+import hashlib
+import re
+
+_SOUNDEX_CODES = {}
+for _letters, _code in [('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'), ('mn', '5'), ('r', '6')]:
+    for _letter in _letters:
+        _SOUNDEX_CODES[_letter] = _code
+
+@lru_cache(maxsize=65536)
+def normalize_text(text):
+    """Normalize text for better matching"""
+    if not text:
+        return ""
+    
+    # Convert to lowercase and remove extra spaces
+    normalized = re.sub(r'\s+', ' ', text.lower().strip())
+    
+    # Remove common prefixes and suffixes
+    normalized = re.sub(r'^(mr\.?|ms\.?|dr\.?)\s+', '', normalized)
+    normalized = re.sub(r'\s+(jr\.?|sr\.?|ii|iii)$', '', normalized)
+    
+    return normalized
+
+def normalize_number(number):
+    """Certificate or roll number as compared by the matcher"""
+    return number.upper() if number else None
+
+def series_end(number):
+    """Index of the separator ending a certificate number's series (RU/2023/BSC/), or -1"""
+    return max(number.rfind('/'), number.rfind('-'))
+
+def number_serial(number):
+    """Serial of a normalized certificate number after its series (001234 for RU/2023/BSC/001234).
+    
+    A number without a series is its own serial.
+    """
+    if not number:
+        return None
+    return number[series_end(number) + 1:] or number
+
+@lru_cache(maxsize=16384)
+def soundex(word):
+    """American Soundex code of a single word, e.g. 'mahto' and 'mahato' -> 'm300'"""
+    letters = [char for char in word.lower() if 'a' <= char <= 'z']
+    if not letters:
+        return ''
+    
+    code = letters[0]
+    previous = _SOUNDEX_CODES.get(letters[0])
+    for char in letters[1:]:
+        digit = _SOUNDEX_CODES.get(char)
+        if digit is not None and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code, vowels do
+        if char not in 'hw':
+            previous = digit
+    
+    return code.ljust(4, '0')
+
+@lru_cache(maxsize=65536)
+def phonetic_key(normalized_name):
+    """Soundex code of each word of a normalized name, in order"""
+    return ' '.join(code for code in (soundex(word) for word in normalized_name.split()) if code)
+
+def certificate_match_keys(certificate_number, student_name, student_roll_number, course_name):
+    """Column values the verifier matches on instead of normalizing each row per request"""
+    student_name_key = normalize_text(student_name)
+    certificate_number_key = normalize_number(certificate_number)
+    return {
+        'certificate_number_key': certificate_number_key,
+        'certificate_serial_key': number_serial(certificate_number_key),
+        'roll_number_key': normalize_number(student_roll_number),
+        'student_name_key': student_name_key,
+        'student_name_phonetic': phonetic_key(student_name_key),
+        'course_name_key': normalize_text(course_name)
+    }
+
+# Registry fields covered by certificate_hash, in hashing order
+HASHED_FIELDS = ['certificate_number', 'institution_id', 'student_name', 'student_roll_number', 'course_name',
+                 'degree_type', 'passing_year', 'grade', 'percentage', 'issue_date']
+
+def _hash_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, float):
+        return repr(value)
+    return str(value).strip()
+
+def certificate_hash(values):
+    """SHA-256 of a certificate's registry fields; a re-imported row with the same hash is unchanged"""
+    canonical = '\x1f'.join(_hash_value(values.get(field)) for field in HASHED_FIELDS)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def backfill_match_keys(recompute=False, batch_size=1000):
+    """Fill in the match keys and hashes of certificates written before they existed.
+    
+    With ``recompute`` every row is rewritten, e.g. after normalization rules change.
+    Returns the number of certificates updated.
+    """
+    from app.models import Certificate
+    from app import db
+    from sqlalchemy import bindparam, or_, select, update
+    
+    table = Certificate.__table__
+    key_columns = ['certificate_number_key', 'certificate_serial_key', 'roll_number_key', 'student_name_key',
+                   'student_name_phonetic', 'course_name_key', 'certificate_hash']
+    
+    # Keep updated_at as it was; only derived columns change
+    statement = update(table).where(table.c.id == bindparam('row_id')).values(
+        updated_at=table.c.updated_at, **{column: bindparam(column) for column in key_columns})
+    
+    updated = 0
+    last_id = 0
+    while True:
+        query = select(table.c.id, *(table.c[field] for field in HASHED_FIELDS)).where(table.c.id > last_id)
+        if not recompute:
+            query = query.where(or_(table.c.certificate_number_key.is_(None), table.c.certificate_serial_key.is_(None),
+                                    table.c.certificate_hash.is_(None)))
+        rows = db.session.execute(query.order_by(table.c.id).limit(batch_size)).all()
+        if not rows:
+            break
+        
+        db.session.execute(statement, [
+            dict(certificate_match_keys(row.certificate_number, row.student_name, row.student_roll_number,
+                                        row.course_name),
+                 certificate_hash=certificate_hash(row._asdict()), row_id=row.id)
+            for row in rows])
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+    
+    return updated
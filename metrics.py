@@ -0,0 +1,220 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import current_app, has_app_context
+import threading
+import time
+
+# Upper bounds in seconds; OCR of a page takes seconds, matching and writes milliseconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic count per label combination"""
+    
+    type = 'counter'
+    
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+    
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+    
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for label_values, value in sorted(values.items()):
+            yield self.name, _label_text(self.labels, label_values), value
+
+class Histogram:
+    """Observations per label combination, counted into cumulative ``le`` buckets"""
+    
+    type = 'histogram'
+    
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        
+        # label values -> [count per bucket (+Inf last), sum]
+        self.values = {}
+    
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(label_values)
+            if state is None:
+                state = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+    
+    def samples(self):
+        with self.lock:
+            values = {label_values: (list(counts), total) for label_values, (counts, total) in self.values.items()}
+        for label_values, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield (f'{self.name}_bucket', _label_text(self.labels + ('le',), label_values + (_number(bound),)),
+                       cumulative)
+            yield f'{self.name}_count', _label_text(self.labels, label_values), cumulative
+            yield f'{self.name}_sum', _label_text(self.labels, label_values), total
+
+class MetricsRegistry:
+    """Metrics of this process, rendered in the Prometheus text exposition format.
+    
+    ``collectors`` are called at render time and return (name, type, help, samples)
+    tuples for values that already live elsewhere, such as the OCR pool counters.
+    """
+    
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+    
+    def counter(self, name, documentation, labels=()):
+        metric = Counter(name, documentation, labels)
+        self.metrics.append(metric)
+        return metric
+    
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+    
+    def render(self):
+        families = [(metric.name, metric.type, metric.documentation, metric.samples()) for metric in self.metrics]
+        for collect in self.collectors:
+            families.extend(collect())
+        
+        lines = []
+        for name, metric_type, documentation, samples in families:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for sample_name, labels, value in samples:
+                lines.append(f'{sample_name}{labels} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    'certificate_verification_stage_seconds', 'Time spent in each stage of a verification', ['stage'])
+stage_errors = registry.counter(
+    'certificate_verification_stage_errors_total', 'Stages that raised an exception', ['stage'])
+verification_seconds = registry.histogram(
+    'certificate_verification_seconds', 'Time to verify a certificate, by outcome', ['status'])
+verifications = registry.counter(
+    'certificate_verifications_total', 'Verification logs written, by status', ['status'])
+verification_flags = registry.counter(
+    'certificate_verification_flags_total', 'Anomaly and forgery flags raised', ['flag'])
+
+_local = threading.local()
+
+class StageTrace:
+    """Seconds per stage of one verification, summed when a stage runs more than once"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+    
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+    
+    def elapsed(self):
+        return time.perf_counter() - self.started
+    
+    def timings(self):
+        """Stage durations in milliseconds, as stored on the verification log"""
+        return {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()}
+
+@contextmanager
+def stage(name):
+    """Time a block into the stage histogram and the verification traced in this thread"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(name)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        stage_seconds.observe(seconds, name)
+        trace = getattr(_local, 'trace', None)
+        if trace is not None:
+            trace.add(name, seconds)
+
+@contextmanager
+def trace_stages():
+    """Collect the stages timed in this thread into a StageTrace until the block exits"""
+    previous = getattr(_local, 'trace', None)
+    trace = _local.trace = StageTrace()
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+# Stats of the OCR pool, verification cache and write-behind buffer: (key, metric suffix, type, help)
+COMPONENT_STATS = {
+    'ocr_pool': [
+        ('in_flight', 'in_flight', 'gauge', 'OCR jobs running or queued'),
+        ('queued', 'queued', 'gauge', 'OCR jobs waiting for a worker'),
+        ('capacity', 'capacity', 'gauge', 'OCR jobs the pool accepts at once'),
+        ('submitted', 'submitted_total', 'counter', 'OCR jobs submitted'),
+        ('failed', 'failed_total', 'counter', 'OCR jobs that failed'),
+        ('timed_out', 'timed_out_total', 'counter', 'OCR jobs that timed out'),
+        ('rejected', 'rejected_total', 'counter', 'OCR jobs rejected because the queue was full'),
+        ('crashed', 'crashed_total', 'counter', 'OCR jobs lost to a worker process that died'),
+        ('rebuilds', 'rebuilds_total', 'counter', 'Times the pool was restarted after a worker died')
+    ],
+    'verification_cache': [
+        ('entries', 'entries', 'gauge', 'Results held in memory'),
+        ('memory_hits', 'memory_hits_total', 'counter', 'Lookups answered from memory'),
+        ('persistent_hits', 'persistent_hits_total', 'counter', 'Lookups answered from verification_logs'),
+        ('misses', 'misses_total', 'counter', 'Lookups that needed a full verification')
+    ],
+    'write_behind': [
+        ('pending', 'pending', 'gauge', 'Verification logs waiting to be written'),
+        ('written', 'written_total', 'counter', 'Verification logs written'),
+        ('failed', 'failed_total', 'counter', 'Verification logs that could not be written')
+    ]
+}
+
+def _component_stats():
+    """Stats of the application's components that have been started in this process"""
+    if not has_app_context():
+        return []
+    
+    families = []
+    for extension, fields in COMPONENT_STATS.items():
+        component = current_app.extensions.get(extension)
+        if component is None:
+            continue
+        stats = component.stats()
+        for key, suffix, metric_type, documentation in fields:
+            families.append((f'certificate_{extension}_{suffix}', metric_type, documentation, [
+                (f'certificate_{extension}_{suffix}', '', stats[key])]))
+    return families
+
+registry.collectors.append(_component_stats)
+
+def record_outcomes(statuses, flags):
+    """Count written verification logs by status, and the flags they raised"""
+    for status in statuses:
+        verifications.inc(status)
+    for flag in flags:
+        verification_flags.inc(flag)
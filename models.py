@@ -1,6 +1,7 @@
 from app import db
 from datetime import datetime
-from sqlalchemy import Text, JSON
+from app.match_keys import HASHED_FIELDS, certificate_hash, certificate_match_keys
+from sqlalchemy import Text, JSON, event, insert, update
 
 class Institution(db.Model):
     """Model for educational institutions in Jharkhand"""
@@ -33,13 +34,13 @@ class Certificate(db.Model):
     student_roll_number = db.Column(db.String(50))
     course_name = db.Column(db.String(200), nullable=False)
     degree_type = db.Column(db.String(50), nullable=False)  # Bachelor, Master, Diploma, etc.
-    passing_year = db.Column(db.Integer, nullable=False)
+    passing_year = db.Column(db.Integer, nullable=False, index=True)
     grade = db.Column(db.String(20))
     percentage = db.Column(db.Float)
     issue_date = db.Column(db.Date, nullable=False)
     
     # Foreign key to institution
-    institution_id = db.Column(db.Integer, db.ForeignKey('institutions.id'), nullable=False)
+    institution_id = db.Column(db.Integer, db.ForeignKey('institutions.id'), nullable=False, index=True)
     
     # Additional metadata
     cert_metadata = db.Column(JSON)  # Store additional certificate details as JSON
@@ -52,8 +53,43 @@ class Certificate(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Composite unique constraint
-    __table_args__ = (db.UniqueConstraint('certificate_number', 'institution_id'),)
+    # Normalized match keys, kept in sync on every write (see app.match_keys)
+    certificate_number_key = db.Column(db.String(50), index=True)  # Uppercased certificate number
+    certificate_serial_key = db.Column(db.String(50), index=True)  # Its serial after the series (RU/2023/BSC/)
+    roll_number_key = db.Column(db.String(50), index=True)  # Uppercased roll number
+    student_name_key = db.Column(db.String(100))  # Normalized student name
+    student_name_phonetic = db.Column(db.String(100), index=True)  # Soundex code per name word
+    course_name_key = db.Column(db.String(200))  # Normalized course name
+    
+    # Composite unique constraint; (created_at, id) serves the newest-first listing and
+    # updated_at the name index's reads of certificates written by other processes
+    __table_args__ = (db.UniqueConstraint('certificate_number', 'institution_id'),
+                      db.Index('ix_certificates_created_at_id', 'created_at', 'id'),
+                      db.Index('ix_certificates_updated_at', 'updated_at'))
+    
+    def update_match_keys(self):
+        """Recompute the normalized match keys and the certificate hash from the certificate fields"""
+        keys = certificate_match_keys(self.certificate_number, self.student_name,
+                                      self.student_roll_number, self.course_name)
+        for column, value in keys.items():
+            setattr(self, column, value)
+        self.certificate_hash = certificate_hash({field: getattr(self, field) for field in HASHED_FIELDS})
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'certificate_number': self.certificate_number,
+            'student_name': self.student_name,
+            'student_roll_number': self.student_roll_number,
+            'course_name': self.course_name,
+            'degree_type': self.degree_type,
+            'passing_year': self.passing_year,
+            'grade': self.grade,
+            'percentage': self.percentage,
+            'issue_date': self.issue_date.isoformat() if self.issue_date else None,
+            'institution_id': self.institution_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
     
     def __repr__(self):
         return f'<Certificate {self.certificate_number} - {self.student_name}>'
@@ -66,6 +102,9 @@ class VerificationLog(db.Model):
     uploaded_filename = db.Column(db.String(255), nullable=False)
     file_hash = db.Column(db.String(64))
     
+    # Registry version the result was computed against, used to reuse results for re-uploads
+    registry_version = db.Column(db.Integer)
+    
     # Extracted data from OCR
     extracted_data = db.Column(JSON)
     
@@ -81,11 +120,32 @@ class VerificationLog(db.Model):
     ip_address = db.Column(db.String(45))
     user_agent = db.Column(Text)
     
+    # Milliseconds per verification stage, when METRICS_LOG_STAGE_TIMINGS is on
+    stage_timings = db.Column(JSON)
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship with matched certificate
     matched_certificate = db.relationship('Certificate', backref='verification_logs')
     
+    __table_args__ = (db.Index('ix_verification_logs_file_hash_registry_version', 'file_hash', 'registry_version'),
+                      db.Index('ix_verification_logs_created_at_id', 'created_at', 'id'))
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.uploaded_filename,
+            'file_hash': self.file_hash,
+            'status': self.verification_status,
+            'confidence_score': self.confidence_score,
+            'matched_certificate_id': self.matched_certificate_id,
+            'extracted_data': self.extracted_data,
+            'flags': self.flags,
+            'ip_address': self.ip_address,
+            'stage_timings': self.stage_timings,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
     def __repr__(self):
         return f'<VerificationLog {self.uploaded_filename} - {self.verification_status}>'
 
@@ -94,7 +154,7 @@ class SuspiciousActivity(db.Model):
     __tablename__ = 'suspicious_activities'
     
     id = db.Column(db.Integer, primary_key=True)
-    verification_log_id = db.Column(db.Integer, db.ForeignKey('verification_logs.id'), nullable=False)
+    verification_log_id = db.Column(db.Integer, db.ForeignKey('verification_logs.id'), nullable=False, index=True)
     
     # Types of suspicious activity
     activity_type = db.Column(db.String(50), nullable=False)  # FORGED_SIGNATURE, INVALID_SEAL, etc.
@@ -112,5 +172,195 @@ class SuspiciousActivity(db.Model):
     # Relationship with verification log
     verification_log = db.relationship('VerificationLog', backref='suspicious_activities')
     
+    __table_args__ = (db.Index('ix_suspicious_activities_created_at_id', 'created_at', 'id'),
+                      db.Index('ix_suspicious_activities_status_created_at_id', 'status', 'created_at', 'id'))
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'verification_log_id': self.verification_log_id,
+            'activity_type': self.activity_type,
+            'description': self.description,
+            'severity': self.severity,
+            'status': self.status,
+            'investigated_by': self.investigated_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
     def __repr__(self):
         return f'<SuspiciousActivity {self.activity_type} - {self.severity}>'
+
+class LogArchive(db.Model):
+    """Compressed chunk of verification logs moved out of verification_logs (see app.log_archive)"""
+    __tablename__ = 'log_archives'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(7), nullable=False, index=True)  # YYYY-MM the logs were written in
+    first_log_id = db.Column(db.Integer, nullable=False)
+    last_log_id = db.Column(db.Integer, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    
+    # zlib-compressed JSON lines, one complete log (with its suspicious activities) per line
+    data = db.Column(db.LargeBinary, nullable=False)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<LogArchive {self.period} - {self.row_count} logs>'
+
+class ArchivedLog(db.Model):
+    """Where an archived verification log went, so it can still be found by ID or file hash"""
+    __tablename__ = 'archived_logs'
+    
+    log_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    archive_id = db.Column(db.Integer, db.ForeignKey('log_archives.id'), nullable=False, index=True)
+    file_hash = db.Column(db.String(64), index=True)
+    
+    # Kept uncompressed so the dashboard counters can be rebuilt without reading archives
+    verification_status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<ArchivedLog {self.log_id} in {self.archive_id}>'
+
+class VerificationJob(db.Model):
+    """Model for verification requests processed in the background"""
+    __tablename__ = 'verification_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)  # UUID hex returned to the client
+    uploaded_filename = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='QUEUED')  # QUEUED, RUNNING, COMPLETED, FAILED
+    
+    # Verification response once completed, or the failure reason
+    result = db.Column(JSON)
+    error = db.Column(Text)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'filename': self.uploaded_filename,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<VerificationJob {self.id} - {self.status}>'
+
+class RegistryVersion(db.Model):
+    """Counters bumped on writes: 'registry' for any certificate or institution change, 'institutions' for institutions only
+    (and 'match_keys_backfilled', the MATCH_KEYS_VERSION the schema upgrade last filled in)"""
+    __tablename__ = 'registry_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    @classmethod
+    def current(cls, name='registry'):
+        """Current version of the certificate registry (or of another named counter)"""
+        version = db.session.query(cls.version).filter_by(name=name).scalar()
+        return version or 0
+    
+    def __repr__(self):
+        return f'<RegistryVersion {self.name} - {self.version}>'
+
+class StatCounter(db.Model):
+    """Pre-aggregated counters read by the dashboard instead of counting logs"""
+    __tablename__ = 'stat_counters'
+    
+    bucket = db.Column(db.String(10), primary_key=True)  # 'all' or a YYYY-MM-DD day
+    metric = db.Column(db.String(50), primary_key=True)  # verifications.total, verifications.VALID, institutions.active, ...
+    value = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<StatCounter {self.bucket} {self.metric}={self.value}>'
+
+class FileSubmission(db.Model):
+    """Every upload of one file, counted with each verification log for replay detection"""
+    __tablename__ = 'file_submissions'
+    
+    file_hash = db.Column(db.String(64), primary_key=True)
+    seen_count = db.Column(db.Integer, nullable=False, default=0)
+    first_seen_at = db.Column(db.DateTime, nullable=False)
+    last_seen_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<FileSubmission {self.file_hash[:12]} x{self.seen_count}>'
+
+class FileSource(db.Model):
+    """Uploads of one file from one IP address"""
+    __tablename__ = 'file_sources'
+    
+    file_hash = db.Column(db.String(64), primary_key=True)
+    ip_address = db.Column(db.String(45), primary_key=True)  # '' when unknown
+    seen_count = db.Column(db.Integer, nullable=False, default=0)
+    first_seen_at = db.Column(db.DateTime, nullable=False)
+    last_seen_at = db.Column(db.DateTime, nullable=False)
+    
+    # A file's earliest sources come off the index without sorting all of them
+    __table_args__ = (db.Index('ix_file_sources_file_hash_first_seen_at', 'file_hash', 'first_seen_at'),)
+    
+    def to_dict(self):
+        return {
+            'ip_address': self.ip_address or None,
+            'seen_count': self.seen_count,
+            'first_seen_at': self.first_seen_at.isoformat(),
+            'last_seen_at': self.last_seen_at.isoformat()
+        }
+
+class CertificateClaim(db.Model):
+    """Uploads presenting one certificate number with one student name (both as normalized for matching)"""
+    __tablename__ = 'certificate_claims'
+    
+    certificate_number_key = db.Column(db.String(50), primary_key=True)
+    student_name_key = db.Column(db.String(100), primary_key=True)
+    student_name = db.Column(db.String(100), nullable=False)  # As read from the first such upload
+    seen_count = db.Column(db.Integer, nullable=False, default=0)
+    first_seen_at = db.Column(db.DateTime, nullable=False)
+    last_seen_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (db.Index('ix_certificate_claims_number_first_seen_at', 'certificate_number_key', 'first_seen_at'),)
+    
+    def to_dict(self):
+        return {
+            'student_name': self.student_name,
+            'seen_count': self.seen_count,
+            'first_seen_at': self.first_seen_at.isoformat(),
+            'last_seen_at': self.last_seen_at.isoformat()
+        }
+
+def bump_registry_version(connection, name='registry'):
+    """Invalidate cached verification results in the same transaction as a registry change"""
+    table = RegistryVersion.__table__
+    result = connection.execute(
+        update(table).where(table.c.name == name).values(version=table.c.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(name=name, version=1))
+
+@event.listens_for(Certificate, 'before_insert')
+@event.listens_for(Certificate, 'before_update')
+def _certificate_written(mapper, connection, target):
+    target.update_match_keys()
+
+@event.listens_for(Certificate, 'after_insert')
+@event.listens_for(Certificate, 'after_update')
+@event.listens_for(Certificate, 'after_delete')
+@event.listens_for(Institution, 'after_insert')
+@event.listens_for(Institution, 'after_update')
+@event.listens_for(Institution, 'after_delete')
+def _registry_changed(mapper, connection, target):
+    bump_registry_version(connection)
+
+@event.listens_for(Institution, 'after_insert')
+@event.listens_for(Institution, 'after_update')
+@event.listens_for(Institution, 'after_delete')
+def _institutions_changed(mapper, connection, target):
+    bump_registry_version(connection, 'institutions')
@@ -0,0 +1,222 @@
+from array import array
+from collections import Counter
+from datetime import timedelta
+from flask import current_app
+import heapq
+import threading
+
+# Writes stamped before a refresh but committed after it are read again by the next one
+DELTA_OVERLAP = timedelta(seconds=5)
+
+class NameTrigramIndex:
+    """Memory-resident trigram index over certificate student names.
+    
+    Registries repeat the same names many times, so postings hold compact ids of
+    distinct normalized names, and each name id maps to its certificate ids.
+    
+    An index built from the database remembers the registry version it was read at.
+    ``refresh()`` with a newer version adds the certificates written since then by any
+    process (imports, other workers), found by id and updated_at. Deleted certificates
+    stay in the postings; the verifier reads candidates back from the table, so they
+    are never returned.
+    """
+    
+    def __init__(self, normalize):
+        self.normalize = normalize
+        
+        # trigram -> array of name ids
+        self.postings = {}
+        
+        # normalized name <-> name id, name id -> certificate ids and trigram count, certificate id -> name id
+        self.name_ids = {}
+        self.names = []
+        self.name_certificates = []
+        self.name_sizes = array('H')
+        self.certificate_names = {}
+        self.min_size = None  # Trigrams of the shortest indexed name
+        self.lock = threading.Lock()
+        
+        # Registry version and newest certificate id and updated_at read from the database
+        self.registry_version = None
+        self.max_id = 0
+        self.updated_at = None
+        self.refresh_lock = threading.Lock()
+        self.refreshes = 0
+        
+        # Tuning for candidate generation before rescoring
+        self.min_overlap = 0.5  # Fraction of the shorter name's trigrams a candidate must share
+        self.max_candidates = 100  # Distinct names passed to the fuzzy scorer
+    
+    @staticmethod
+    def trigrams(normalized_name):
+        """Character trigrams of each word, padded so word boundaries count"""
+        grams = set()
+        for token in normalized_name.split():
+            padded = f'  {token} '
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return grams
+    
+    @classmethod
+    def from_database(cls, normalize, batch_size=10000):
+        """Build the index from the certificates table"""
+        from app.models import RegistryVersion
+        
+        index = cls(normalize)
+        # Read the version before the rows: a write in between is only read again
+        index.registry_version = RegistryVersion.current()
+        index._load(None, batch_size)
+        return index
+    
+    def _load(self, condition, batch_size=10000):
+        """Add the certificates matching ``condition`` (all when None), moving the watermarks"""
+        from app.models import Certificate
+        from app import db
+        
+        rows = db.session.query(Certificate.id, Certificate.student_name, Certificate.updated_at)
+        if condition is not None:
+            rows = rows.filter(condition)
+        for cert_id, student_name, updated_at in rows.execution_options(yield_per=batch_size):
+            self.add(cert_id, student_name)
+            self.max_id = max(self.max_id, cert_id)
+            if updated_at is not None and (self.updated_at is None or updated_at > self.updated_at):
+                self.updated_at = updated_at
+    
+    def refresh(self, registry_version):
+        """Add certificates written since the index was read, unless it is at ``registry_version`` already"""
+        from app.models import Certificate
+        from sqlalchemy import or_
+        
+        if self.registry_version is not None and registry_version <= self.registry_version:
+            return
+        
+        with self.refresh_lock:
+            if self.registry_version is not None and registry_version <= self.registry_version:
+                return
+            
+            condition = Certificate.id > self.max_id
+            if self.updated_at is not None:
+                condition = or_(condition, Certificate.updated_at >= self.updated_at - DELTA_OVERLAP)
+            self._load(condition)
+            self.registry_version = registry_version
+            self.refreshes += 1
+    
+    def add(self, cert_id, name):
+        """Add or replace a single certificate name"""
+        normalized = self.normalize(name)
+        
+        with self.lock:
+            name_id = self.name_ids.get(normalized)
+            previous = self.certificate_names.get(cert_id)
+            if previous is not None:
+                if previous == name_id:
+                    return
+                self.name_certificates[previous].remove(cert_id)
+            
+            if name_id is None:
+                name_id = self.name_ids[normalized] = len(self.names)
+                grams = self.trigrams(normalized)
+                self.names.append(normalized)
+                self.name_certificates.append(array('I'))
+                self.name_sizes.append(min(len(grams), 65535))
+                if grams and (self.min_size is None or len(grams) < self.min_size):
+                    self.min_size = len(grams)
+                for gram in grams:
+                    postings = self.postings.get(gram)
+                    if postings is None:
+                        postings = self.postings[gram] = array('I')
+                    postings.append(name_id)
+            
+            self.name_certificates[name_id].append(cert_id)
+            self.certificate_names[cert_id] = name_id
+    
+    def __len__(self):
+        return len(self.certificate_names)
+    
+    def candidates(self, normalized_query):
+        """Return (name id, shared trigram count) pairs ranked by overlap.
+        
+        Overlap is measured against the shorter of the two names, so a registry name
+        contained in a longer OCR name ("rahul kumar" in "rahul kumar sharma s/o ...")
+        shares all of its trigrams, as partial_ratio would score it.
+        """
+        query_grams = self.trigrams(normalized_query)
+        if not query_grams or self.min_size is None:
+            return []
+        
+        with self.lock:
+            # A name sharing at least min_overlap of the shorter name's trigrams must appear in
+            # one of the rarest (len - required + 1) posting lists, so the frequent lists are
+            # only walked for queries longer than the shortest indexed name
+            lists = sorted((self.postings.get(gram, ()) for gram in query_grams), key=len)
+            required = max(1, int(min(len(query_grams), self.min_size) * self.min_overlap))
+            
+            counts = Counter()
+            for postings in lists[:len(lists) - required + 1]:
+                counts.update(postings)
+            
+            # Exact overlap for the most promising names only
+            query_size = len(query_grams)
+            sizes = self.name_sizes
+            promising = heapq.nlargest(self.max_candidates * 4, counts.items(),
+                                       key=lambda item: (item[1] / min(query_size, sizes[item[0]]), item[1]))
+            ranked = []
+            for name_id, _ in promising:
+                overlap = len(query_grams & self.trigrams(self.names[name_id]))
+                ranked.append((name_id, overlap, overlap / min(query_size, sizes[name_id])))
+        
+        ranked.sort(key=lambda item: (-item[2], -item[1], item[0]))
+        return [(name_id, overlap) for name_id, overlap, _ in ranked[:self.max_candidates]]
+    
+    def search(self, name, scorer, threshold=80, top_k=10):
+        """Top-K (certificate id, score) pairs whose names score above threshold.
+        
+        ``scorer`` receives the normalized query and the list of normalized candidate
+        names and returns their scores (a scoring backend's name_similarity), so
+        survivors are rescored with exactly the verifier's name scorers.
+        """
+        normalized_query = self.normalize(name)
+        if not normalized_query:
+            return []
+        
+        candidates = self.candidates(normalized_query)
+        if not candidates:
+            return []
+        scores = scorer(normalized_query, [self.names[name_id] for name_id, _ in candidates])
+        
+        # Equal scores are common (partial_ratio gives 100 to any superstring), so ties
+        # go to the name sharing the most trigrams with the query, then to the one with
+        # the fewest trigrams the query lacks
+        results = []
+        for (name_id, overlap), score in zip(candidates, scores):
+            if score > threshold:
+                extra = self.name_sizes[name_id] - overlap
+                results.extend((int(score), overlap, extra, cert_id) for cert_id in self.name_certificates[name_id])
+        
+        results.sort(key=lambda item: (-item[0], -item[1], item[2], item[3]))
+        return [(cert_id, score) for score, _, _, cert_id in results[:top_k]]
+
+_build_lock = threading.Lock()
+
+def get_name_index(normalize):
+    """Return the application's name index, building it from the database on first use"""
+    index = current_app.extensions.get('name_index')
+    if index is None:
+        with _build_lock:
+            index = current_app.extensions.get('name_index')
+            if index is None:
+                index = NameTrigramIndex.from_database(normalize)
+                current_app.extensions['name_index'] = index
+    
+    return index
+
+def refresh_name_index(registry_version):
+    """Bring the name index up to ``registry_version`` if it has been built"""
+    index = current_app.extensions.get('name_index')
+    if index is not None:
+        index.refresh(registry_version)
+
+def index_certificate(certificate):
+    """Add a newly written certificate to the name index if it has been built"""
+    index = current_app.extensions.get('name_index')
+    if index is not None:
+        index.add(certificate.id, certificate.student_name)
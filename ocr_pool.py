@@ -0,0 +1,236 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app, has_app_context
+import multiprocessing
+import threading
+import time
+import io
+import os
+
+class OCRPoolSaturated(Exception):
+    """Raised when every OCR worker is busy and the queue is full"""
+
+class OCRTimeout(Exception):
+    """Raised when an OCR job does not finish within its timeout"""
+
+class OCRWorkerCrashed(Exception):
+    """Raised when a worker process died while the job was running or queued"""
+
+# Processor used by each worker process, created once by the pool initializer
+_worker_processor = None
+
+def _init_ocr_worker(preprocess_options):
+    global _worker_processor
+    from app.ocr_utils import DocumentProcessor
+    import pytesseract
+    
+    _worker_processor = DocumentProcessor(**preprocess_options)
+    
+    # Resolve the tesseract binary once so the first job does not pay for it
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        print(f"Error starting OCR worker: {str(e)}")
+
+def _warm_up():
+    return True
+
+def _ocr_in_worker(image, timeout):
+    from PIL import Image
+    import pytesseract
+    
+    # Paths are opened by the worker; in-memory uploads arrive as bytes
+    image = Image.open(io.BytesIO(image) if isinstance(image, bytes) else image)
+    processed_image = _worker_processor.preprocess_image(image)
+    
+    # Tesseract is killed if it runs past the job timeout
+    text = pytesseract.image_to_string(processed_image, config=_worker_processor.tesseract_config,
+                                       timeout=timeout)
+    return text.strip()
+
+class OCRWorkerPool:
+    """Pool of long-lived OCR worker processes with a bounded queue.
+    
+    A worker that dies (out of memory, a crash in Tesseract) breaks the process pool and
+    fails every job in it; the pool is then replaced so later jobs run again.
+    """
+    
+    def __init__(self, workers, queue_size=None, timeout=30, submit_timeout=0, preprocess_options=None):
+        self.workers = workers
+        self.queue_size = queue_size if queue_size is not None else workers * 2
+        self.timeout = timeout  # Seconds allowed per OCR job
+        self.submit_timeout = submit_timeout  # Seconds to wait for a free slot before rejecting
+        
+        # One slot per running or queued job; callers block or are rejected when none are free
+        self.capacity = self.workers + self.queue_size
+        self.pid = os.getpid()
+        self.slots = threading.BoundedSemaphore(self.capacity)
+        
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self.crashed = 0
+        self.rebuilds = 0
+        self.total_seconds = 0.0
+        
+        self.preprocess_options = preprocess_options or {}
+        self.executor_lock = threading.Lock()
+        self.executor = self._new_executor()
+        
+        # Start every worker now so requests never wait for an interpreter to boot
+        for future in [self.executor.submit(_warm_up) for _ in range(workers)]:
+            future.result()
+    
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers,
+                                   mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_ocr_worker,
+                                   initargs=(self.preprocess_options,))
+    
+    def _replace_broken(self, executor):
+        """Replace ``executor`` after its pool broke, unless another thread already did"""
+        with self.executor_lock:
+            if self.executor is executor:
+                executor.shutdown(wait=False)
+                self.executor = self._new_executor()
+                self.rebuilds += 1
+                
+                # Boot the new workers in the background, as at startup
+                for _ in range(self.workers):
+                    self.executor.submit(_warm_up)
+            return self.executor
+    
+    def submit(self, source):
+        """Queue an image path or binary file object for OCR and return a future for its text"""
+        if self.submit_timeout:
+            acquired = self.slots.acquire(timeout=self.submit_timeout)
+        else:
+            acquired = self.slots.acquire(blocking=False)
+        
+        if not acquired:
+            with self.lock:
+                self.rejected += 1
+            raise OCRPoolSaturated(f"OCR queue is full ({self.capacity} jobs in flight)")
+        
+        with self.lock:
+            self.submitted += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        
+        started = time.perf_counter()
+        try:
+            # File objects cannot cross the process boundary, so send their bytes
+            image = source if isinstance(source, (str, os.PathLike)) else source.read()
+            executor = self.executor
+            try:
+                future = executor.submit(_ocr_in_worker, image, self.timeout)
+            except BrokenProcessPool:
+                executor = self._replace_broken(executor)
+                future = executor.submit(_ocr_in_worker, image, self.timeout)
+        except Exception:
+            self._job_done(started, failed=True)
+            raise
+        
+        future.add_done_callback(lambda f: self._job_done(started, failed=f.cancelled() or f.exception() is not None,
+                                                          executor=executor, future=f))
+        return future
+    
+    def _job_done(self, started, failed, executor=None, future=None):
+        crashed = failed and future is not None and not future.cancelled() \
+            and isinstance(future.exception(), BrokenProcessPool)
+        with self.lock:
+            self.in_flight -= 1
+            self.total_seconds += time.perf_counter() - started
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+            if crashed:
+                self.crashed += 1
+        self.slots.release()
+        
+        if crashed:
+            self._replace_broken(executor)
+    
+    def extract_text(self, source):
+        """OCR an image in the pool, waiting at most the job timeout for the result"""
+        future = self.submit(source)
+        try:
+            # Allow a little over the tesseract timeout for preprocessing and transfer
+            return future.result(timeout=self.timeout + 5)
+        except FutureTimeoutError:
+            with self.lock:
+                self.timed_out += 1
+            raise OCRTimeout(f"OCR did not finish within {self.timeout} seconds")
+        except BrokenProcessPool:
+            raise OCRWorkerCrashed("An OCR worker process died; the pool has been restarted")
+        except RuntimeError as e:
+            # pytesseract reports its own timeout as a RuntimeError
+            if 'timeout' in str(e).lower():
+                with self.lock:
+                    self.timed_out += 1
+                raise OCRTimeout(f"OCR did not finish within {self.timeout} seconds")
+            raise
+    
+    def stats(self):
+        """Saturation metrics for monitoring"""
+        with self.lock:
+            finished = self.completed + self.failed
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'capacity': self.capacity,
+                'in_flight': self.in_flight,
+                'queued': max(0, self.in_flight - self.workers),
+                'peak_in_flight': self.peak_in_flight,
+                'utilization': self.in_flight / self.capacity,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timed_out': self.timed_out,
+                'rejected': self.rejected,
+                'crashed': self.crashed,
+                'rebuilds': self.rebuilds,
+                'average_job_seconds': self.total_seconds / finished if finished else 0.0
+            }
+    
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+def get_preprocess_options():
+    """DocumentProcessor preprocessing options from the application config"""
+    if not has_app_context():
+        return {}
+    
+    return {
+        'target_dpi': current_app.config.get('OCR_TARGET_DPI', 300),
+        'deskew': current_app.config.get('OCR_DESKEW', False),
+        'crop': current_app.config.get('OCR_CROP', False)
+    }
+
+_pool_lock = threading.Lock()
+
+def get_ocr_pool():
+    """Return the application's OCR pool, or None when OCR runs in the calling thread"""
+    if not has_app_context() or current_app.config.get('OCR_WORKERS', 0) <= 0:
+        return None
+    
+    pool = current_app.extensions.get('ocr_pool')
+    # Worker processes belong to the process that started them, so a forked process starts its own
+    if pool is None or pool.pid != os.getpid():
+        with _pool_lock:
+            pool = current_app.extensions.get('ocr_pool')
+            if pool is None or pool.pid != os.getpid():
+                pool = OCRWorkerPool(current_app.config['OCR_WORKERS'],
+                                     queue_size=current_app.config.get('OCR_QUEUE_SIZE'),
+                                     timeout=current_app.config.get('OCR_TIMEOUT', 30),
+                                     submit_timeout=current_app.config.get('OCR_SUBMIT_TIMEOUT', 0),
+                                     preprocess_options=get_preprocess_options())
+                current_app.extensions['ocr_pool'] = pool
+    
+    return pool
@@ -7,135 +7,307 @@ import io
 import re
 import hashlib
 from datetime import datetime
+import threading
 import os
+from app.ocr_pool import OCRPoolSaturated, OCRTimeout, OCRWorkerCrashed
+from app.field_extractor import FieldExtractor
+from app.metrics import stage
 
 class DocumentProcessor:
     """Class to handle OCR and document processing for certificate verification"""
     
-    def __init__(self):
+    # Common patterns for certificate data extraction, in priority order per field
+    patterns = {
+        'certificate_number': [
+            r'certificate\s+no\.?\s*:?\s*([A-Z0-9/\-]+)',
+            r'cert\.?\s+no\.?\s*:?\s*([A-Z0-9/\-]+)',
+            r'registration\s+no\.?\s*:?\s*([A-Z0-9/\-]+)',
+            r'reg\.?\s+no\.?\s*:?\s*([A-Z0-9/\-]+)'
+        ],
+        'student_name': [
+            r'name\s*:?\s*([A-Za-z\s]+)',
+            r'student\s+name\s*:?\s*([A-Za-z\s]+)',
+            r'this\s+is\s+to\s+certify\s+that\s+([A-Za-z\s]+)',
+            r'mr\.?\s*\/?\s*ms\.?\s*([A-Za-z\s]+)'
+        ],
+        'roll_number': [
+            r'roll\s+no\.?\s*:?\s*([A-Z0-9/\-]+)',
+            r'enrollment\s+no\.?\s*:?\s*([A-Z0-9/\-]+)',
+            r'student\s+id\s*:?\s*([A-Z0-9/\-]+)'
+        ],
+        'course': [
+            r'course\s*:?\s*([A-Za-z\s]+)',
+            r'degree\s*:?\s*([A-Za-z\s]+)',
+            r'bachelor\s+of\s+([A-Za-z\s]+)',
+            r'master\s+of\s+([A-Za-z\s]+)',
+            r'diploma\s+in\s+([A-Za-z\s]+)'
+        ],
+        'year': [
+            r'year\s*:?\s*(\d{4})',
+            r'passing\s+year\s*:?\s*(\d{4})',
+            r'session\s*:?\s*(\d{4})',
+            r'(\d{4})\s*session'
+        ],
+        'grade': [
+            r'grade\s*:?\s*([A-Z]+)',
+            r'class\s*:?\s*([A-Z\s]+)',
+            r'division\s*:?\s*([A-Z\s]+)'
+        ],
+        'percentage': [
+            r'(\d+\.?\d*)\s*%',
+            r'marks?\s*:?\s*(\d+\.?\d*)',
+            r'percentage\s*:?\s*(\d+\.?\d*)'
+        ]
+    }
+    
+    # Compiled once and shared by every processor
+    field_extractor = FieldExtractor(patterns)
+    
+    def __init__(self, ocr_pool=None, target_dpi=300, deskew=False, crop=False):
         # Configure tesseract for better OCR results
         self.tesseract_config = r'--oem 3 --psm 6'
         
-        # Common patterns for certificate data extraction
-        self.patterns = {
-            'certificate_number': [
-                r'certificate\s+no\.?\s*:?\s*([A-Z0-9/\-]+)',
-                r'cert\.?\s+no\.?\s*:?\s*([A-Z0-9/\-]+)',
-                r'registration\s+no\.?\s*:?\s*([A-Z0-9/\-]+)',
-                r'reg\.?\s+no\.?\s*:?\s*([A-Z0-9/\-]+)'
-            ],
-            'student_name': [
-                r'name\s*:?\s*([A-Za-z\s]+)',
-                r'student\s+name\s*:?\s*([A-Za-z\s]+)',
-                r'this\s+is\s+to\s+certify\s+that\s+([A-Za-z\s]+)',
-                r'mr\.?\s*\/?\s*ms\.?\s*([A-Za-z\s]+)'
-            ],
-            'roll_number': [
-                r'roll\s+no\.?\s*:?\s*([A-Z0-9/\-]+)',
-                r'enrollment\s+no\.?\s*:?\s*([A-Z0-9/\-]+)',
-                r'student\s+id\s*:?\s*([A-Z0-9/\-]+)'
-            ],
-            'course': [
-                r'course\s*:?\s*([A-Za-z\s]+)',
-                r'degree\s*:?\s*([A-Za-z\s]+)',
-                r'bachelor\s+of\s+([A-Za-z\s]+)',
-                r'master\s+of\s+([A-Za-z\s]+)',
-                r'diploma\s+in\s+([A-Za-z\s]+)'
-            ],
-            'year': [
-                r'year\s*:?\s*(\d{4})',
-                r'passing\s+year\s*:?\s*(\d{4})',
-                r'session\s*:?\s*(\d{4})',
-                r'(\d{4})\s*session'
-            ],
-            'grade': [
-                r'grade\s*:?\s*([A-Z]+)',
-                r'class\s*:?\s*([A-Z\s]+)',
-                r'division\s*:?\s*([A-Z\s]+)'
-            ],
-            'percentage': [
-                r'(\d+\.?\d*)\s*%',
-                r'marks?\s*:?\s*(\d+\.?\d*)',
-                r'percentage\s*:?\s*(\d+\.?\d*)'
-            ]
-        }
+        # Optional OCRWorkerPool; without one OCR runs in the calling thread
+        self.ocr_pool = ocr_pool
+        
+        # Preprocessing options: scans above target_dpi are downscaled before filtering
+        self.target_dpi = target_dpi
+        self.deskew = deskew
+        self.crop = crop
+        
+        # CLAHE objects keep internal buffers, so each thread gets its own and reuses it
+        self._local = threading.local()
+        
+        # PDF pages with fewer visible characters than this are treated as scans
+        self.min_text_layer_chars = 20
+        
+        # Fields that let PDF extraction stop before reading every page
+        self.required_fields = ['certificate_number', 'student_name', 'year']
+        
     
     def calculate_file_hash(self, file_content):
         """Calculate SHA-256 hash of file content"""
         return hashlib.sha256(file_content).hexdigest()
     
+    def hash_source(self, source):
+        """Calculate SHA-256 hash of a file path or binary file object, reading it in chunks"""
+        sha256 = hashlib.sha256()
+        
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha256.update(chunk)
+        else:
+            source.seek(0)
+            for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                sha256.update(chunk)
+            source.seek(0)
+        
+        return sha256.hexdigest()
+    
+    def rewind(self, source):
+        """Return a path unchanged, or a binary file object positioned at its start"""
+        if not isinstance(source, (str, os.PathLike)):
+            source.seek(0)
+        return source
+    
     def preprocess_image(self, image):
         """Preprocess image for better OCR results"""
-        try:
-            # Convert PIL image to OpenCV format
-            img_array = np.array(image)
-            
-            # Convert to grayscale if needed
-            if len(img_array.shape) == 3:
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = img_array
-            
-            # Apply image enhancements
-            # 1. Noise reduction
-            denoised = cv2.medianBlur(gray, 3)
-            
-            # 2. Contrast enhancement
+        return self.preprocess_images([image])[0]
+    
+    def preprocess_images(self, images):
+        """Preprocess a batch of pages, returning one binary uint8 array per page.
+        
+        The CLAHE instance and the median blur buffer are shared by every page of the
+        same size, and thresholding happens in place on the contrast-enhanced page.
+        """
+        clahe = getattr(self._local, 'clahe', None)
+        if clahe is None:
             clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-            enhanced = clahe.apply(denoised)
-            
-            # 3. Threshold to binary image
-            _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
+            self._local.clahe = clahe
+        
+        denoised = None
+        processed = []
+        for image in images:
+            try:
+                # Convert PIL image to a grayscale OpenCV array
+                gray = self.to_grayscale(image)
+                
+                # Downscale oversized scans first so every later stage works on fewer pixels
+                gray = self.downscale(gray, image)
+                
+                # 1. Noise reduction, reusing the previous page's buffer when the size matches
+                if denoised is None or denoised.shape != gray.shape:
+                    denoised = np.empty_like(gray)
+                cv2.medianBlur(gray, 3, dst=denoised)
+                
+                # 2. Contrast enhancement
+                enhanced = clahe.apply(denoised)
+                
+                # 3. Threshold to binary image, in place
+                cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=enhanced)
+                
+                # 4. Optional geometry fixes on the binary page
+                if self.deskew:
+                    enhanced = self.deskew_page(enhanced)
+                if self.crop:
+                    enhanced = self.crop_to_text(enhanced)
+                
+                processed.append(enhanced)
+            except Exception as e:
+                print(f"Error in image preprocessing: {str(e)}")
+                processed.append(np.array(image))
+        
+        return processed
+    
+    def to_grayscale(self, image):
+        """Single-channel uint8 array for a PIL image"""
+        if image.mode == 'L':
+            return np.asarray(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY)
+    
+    def downscale(self, gray, image):
+        """Resize a page scanned above target_dpi down to target_dpi"""
+        if not self.target_dpi:
+            return gray
+        
+        dpi = image.info.get('dpi')
+        if dpi:
+            scale = self.target_dpi / max(float(dpi[0]), 1.0)
+        else:
+            # Without DPI metadata assume an A4 page and compare its long side
+            scale = 11.69 * self.target_dpi / max(gray.shape)
+        
+        if scale >= 1.0:
+            return gray
+        
+        size = (max(1, round(gray.shape[1] * scale)), max(1, round(gray.shape[0] * scale)))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    
+    def text_points(self, binary):
+        """Coordinates of dark (text) pixels on a binary page, or None for a blank page"""
+        return cv2.findNonZero(cv2.bitwise_not(binary))
+    
+    def deskew_page(self, binary):
+        """Rotate a binary page so its text lines are horizontal"""
+        points = self.text_points(binary)
+        if points is None:
             return binary
-        except Exception as e:
-            print(f"Error in image preprocessing: {str(e)}")
-            return np.array(image)
+        
+        angle = cv2.minAreaRect(points)[-1]
+        if angle > 45:
+            angle -= 90
+        elif angle < -45:
+            angle += 90
+        if abs(angle) < 0.5:
+            return binary
+        
+        height, width = binary.shape
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        return cv2.warpAffine(binary, matrix, (width, height), flags=cv2.INTER_NEAREST,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+    
+    def crop_to_text(self, binary, margin=10):
+        """View of a binary page cropped to its text region plus a margin"""
+        points = self.text_points(binary)
+        if points is None:
+            return binary
+        
+        x, y, width, height = cv2.boundingRect(points)
+        top, left = max(0, y - margin), max(0, x - margin)
+        return binary[top:y + height + margin, left:x + width + margin]
     
-    def extract_text_from_image(self, image_path):
-        """Extract text from image using OCR"""
+    def extract_text_from_image(self, source):
+        """Extract text from an image path or binary file object using OCR"""
+        if self.ocr_pool is not None:
+            try:
+                # Includes the wait for a worker and preprocessing in the worker process
+                with stage('ocr'):
+                    return self.ocr_pool.extract_text(self.rewind(source))
+            except (OCRPoolSaturated, OCRTimeout, OCRWorkerCrashed):
+                # Surface overload and dead workers to the caller instead of verifying an empty text
+                raise
+            except Exception as e:
+                print(f"Error in image OCR: {str(e)}")
+                return ""
+        
         try:
             # Load and preprocess image
-            image = Image.open(image_path)
-            processed_image = self.preprocess_image(image)
+            with stage('preprocess'):
+                image = Image.open(self.rewind(source))
+                processed_image = self.preprocess_image(image)
             
             # Perform OCR
-            text = pytesseract.image_to_string(processed_image, config=self.tesseract_config)
+            with stage('ocr'):
+                text = pytesseract.image_to_string(processed_image, config=self.tesseract_config)
             
             return text.strip()
         except Exception as e:
             print(f"Error in image OCR: {str(e)}")
             return ""
     
-    def extract_text_from_pdf(self, pdf_path):
-        """Extract text from PDF file"""
+    def extract_text_from_pdf(self, source):
+        """Extract text from a PDF path or binary file object.
+        
+        Each page's embedded text layer is used when it looks like real text; other pages
+        (scans) are OCR'd from their largest embedded image. Remaining pages are skipped
+        once the certificate number, name and year have been found.
+        """
         try:
-            text = ""
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
+            pages_text = []
+            with stage('pdf_text'):
+                pdf_reader = PyPDF2.PdfReader(self.rewind(source))
+            for page in pdf_reader.pages:
+                with stage('pdf_text'):
+                    text = page.extract_text() or ""
+                if not self.has_text_layer(text):
+                    text = self.ocr_pdf_page(page) or text
+                pages_text.append(text)
+                
+                if self.has_required_fields(pages_text):
+                    break
             
-            return text.strip()
+            return "\n".join(pages_text).strip()
+        except (OCRPoolSaturated, OCRTimeout, OCRWorkerCrashed):
+            raise
         except Exception as e:
             print(f"Error in PDF text extraction: {str(e)}")
             return ""
     
-    def extract_data_patterns(self, text):
-        """Extract structured data from text using regex patterns"""
-        extracted_data = {}
+    def has_text_layer(self, text):
+        """Whether a page's embedded text is usable instead of OCR"""
+        characters = ''.join(text.split())
+        if len(characters) < self.min_text_layer_chars:
+            return False
         
-        # Clean the text
-        text_clean = re.sub(r'\s+', ' ', text.lower().strip())
+        # Broken font encodings come out as symbols and control characters
+        alphanumeric = sum(1 for char in characters if char.isalnum())
+        return alphanumeric / len(characters) >= 0.6
+    
+    def ocr_pdf_page(self, page):
+        """OCR the largest image embedded in a PDF page, or return "" when it has none"""
+        try:
+            images = page.images
+        except Exception as e:
+            print(f"Error reading PDF page images: {str(e)}")
+            return ""
         
-        for field, patterns in self.patterns.items():
-            for pattern in patterns:
-                match = re.search(pattern, text_clean, re.IGNORECASE)
-                if match:
-                    extracted_data[field] = match.group(1).strip()
-                    break  # Use first matching pattern
+        if not images:
+            return ""
         
-        return extracted_data
+        largest = max(images, key=lambda image: len(image.data))
+        return self.extract_text_from_image(io.BytesIO(largest.data))
+    
+    def has_required_fields(self, pages_text):
+        """Whether the text read so far already has the fields matching depends on"""
+        extracted_data = self.extract_data_patterns("\n".join(pages_text))
+        return all(field in extracted_data for field in self.required_fields)
+    
+    def extract_data_patterns(self, text):
+        """Extract structured data from text using regex patterns"""
+        return self.field_extractor.extract(text)
     
     def detect_common_forgery_patterns(self, text):
         """Detect common patterns that might indicate forgery"""
@@ -160,29 +332,31 @@ class DocumentProcessor:
         
         return flags
     
-    def process_document(self, file_path, filename):
-        """Main method to process uploaded document"""
+    def process_document(self, source, filename, file_hash=None):
+        """Main method to process an uploaded document given as a path or binary file object"""
         try:
-            # Calculate file hash
-            with open(file_path, 'rb') as f:
-                file_content = f.read()
-                file_hash = self.calculate_file_hash(file_content)
+            # Calculate file hash unless the caller already has it
+            if file_hash is None:
+                with stage('hash'):
+                    file_hash = self.hash_source(source)
             
             # Determine file type and extract text
             file_extension = filename.lower().split('.')[-1]
             
             if file_extension == 'pdf':
-                extracted_text = self.extract_text_from_pdf(file_path)
+                extracted_text = self.extract_text_from_pdf(source)
             elif file_extension in ['png', 'jpg', 'jpeg']:
-                extracted_text = self.extract_text_from_image(file_path)
+                extracted_text = self.extract_text_from_image(source)
             else:
                 raise ValueError(f"Unsupported file type: {file_extension}")
             
             # Extract structured data
-            structured_data = self.extract_data_patterns(extracted_text)
+            with stage('extract_fields'):
+                structured_data = self.extract_data_patterns(extracted_text)
             
             # Detect potential forgery indicators
-            forgery_flags = self.detect_common_forgery_patterns(extracted_text)
+            with stage('forgery_checks'):
+                forgery_flags = self.detect_common_forgery_patterns(extracted_text)
             
             return {
                 'file_hash': file_hash,
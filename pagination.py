@@ -0,0 +1,72 @@
+from datetime import datetime
+from sqlalchemy import tuple_
+import base64
+import binascii
+
+class KeysetPage:
+    """One page of a listing ordered newest first by (created_at, id), rows without a
+    created_at last.
+    
+    ``next_cursor`` is passed back as ``?cursor=`` to fetch the following page; it is
+    None on the last page.
+    """
+    
+    def __init__(self, items, per_page, next_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+    
+    def __iter__(self):
+        return iter(self.items)
+
+def encode_cursor(created_at, row_id):
+    """Opaque cursor for the position just after a row (created_at may be None)"""
+    token = f"{created_at.isoformat() if created_at is not None else ''}|{row_id}"
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(created_at, id) of a cursor; raises ValueError when it is malformed"""
+    try:
+        token = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, row_id = token.split('|')
+        return datetime.fromisoformat(created_at) if created_at else None, int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def keyset_page(query, model, cursor=None, per_page=20):
+    """The page of ``query`` after ``cursor``, newest first.
+    
+    Instead of OFFSET and a COUNT, the page starts after the (created_at, id) of the
+    previous page's last row, so with an index on (created_at, id) every page costs
+    the same however deep it is or however large the table grows.
+    
+    Rows without a created_at (written by raw SQL or bulk inserts that skip the model
+    default) follow all others, newest id first. Databases order NULLs differently, so
+    they are read by a second query once the dated rows run out.
+    """
+    created_at, row_id = decode_cursor(cursor) if cursor else (None, None)
+    
+    # One extra row tells whether there is a next page
+    items = []
+    if cursor is None or created_at is not None:
+        dated = query.filter(model.created_at.isnot(None))
+        if cursor:
+            dated = dated.filter(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+        items = dated.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+    
+    if len(items) <= per_page:
+        undated = query.filter(model.created_at.is_(None))
+        if cursor and created_at is None:
+            undated = undated.filter(model.id < row_id)
+        items += undated.order_by(model.id.desc()).limit(per_page + 1 - len(items)).all()
+    
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    
+    return KeysetPage(items, per_page, next_cursor)
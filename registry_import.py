@@ -0,0 +1,322 @@
+from app.models import Certificate, bump_registry_version
+from app.institution_cache import get_institution_cache
+from app.match_keys import certificate_hash, certificate_match_keys
+from app.name_index import index_certificate
+from app.search_index import certificate_document, index_documents, search_enabled
+from app import db
+from datetime import date, datetime
+from sqlalchemy import select
+import codecs
+import csv
+import io
+import os
+import re
+
+# Ledger headers we accept for each certificate field, after lowercasing and replacing
+# anything but letters and digits with underscores
+HEADER_ALIASES = {
+    'certificate_no': 'certificate_number',
+    'cert_number': 'certificate_number',
+    'name': 'student_name',
+    'roll_number': 'student_roll_number',
+    'roll_no': 'student_roll_number',
+    'course': 'course_name',
+    'degree': 'degree_type',
+    'year': 'passing_year',
+    'institution': 'institution_code'
+}
+
+REQUIRED_FIELDS = ['certificate_number', 'student_name', 'course_name', 'degree_type', 'passing_year', 'issue_date']
+TEXT_FIELDS = ['certificate_number', 'student_name', 'student_roll_number', 'course_name', 'degree_type', 'grade']
+
+# Columns an upsert may overwrite; the key, id and created_at stay as first written
+UPDATED_COLUMNS = ['student_name', 'student_roll_number', 'course_name', 'degree_type', 'passing_year', 'grade',
+                   'percentage', 'issue_date', 'certificate_hash', 'certificate_number_key', 'certificate_serial_key',
+                   'roll_number_key', 'student_name_key', 'student_name_phonetic', 'course_name_key', 'updated_at']
+
+# Besides ISO dates
+DATE_FORMATS = ['%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y']
+
+class RowError(ValueError):
+    """A ledger row that cannot be imported"""
+
+class ImportReport:
+    """Outcome of an import: counts per outcome and (row number, message) per rejected row"""
+    
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+    
+    def to_dict(self, max_errors=None):
+        errors = self.errors if max_errors is None else self.errors[:max_errors]
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'error_count': len(self.errors),
+            'errors': [{'row': row, 'message': message} for row, message in errors]
+        }
+
+def header_field(header):
+    name = re.sub(r'[^a-z0-9]+', '_', str(header or '').strip().lower()).strip('_')
+    return HEADER_ALIASES.get(name, name)
+
+def _records(header, rows, first_row):
+    fields = [header_field(name) for name in header]
+    for number, values in enumerate(rows, first_row):
+        if not any(value not in (None, '') for value in values):
+            continue
+        yield number, dict(zip(fields, values))
+
+def read_csv(stream):
+    """(row number, raw values) of each data row of a CSV ledger, read as it streams"""
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = codecs.getreader('utf-8-sig')(stream)
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        return
+    yield from _records(header, reader, 2)
+
+def read_excel(stream):
+    """(row number, raw values) of each data row of the first sheet of an .xlsx ledger"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Reading Excel ledgers requires openpyxl (pip install openpyxl)")
+    
+    # Read-only workbooks parse rows lazily instead of loading the whole sheet
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is not None:
+            yield from _records(header, rows, 2)
+    finally:
+        workbook.close()
+
+def read_ledger(stream, filename):
+    """Rows of a ledger file, by its extension: .csv, or .xlsx/.xlsm"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        return read_csv(stream)
+    if extension in ('.xlsx', '.xlsm'):
+        return read_excel(stream)
+    raise ValueError(f"Unsupported ledger type {extension or filename}; use .csv or .xlsx")
+
+def _text(value):
+    if value is None:
+        return None
+    # Spreadsheets hand numeric roll numbers over as numbers
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+def _issue_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise RowError(f"Invalid issue_date {value!r}; use YYYY-MM-DD")
+
+def parse_row(raw, institution_ids, default_institution_id=None):
+    """Certificate column values of a raw ledger row; raises RowError when it is invalid"""
+    values = {field: _text(raw.get(field)) for field in TEXT_FIELDS + ['passing_year', 'percentage']}
+    missing = [field for field in REQUIRED_FIELDS if not (raw.get(field) if field == 'issue_date' else values[field])]
+    if missing:
+        raise RowError(f"Missing {', '.join(missing)}")
+    
+    for field in TEXT_FIELDS:
+        length = Certificate.__table__.c[field].type.length
+        if values[field] and len(values[field]) > length:
+            raise RowError(f"{field} is longer than {length} characters")
+    
+    code = _text(raw.get('institution_code'))
+    if code:
+        institution_id = institution_ids.get(code.upper())
+        if institution_id is None:
+            raise RowError(f"Unknown institution {code}")
+    elif _text(raw.get('institution_id')):
+        institution_id = int(float(raw['institution_id']))
+        if institution_id not in institution_ids.values():
+            raise RowError(f"Unknown institution {institution_id}")
+    elif default_institution_id is not None:
+        institution_id = default_institution_id
+    else:
+        raise RowError("Missing institution_code")
+    
+    try:
+        values['passing_year'] = int(float(values['passing_year']))
+    except ValueError:
+        raise RowError(f"Invalid passing_year {values['passing_year']!r}")
+    if not 1900 <= values['passing_year'] <= date.today().year + 1:
+        raise RowError(f"passing_year {values['passing_year']} is out of range")
+    
+    if values['percentage'] is not None:
+        try:
+            values['percentage'] = float(values['percentage'].rstrip('%'))
+        except ValueError:
+            raise RowError(f"Invalid percentage {values['percentage']!r}")
+        if not 0 <= values['percentage'] <= 100:
+            raise RowError(f"percentage {values['percentage']} is out of range")
+    
+    issue_date = raw['issue_date']
+    values['issue_date'] = _issue_date(issue_date if isinstance(issue_date, date) else _text(issue_date))
+    values['institution_id'] = institution_id
+    
+    values['certificate_hash'] = certificate_hash(values)
+    return values
+
+def _upsert_statement(update):
+    """INSERT that updates rows whose hash differs on a (certificate_number, institution_id) conflict"""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    
+    table = Certificate.__table__
+    statement = insert(table)
+    key = ['certificate_number', 'institution_id']
+    if update:
+        statement = statement.on_conflict_do_update(
+            index_elements=key,
+            set_={column: statement.excluded[column] for column in UPDATED_COLUMNS},
+            where=table.c.certificate_hash.is_distinct_from(statement.excluded.certificate_hash))
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=key)
+    
+    return statement.returning(table.c.id, table.c.certificate_number, table.c.student_roll_number,
+                               table.c.student_name, table.c.course_name)
+
+def _existing_hashes(chunk):
+    """certificate_hash of the certificates a chunk's rows already have, by key"""
+    table = Certificate.__table__
+    numbers = {values['certificate_number'] for _, values in chunk}
+    rows = db.session.execute(
+        select(table.c.certificate_number, table.c.institution_id, table.c.certificate_hash)
+        .where(table.c.certificate_number.in_(numbers))).all()
+    return {(row.certificate_number, row.institution_id): row.certificate_hash for row in rows}
+
+def _write_chunk(chunk, update):
+    """Write one chunk in a transaction; returns (inserted, updated, unchanged, errors)"""
+    existing = _existing_hashes(chunk)
+    changed = []
+    unchanged = 0
+    errors = []
+    for number, values in chunk:
+        key = (values['certificate_number'], values['institution_id'])
+        if key not in existing:
+            changed.append(values)
+        elif existing[key] == values['certificate_hash']:
+            unchanged += 1
+        elif update:
+            changed.append(values)
+        else:
+            errors.append((number, "Certificate already exists with different details"))
+    
+    written = []
+    if changed:
+        # Core inserts skip the model events, so the match keys are computed here
+        now = datetime.utcnow()
+        for values in changed:
+            values.update(certificate_match_keys(values['certificate_number'], values['student_name'],
+                                                 values['student_roll_number'], values['course_name']))
+            values['updated_at'] = now
+        written = db.session.execute(_upsert_statement(update), changed).all()
+        
+        connection = db.session.connection()
+        if search_enabled(connection):
+            index_documents(connection, 'certificates', [(row.id, certificate_document(
+                row.certificate_number, row.student_roll_number, row.student_name, row.course_name))
+                for row in written])
+        bump_registry_version(connection)
+    db.session.commit()
+    
+    for row in written:
+        index_certificate(row)
+    
+    inserted = sum(1 for values in changed if (values['certificate_number'], values['institution_id']) not in existing)
+    return inserted, len(written) - inserted, unchanged, errors
+
+def _flush(chunk, update, report):
+    """Write a chunk, or row by row when the database rejects it, to isolate the bad rows"""
+    try:
+        inserted, updated, unchanged, errors = _write_chunk(chunk, update)
+    except Exception as e:
+        db.session.rollback()
+        if len(chunk) == 1:
+            report.errors.append((chunk[0][0], f"Database error: {str(e)}"))
+        else:
+            for row in chunk:
+                _flush([row], update, report)
+        return
+    
+    report.inserted += inserted
+    report.updated += updated
+    report.unchanged += unchanged
+    report.errors.extend(errors)
+
+def import_certificates(records, institution_code=None, update=True, dry_run=False, chunk_size=5000, progress=None):
+    """Validate ledger rows and bulk-insert or upsert them into the certificate registry.
+    
+    ``records`` are (row number, raw values) pairs such as read_ledger yields; rows
+    without an institution_code or institution_id column belong to ``institution_code``.
+    Rows are validated and written ``chunk_size`` at a time, each chunk in one
+    transaction keyed on (certificate_number, institution_id). Existing certificates are
+    updated when their details changed, or reported as errors when ``update`` is False;
+    identical ones are left alone. Invalid rows are reported, never abort the import.
+    With ``dry_run`` rows are only validated. Returns an ImportReport.
+    """
+    institution_ids = {institution.code.upper(): institution.id for institution in get_institution_cache().all().values()}
+    default_institution_id = None
+    if institution_code:
+        default_institution_id = institution_ids.get(institution_code.upper())
+        if default_institution_id is None:
+            raise ValueError(f"Unknown institution {institution_code}")
+    
+    report = ImportReport()
+    chunk = {}
+    for number, raw in records:
+        report.rows += 1
+        try:
+            values = parse_row(raw, institution_ids, default_institution_id)
+        except (RowError, ValueError, TypeError) as e:
+            report.errors.append((number, str(e)))
+            continue
+        
+        # A later row for the same certificate replaces an earlier one in the same chunk
+        key = (values['certificate_number'], values['institution_id'])
+        if key in chunk:
+            report.errors.append((chunk[key][0], f"Replaced by row {number} for the same certificate"))
+        chunk[key] = (number, values)
+        
+        if len(chunk) >= chunk_size:
+            if not dry_run:
+                _flush(list(chunk.values()), update, report)
+            chunk = {}
+            if progress:
+                progress(report)
+    
+    if chunk and not dry_run:
+        _flush(list(chunk.values()), update, report)
+    if progress:
+        progress(report)
+    
+    report.errors.sort()
+    return report
@@ -1,9 +1,27 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, current_app
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, current_app, Response, stream_with_context, abort
 from werkzeug.utils import secure_filename
 from app.models import Institution, Certificate, VerificationLog, SuspiciousActivity
-from app.verification_engine import CertificateVerifier
+from app.name_index import index_certificate
+from app.jobs import get_job_queue, new_job_id
+from app.ocr_pool import get_ocr_pool
+from app.verification_cache import get_verification_cache
+from app.institution_cache import get_institution_cache
+from app.batch_verification import BatchVerifier, open_archive, iter_archive
+from app.upload_stream import upload_hash, detach_upload
+from app.stats import read_stats, read_daily_stats
+from app.database import read_session
+from app.pagination import keyset_page
+from app.search_index import search
+from app.registry_import import import_certificates, read_ledger
+from app.metrics import registry as metrics_registry, stage
+from app.warmup import get_warm_up
+from app.log_archive import archived_log_dict, find_archived_log, find_archived_logs, log_from_record, update_activities, ACTIVITY_STATUSES
+from app.duplicates import file_submissions, certificate_claims
+from app.match_keys import normalize_number
 from app import db
+from sqlalchemy.orm import contains_eager, joinedload
 import os
+import json
 from datetime import datetime, date
 
 main = Blueprint('main', __name__)
@@ -13,6 +31,46 @@ def allowed_file(filename):
     allowed_extensions = current_app.config.get('ALLOWED_EXTENSIONS', 'pdf,png,jpg,jpeg').split(',')
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
+def verification_disabled():
+    """503 response for verification endpoints on a dashboard-only node, else None"""
+    if current_app.config.get('APP_ROLE', 'all') == 'dashboard':
+        return jsonify({'status': 'error', 'message': 'Verification is not served by this node'}), 503
+    return None
+
+def listing_page(query, model, per_page=20):
+    """Keyset page of a newest-first listing from the request's cursor and per_page"""
+    per_page = min(max(request.args.get('per_page', per_page, type=int), 1), 100)
+    try:
+        return keyset_page(query, model, request.args.get('cursor'), per_page)
+    except ValueError as e:
+        if request.path.startswith('/api/'):
+            abort(Response(json.dumps({'status': 'error', 'message': str(e)}), 400, mimetype='application/json'))
+        abort(400, description=str(e))
+
+def listing_json(page, serialize):
+    """JSON body of a listing page, with the URL of the next one"""
+    next_url = None
+    if page.has_next:
+        next_url = url_for(request.endpoint, **dict(request.args.to_dict(), cursor=page.next_cursor))
+    return jsonify({
+        'items': [serialize(item) for item in page.items],
+        'per_page': page.per_page,
+        'next_cursor': page.next_cursor,
+        'next_url': next_url
+    })
+
+def certificate_listing():
+    return read_session.query(Certificate).join(Institution).options(contains_eager(Certificate.institution))
+
+def log_listing():
+    return read_session.query(VerificationLog).options(joinedload(VerificationLog.matched_certificate))
+
+def activity_listing():
+    query = read_session.query(SuspiciousActivity)
+    if request.args.get('status'):
+        query = query.filter(SuspiciousActivity.status == request.args['status'])
+    return query
+
 @main.route('/')
 def index():
     """Home page with upload interface"""
@@ -21,6 +79,10 @@ def index():
 @main.route('/upload', methods=['POST'])
 def upload_certificate():
     """Handle certificate upload and verification"""
+    disabled = verification_disabled()
+    if disabled:
+        return disabled
+    
     try:
         if 'certificate' not in request.files:
             return jsonify({'status': 'error', 'message': 'No file uploaded'}), 400
@@ -32,59 +94,93 @@ def upload_certificate():
         if not allowed_file(file.filename):
             return jsonify({'status': 'error', 'message': 'Invalid file type. Only PDF, PNG, JPG, JPEG allowed'}), 400
         
-        # Save uploaded file
         filename = secure_filename(file.filename)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
         filename = timestamp + filename
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
         
         # Get client info
         ip_address = request.environ.get('HTTP_X_REAL_IP', request.remote_addr)
         user_agent = request.headers.get('User-Agent', '')
         
-        # Verify certificate
-        verifier = CertificateVerifier()
-        result = verifier.verify_certificate(file_path, filename, ip_address, user_agent)
+        # In job mode the file is stored for the worker processes, which remove it when done;
+        # the job id keeps same-named uploads in the same second apart
+        if request.args.get('async') == '1':
+            job_id = new_job_id()
+            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f'{job_id}_{filename}')
+            with stage('save_upload'):
+                file.save(file_path)
+            job_id = get_job_queue().submit(file_path, filename, ip_address, user_agent, job_id=job_id)
+            return jsonify({
+                'status': 'QUEUED',
+                'job_id': job_id,
+                'status_url': url_for('main.job_status', job_id=job_id)
+            }), 202
         
-        # Clean up uploaded file
-        try:
-            os.remove(file_path)
-        except:
-            pass
+        # Verify the upload straight from its receive buffer, hashed while it arrived
+        from app.verification_engine import get_verifier
+        result = get_verifier().verify_certificate(file.stream, filename, ip_address, user_agent,
+                                                   file_hash=upload_hash(file))
         
         return jsonify(result)
         
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@main.route('/api/verify/batch', methods=['POST'])
+def verify_batch():
+    """Verify a ZIP archive or several certificates, streaming one JSON result per line"""
+    disabled = verification_disabled()
+    if disabled:
+        return disabled
+    
+    archive = request.files.get('archive')
+    uploads = [upload for upload in request.files.getlist('certificates') if upload.filename]
+    if not archive and not uploads:
+        return jsonify({'status': 'error', 'message': 'No files uploaded'}), 400
+    
+    max_files = current_app.config['BATCH_MAX_FILES']
+    if archive:
+        try:
+            zip_archive, members = open_archive(archive.stream, max_files=max_files)
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': f'Could not read archive: {str(e)}'}), 400
+        files = iter_archive(zip_archive, members, spool_size=current_app.config['UPLOAD_SPOOL_SIZE'])
+        buffers = [detach_upload(archive)]
+    else:
+        uploads = uploads[:max_files]
+        buffers = [detach_upload(upload) for upload in uploads]
+        files = [(secure_filename(upload.filename), buffer) for upload, buffer in zip(uploads, buffers)]
+    
+    # Get client info
+    ip_address = request.environ.get('HTTP_X_REAL_IP', request.remote_addr)
+    user_agent = request.headers.get('User-Agent', '')
+    
+    batch = BatchVerifier(ocr_threads=current_app.config['BATCH_OCR_THREADS'],
+                          batch_size=current_app.config['BATCH_WRITE_SIZE'],
+                          is_allowed=allowed_file)
+    
+    # The uploads are read while the response streams, after the request itself is closed
+    def generate():
+        try:
+            for result in batch.verify(files, ip_address, user_agent):
+                yield json.dumps(result) + '\n'
+        finally:
+            for buffer in buffers:
+                buffer.close()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @main.route('/dashboard')
 def dashboard():
     """Admin dashboard showing verification statistics"""
     # Get recent verification logs
-    recent_logs = VerificationLog.query.order_by(VerificationLog.created_at.desc()).limit(20).all()
+    recent_logs = read_session.query(VerificationLog).options(joinedload(VerificationLog.matched_certificate)).order_by(VerificationLog.created_at.desc()).limit(20).all()
     
-    # Get verification statistics
-    total_verifications = VerificationLog.query.count()
-    valid_count = VerificationLog.query.filter_by(verification_status='VALID').count()
-    invalid_count = VerificationLog.query.filter_by(verification_status='INVALID').count()
-    suspicious_count = VerificationLog.query.filter_by(verification_status='SUSPICIOUS').count()
+    # Get verification and institution statistics from the pre-aggregated counters
+    stats = read_stats(read_session)
     
     # Get suspicious activities
-    suspicious_activities = SuspiciousActivity.query.filter_by(status='PENDING').order_by(SuspiciousActivity.created_at.desc()).limit(10).all()
-    
-    # Get institution stats
-    total_institutions = Institution.query.count()
-    active_institutions = Institution.query.filter_by(is_active=True).count()
-    
-    stats = {
-        'total_verifications': total_verifications,
-        'valid_count': valid_count,
-        'invalid_count': invalid_count,
-        'suspicious_count': suspicious_count,
-        'total_institutions': total_institutions,
-        'active_institutions': active_institutions
-    }
+    suspicious_activities = read_session.query(SuspiciousActivity).filter_by(status='PENDING').order_by(SuspiciousActivity.created_at.desc()).limit(10).all()
     
     return render_template('dashboard.html', 
                          recent_logs=recent_logs, 
@@ -94,7 +190,7 @@ def dashboard():
 @main.route('/institutions')
 def institutions():
     """List all institutions"""
-    institutions = Institution.query.order_by(Institution.name).all()
+    institutions = read_session.query(Institution).order_by(Institution.name).all()
     return render_template('institutions.html', institutions=institutions)
 
 @main.route('/add_institution', methods=['GET', 'POST'])
@@ -114,6 +210,7 @@ def add_institution():
             
             db.session.add(institution)
             db.session.commit()
+            get_institution_cache().invalidate()
             
             flash('Institution added successfully!', 'success')
             return redirect(url_for('main.institutions'))
@@ -150,6 +247,7 @@ def add_certificate():
             
             db.session.add(certificate)
             db.session.commit()
+            index_certificate(certificate)
             
             flash('Certificate added successfully!', 'success')
             return redirect(url_for('main.certificates'))
@@ -162,55 +260,219 @@ def add_certificate():
 
 @main.route('/certificates')
 def certificates():
-    """List all certificates"""
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    
-    certificates = Certificate.query.join(Institution).order_by(Certificate.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    """List certificates, newest first, a page at a time"""
+    certificates = listing_page(certificate_listing(), Certificate)
     
     return render_template('certificates.html', certificates=certificates)
 
 @main.route('/verification_logs')
 def verification_logs():
-    """List verification logs"""
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    
-    logs = VerificationLog.query.order_by(VerificationLog.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    """List verification logs, newest first, a page at a time"""
+    logs = listing_page(log_listing(), VerificationLog)
     
     return render_template('verification_logs.html', logs=logs)
 
 @main.route('/log/<int:log_id>')
 def view_log(log_id):
-    """View detailed verification log"""
-    log = VerificationLog.query.get_or_404(log_id)
+    """View detailed verification log, from the archive once it has been rotated out"""
+    log = read_session.get(VerificationLog, log_id)
+    if log is None:
+        record = find_archived_log(log_id, read_session)
+        if record is None:
+            abort(404)
+        log = log_from_record(record)
     return render_template('log_detail.html', log=log)
 
 @main.route('/suspicious_activities')
 def suspicious_activities():
-    """List suspicious activities"""
-    activities = SuspiciousActivity.query.order_by(SuspiciousActivity.created_at.desc()).all()
+    """List suspicious activities, newest first, a page at a time"""
+    activities = listing_page(activity_listing(), SuspiciousActivity, per_page=50)
     return render_template('suspicious_activities.html', activities=activities)
 
+@main.route('/api/certificates')
+def api_certificates():
+    """API endpoint listing certificates, newest first; follow next_cursor for more"""
+    page = listing_page(certificate_listing(), Certificate)
+    return listing_json(page, lambda cert: dict(cert.to_dict(), institution_name=cert.institution.name))
+
+@main.route('/api/certificates/import', methods=['POST'])
+def api_import_certificates():
+    """Import a CSV or Excel ledger of certificates, reporting rejected rows.
+    
+    Form fields: ``ledger`` (the file), optional ``institution_code`` for ledgers without
+    that column, ``mode`` (``upsert`` by default, or ``insert``) and ``dry_run=1``.
+    """
+    ledger = request.files.get('ledger')
+    if ledger is None or ledger.filename == '':
+        return jsonify({'status': 'error', 'message': 'No ledger uploaded'}), 400
+    
+    mode = request.form.get('mode', 'upsert')
+    if mode not in ('upsert', 'insert'):
+        return jsonify({'status': 'error', 'message': 'mode must be upsert or insert'}), 400
+    
+    try:
+        records = read_ledger(ledger.stream, ledger.filename)
+        report = import_certificates(records, institution_code=request.form.get('institution_code'),
+                                     update=mode == 'upsert', dry_run=request.form.get('dry_run') == '1',
+                                     chunk_size=current_app.config['REGISTRY_IMPORT_CHUNK_SIZE'])
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': f'Could not import ledger: {str(e)}'}), 400
+    
+    return jsonify(dict(report.to_dict(max_errors=1000), status='success'))
+
+@main.route('/api/verification_logs')
+def api_verification_logs():
+    """API endpoint listing verification logs, newest first; follow next_cursor for more"""
+    return listing_json(listing_page(log_listing(), VerificationLog), VerificationLog.to_dict)
+
+@main.route('/api/verification_logs/<int:log_id>')
+def api_verification_log(log_id):
+    """API endpoint for one verification log, whether still in the table or archived"""
+    log = read_session.get(VerificationLog, log_id)
+    if log is not None:
+        return jsonify(dict(log.to_dict(), archived=False))
+    
+    record = find_archived_log(log_id, read_session)
+    if record is None:
+        return jsonify({'status': 'error', 'message': 'Verification log not found'}), 404
+    return jsonify(archived_log_dict(record))
+
+@main.route('/api/files/<file_hash>/verification_logs')
+def api_file_verification_logs(file_hash):
+    """API endpoint for every verification of a file (by SHA-256), archived ones first"""
+    logs = read_session.query(VerificationLog).filter_by(file_hash=file_hash).order_by(VerificationLog.id).all()
+    return jsonify({
+        'file_hash': file_hash,
+        'items': [archived_log_dict(record) for record in find_archived_logs(file_hash, read_session)] +
+                 [dict(log.to_dict(), archived=False) for log in logs]
+    })
+
+@main.route('/api/files/<file_hash>/submissions')
+def api_file_submissions(file_hash):
+    """API endpoint for how often a file (by SHA-256) was uploaded, when, and from where"""
+    return jsonify(dict(file_submissions(file_hash, read_session), file_hash=file_hash))
+
+@main.route('/api/certificate_claims')
+def api_certificate_claims():
+    """API endpoint for the student names uploads have presented with ?certificate_number="""
+    certificate_number_key = normalize_number(request.args.get('certificate_number'))
+    if not certificate_number_key:
+        return jsonify({'status': 'error', 'message': 'certificate_number is required'}), 400
+    
+    claims = certificate_claims(certificate_number_key, read_session)
+    return jsonify({
+        'certificate_number_key': certificate_number_key,
+        'items': [claim.to_dict() for claim in claims]
+    })
+
+@main.route('/api/suspicious_activities')
+def api_suspicious_activities():
+    """API endpoint listing suspicious activities, newest first, optionally ?status=PENDING"""
+    return listing_json(listing_page(activity_listing(), SuspiciousActivity), SuspiciousActivity.to_dict)
+
+@main.route('/api/suspicious_activities/<int:activity_id>', methods=['POST'])
+def api_update_suspicious_activity(activity_id):
+    """API endpoint recording an investigation: status, and optionally investigated_by and investigation_notes"""
+    data = request.get_json(silent=True) or {}
+    if data.get('status') not in ACTIVITY_STATUSES:
+        return jsonify({'status': 'error', 'message': f"status must be one of {', '.join(ACTIVITY_STATUSES)}"}), 400
+    
+    if not update_activities(data['status'], [activity_id], investigated_by=data.get('investigated_by'),
+                             notes=data.get('investigation_notes')):
+        return jsonify({'status': 'error', 'message': 'Suspicious activity not found'}), 404
+    return jsonify(db.session.get(SuspiciousActivity, activity_id).to_dict())
+
+@main.route('/api/search')
+def api_search():
+    """API endpoint for ranked full-text search over certificates and verification logs.
+    
+    ``q`` is matched word by word against certificate and roll numbers, student and course
+    names (and upload filenames for logs); ``type`` limits it to certificates or logs.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'status': 'error', 'message': 'Missing search query'}), 400
+    
+    sources = {'certificates': Certificate, 'logs': VerificationLog}
+    requested = request.args.get('type', 'all')
+    if requested != 'all' and requested not in sources:
+        return jsonify({'status': 'error', 'message': 'type must be certificates, logs or all'}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    institutions = get_institution_cache()
+    
+    response = {'query': query}
+    for source, model in sources.items():
+        if requested not in ('all', source):
+            continue
+        ranked = search(query, source, limit, read_session)
+        rows = {row.id: row for row in read_session.query(model).filter(model.id.in_([rowid for rowid, _ in ranked]))}
+        
+        items = []
+        for rowid, rank in ranked:
+            row = rows.get(rowid)
+            if row is None:
+                continue  # Removed since it was indexed
+            item = dict(row.to_dict(), rank=round(rank, 4))
+            if model is Certificate:
+                institution = institutions.get(row.institution_id)
+                item['institution_name'] = institution.name if institution else None
+            items.append(item)
+        response[source] = items
+    
+    return jsonify(response)
+
 @main.route('/api/stats')
 def api_stats():
     """API endpoint for verification statistics"""
-    total_verifications = VerificationLog.query.count()
-    valid_count = VerificationLog.query.filter_by(verification_status='VALID').count()
-    invalid_count = VerificationLog.query.filter_by(verification_status='INVALID').count()
-    suspicious_count = VerificationLog.query.filter_by(verification_status='SUSPICIOUS').count()
+    stats = read_stats(read_session)
     
     return jsonify({
-        'total_verifications': total_verifications,
-        'valid_count': valid_count,
-        'invalid_count': invalid_count,
-        'suspicious_count': suspicious_count
+        'total_verifications': stats['total_verifications'],
+        'valid_count': stats['valid_count'],
+        'invalid_count': stats['invalid_count'],
+        'suspicious_count': stats['suspicious_count'],
+        'daily': read_daily_stats(request.args.get('days', 30, type=int), read_session)
     })
 
+@main.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """API endpoint for polling a background verification job"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    
+    return jsonify(job)
+
+@main.route('/api/ocr/stats')
+def api_ocr_stats():
+    """API endpoint for OCR worker pool saturation metrics"""
+    pool = get_ocr_pool()
+    if pool is None:
+        return jsonify({'enabled': False})
+    
+    return jsonify(dict(pool.stats(), enabled=True))
+
+@main.route('/api/cache/stats')
+def api_cache_stats():
+    """API endpoint for verification cache hit and miss counters"""
+    cache = get_verification_cache()
+    if cache is None:
+        return jsonify({'enabled': False})
+    
+    return jsonify(dict(cache.stats(), enabled=True))
+
+@main.route('/metrics')
+def metrics():
+    """Stage latency histograms and verification counters of this process, for Prometheus"""
+    return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@main.route('/healthz/ready')
+def readiness():
+    """Whether this process has finished warming up and should receive traffic"""
+    warm_up = get_warm_up()
+    return jsonify(warm_up.to_dict()), 200 if warm_up.ready() else 503
+
 @main.route('/help')
 def help_page():
     """Help page with usage instructions"""
@@ -0,0 +1,67 @@
+from app import db
+from app.search_index import drop_log_trigger, ensure_search_index, rebuild_search_index, search_enabled
+from sqlalchemy import insert, inspect, text, update
+from sqlalchemy.schema import CreateIndex
+
+# registry_versions counter holding the MATCH_KEYS_VERSION existing certificates were filled in at;
+# raise the version when a match key column is added (2: certificate_serial_key)
+MATCH_KEYS_BACKFILLED = 'match_keys_backfilled'
+MATCH_KEYS_VERSION = 2
+
+def create_schema():
+    """Create missing tables, then bring existing ones up to date"""
+    db.create_all()
+    upgrade_schema()
+
+def upgrade_schema():
+    """Bring existing tables up to date with the models.
+    
+    ``db.create_all()`` only creates missing tables, so nullable columns and indexes
+    added to a model after its table was first created are added here.
+    """
+    inspector = inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    connection.execute(text(
+                        f'ALTER TABLE {preparer.format_table(table)} '
+                        f'ADD COLUMN {preparer.format_column(column)} {column_type}'
+                    ))
+            
+            # Expression indexes are not reflected on every backend, so rely on IF NOT EXISTS
+            for index in table.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+        
+        # Full-text search tables live outside the models (FTS5 or tsvector)
+        search_created = False
+        if search_enabled(connection):
+            search_created = ensure_search_index(connection)
+        else:
+            drop_log_trigger(connection)
+    
+    # Certificates written before the match key columns existed. Every write fills them in
+    # since, so the scan runs once per database and version and is recorded in registry_versions
+    from app.match_keys import backfill_match_keys
+    from app.models import RegistryVersion
+    backfilled = RegistryVersion.current(MATCH_KEYS_BACKFILLED)
+    if backfilled < MATCH_KEYS_VERSION:
+        backfill_match_keys()
+        table = RegistryVersion.__table__
+        if backfilled:
+            statement = update(table).where(table.c.name == MATCH_KEYS_BACKFILLED).values(version=MATCH_KEYS_VERSION)
+        else:
+            statement = insert(table).values(name=MATCH_KEYS_BACKFILLED, version=MATCH_KEYS_VERSION)
+        db.session.execute(statement)
+        db.session.commit()
+    
+    # Index rows written before the search tables existed
+    if search_created:
+        rebuild_search_index()
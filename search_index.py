@@ -0,0 +1,225 @@
+from app.models import Certificate, VerificationLog
+from app import db
+from flask import current_app, has_app_context
+from sqlalchemy import event, text
+import re
+
+# Searchable text of each source, in column order. Certificate and roll numbers rank
+# highest, then names; course names mostly narrow a search down.
+CERTIFICATE_COLUMNS = ['certificate_number', 'roll_number', 'student_name', 'course_name']
+LOG_COLUMNS = ['certificate_number', 'roll_number', 'student_name', 'course', 'uploaded_filename']
+COLUMN_WEIGHTS = {
+    'certificate_number': (10.0, 'A'),
+    'roll_number': (10.0, 'A'),
+    'student_name': (5.0, 'B'),
+    'course_name': (1.0, 'C'),
+    'course': (1.0, 'C'),
+    'uploaded_filename': (1.0, 'D')
+}
+
+SEARCH_TABLES = {'certificates': ('certificate_search', CERTIFICATE_COLUMNS),
+                 'logs': ('log_search', LOG_COLUMNS)}
+
+# Logs are indexed by a trigger inside their own INSERT, so verifications spend no extra
+# statement on it. Each log column is an extracted_data field or a verification_logs column.
+LOG_TRIGGER = 'log_search_indexed'
+LOG_SOURCES = {'certificate_number': ('extracted_data', 'certificate_number'),
+               'roll_number': ('extracted_data', 'roll_number'),
+               'student_name': ('extracted_data', 'student_name'),
+               'course': ('extracted_data', 'course'),
+               'uploaded_filename': ('uploaded_filename', None)}
+
+_TOKEN = re.compile(r'[^\W_]+')
+
+def search_tokens(value):
+    """Lowercase words of a value; punctuation such as the slashes in RU/2023/BSC/001 separates words"""
+    return _TOKEN.findall(value.lower()) if value else []
+
+def _document(value):
+    return ' '.join(search_tokens(value))
+
+def certificate_document(certificate_number, student_roll_number, student_name, course_name):
+    return [_document(certificate_number), _document(student_roll_number), _document(student_name), _document(course_name)]
+
+def log_document(uploaded_filename, extracted_data):
+    extracted = extracted_data or {}
+    return [_document(extracted.get('certificate_number')), _document(extracted.get('roll_number')),
+            _document(extracted.get('student_name')), _document(extracted.get('course')), _document(uploaded_filename)]
+
+def search_backend(bind):
+    """'fts5' on SQLite, 'tsvector' on PostgreSQL, None where full-text search is unsupported"""
+    return {'sqlite': 'fts5', 'postgresql': 'tsvector'}.get(bind.dialect.name)
+
+def search_enabled(bind):
+    if has_app_context() and not current_app.config.get('SEARCH_INDEX_ENABLED', True):
+        return False
+    return search_backend(bind) is not None
+
+def ensure_search_index(connection):
+    """Create the search tables if missing; returns True when they were just created"""
+    backend = search_backend(connection)
+    created = False
+    for table, columns in SEARCH_TABLES.values():
+        if backend == 'fts5':
+            exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': table}).first()
+            if not exists:
+                # Prefix indexes keep type-ahead queries like "pri*" fast
+                connection.execute(text(
+                    f"CREATE VIRTUAL TABLE {table} USING fts5({', '.join(columns)}, "
+                    f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"))
+                created = True
+        elif backend == 'tsvector':
+            exists = connection.execute(text("SELECT to_regclass(:name)"), {'name': table}).scalar()
+            if not exists:
+                connection.execute(text(f"CREATE TABLE {table} (rowid INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)"))
+                connection.execute(text(f"CREATE INDEX ix_{table}_document ON {table} USING GIN (document)"))
+                created = True
+    
+    ensure_log_trigger(connection)
+    return created
+
+def _log_trigger_value(backend, column):
+    """SQL for a log column's searchable text from the NEW row, split into words like search_tokens"""
+    source, field = LOG_SOURCES[column]
+    if backend == 'fts5':
+        # FTS5's unicode61 tokenizer lowercases and splits on punctuation itself
+        return f"json_extract(new.{source}, '$.{field}')" if field else f"new.{source}"
+    
+    value = f"NEW.{source}->>'{field}'" if field else f"NEW.{source}"
+    words = f"regexp_replace(lower(coalesce({value}, '')), '[\\W_]+', ' ', 'g')"
+    return f"setweight(to_tsvector('simple', {words}), '{COLUMN_WEIGHTS[column][1]}')"
+
+def ensure_log_trigger(connection):
+    """Create the trigger indexing each new verification log, if missing"""
+    backend = search_backend(connection)
+    table, columns = SEARCH_TABLES['logs']
+    values = [_log_trigger_value(backend, column) for column in columns]
+    
+    if backend == 'fts5':
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {LOG_TRIGGER} AFTER INSERT ON verification_logs BEGIN "
+            f"INSERT OR REPLACE INTO {table} (rowid, {', '.join(columns)}) VALUES (new.id, {', '.join(values)}); "
+            f"END"))
+    elif backend == 'tsvector':
+        connection.execute(text(
+            f"CREATE OR REPLACE FUNCTION {LOG_TRIGGER}() RETURNS trigger AS $$ BEGIN "
+            f"INSERT INTO {table} (rowid, document) VALUES (NEW.id, {' || '.join(values)}) "
+            f"ON CONFLICT (rowid) DO UPDATE SET document = EXCLUDED.document; "
+            f"RETURN NEW; END $$ LANGUAGE plpgsql"))
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {LOG_TRIGGER} ON verification_logs"))
+        connection.execute(text(
+            f"CREATE TRIGGER {LOG_TRIGGER} AFTER INSERT ON verification_logs "
+            f"FOR EACH ROW EXECUTE FUNCTION {LOG_TRIGGER}()"))
+
+def drop_log_trigger(connection):
+    """Stop indexing new logs, e.g. once SEARCH_INDEX_ENABLED is turned off"""
+    backend = search_backend(connection)
+    if backend == 'fts5':
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {LOG_TRIGGER}"))
+    elif backend == 'tsvector':
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {LOG_TRIGGER} ON verification_logs"))
+
+def index_documents(connection, source, documents):
+    """Add or replace the index entries of (row id, column values) pairs of a source"""
+    if not documents:
+        return
+    backend = search_backend(connection)
+    table, columns = SEARCH_TABLES[source]
+    params = [dict(zip(columns, values), rowid=rowid) for rowid, values in documents]
+    
+    if backend == 'fts5':
+        # FTS5 drops the old terms of a replaced rowid
+        connection.execute(text(
+            f"INSERT OR REPLACE INTO {table} (rowid, {', '.join(columns)}) "
+            f"VALUES (:rowid, {', '.join(':' + c for c in columns)})"), params)
+    elif backend == 'tsvector':
+        vector = ' || '.join(f"setweight(to_tsvector('simple', :{column}), '{COLUMN_WEIGHTS[column][1]}')"
+                             for column in columns)
+        connection.execute(text(
+            f"INSERT INTO {table} (rowid, document) VALUES (:rowid, {vector}) "
+            f"ON CONFLICT (rowid) DO UPDATE SET document = EXCLUDED.document"), params)
+
+def remove_documents(connection, source, rowids):
+    if not rowids or search_backend(connection) is None:
+        return
+    table, _ = SEARCH_TABLES[source]
+    connection.execute(text(f"DELETE FROM {table} WHERE rowid = :rowid"), [{'rowid': rowid} for rowid in rowids])
+
+def unindex_logs(session, log_ids):
+    if search_enabled(session.get_bind()):
+        remove_documents(session.connection(), 'logs', log_ids)
+
+def rebuild_search_index(batch_size=5000):
+    """Re-create every index entry from certificates and verification_logs; returns rows indexed"""
+    connection = db.session.connection()
+    if not search_enabled(connection):
+        return 0
+    
+    indexed = 0
+    for source, model, document in [
+        ('certificates', Certificate, lambda row: certificate_document(
+            row.certificate_number, row.student_roll_number, row.student_name, row.course_name)),
+        ('logs', VerificationLog, lambda row: log_document(row.uploaded_filename, row.extracted_data))
+    ]:
+        table, _ = SEARCH_TABLES[source]
+        connection.execute(text(f"DELETE FROM {table}"))
+        
+        columns = ([Certificate.id, Certificate.certificate_number, Certificate.student_roll_number,
+                    Certificate.student_name, Certificate.course_name] if model is Certificate
+                   else [VerificationLog.id, VerificationLog.uploaded_filename, VerificationLog.extracted_data])
+        last_id = 0
+        while True:
+            rows = db.session.query(*columns).filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            index_documents(connection, source, [(row.id, document(row)) for row in rows])
+            indexed += len(rows)
+            last_id = rows[-1].id
+    
+    db.session.commit()
+    return indexed
+
+def search(query, source, limit=20, session=None):
+    """Row ids of a source matching every word of ``query`` (the last as a prefix), best first.
+    
+    Returns (id, rank) pairs; a higher rank is a better match.
+    """
+    session = session or db.session
+    tokens = search_tokens(query)
+    backend = search_backend(session.get_bind())
+    if not tokens or backend is None:
+        return []
+    table, columns = SEARCH_TABLES[source]
+    
+    if backend == 'fts5':
+        # Every word must match; the last may still be being typed
+        match = ' '.join(f'"{token}"' for token in tokens[:-1]) + f' "{tokens[-1]}"*'
+        weights = ', '.join(str(COLUMN_WEIGHTS[column][0]) for column in columns)
+        rows = session.execute(text(
+            f"SELECT rowid, bm25({table}, {weights}) AS rank FROM {table} "
+            f"WHERE {table} MATCH :match ORDER BY rank LIMIT :limit"), {'match': match, 'limit': limit}).all()
+        # bm25 is lower for better matches
+        return [(rowid, -rank) for rowid, rank in rows]
+    
+    terms = ' & '.join(tokens[:-1] + [f'{tokens[-1]}:*'])
+    rows = session.execute(text(
+        f"SELECT rowid, ts_rank_cd(document, query) AS rank FROM {table}, to_tsquery('simple', :terms) query "
+        f"WHERE document @@ query ORDER BY rank DESC LIMIT :limit"), {'terms': terms, 'limit': limit}).all()
+    return [(rowid, rank) for rowid, rank in rows]
+
+@event.listens_for(Certificate, 'after_insert')
+@event.listens_for(Certificate, 'after_update')
+def _certificate_indexed(mapper, connection, target):
+    if search_enabled(connection):
+        index_documents(connection, 'certificates', [(target.id, certificate_document(
+            target.certificate_number, target.student_roll_number, target.student_name, target.course_name))])
+
+@event.listens_for(Certificate, 'after_delete')
+def _certificate_unindexed(mapper, connection, target):
+    if search_enabled(connection):
+        remove_documents(connection, 'certificates', [target.id])
+
+@event.listens_for(VerificationLog, 'after_delete')
+def _log_unindexed(mapper, connection, target):
+    if search_enabled(connection):
+        remove_documents(connection, 'logs', [target.id])
@@ -5,7 +5,9 @@ for testing the Certificate Verification System MVP
 """
 
 from app import create_app, db
-from app.models import Institution, Certificate
+from app.models import Institution, Certificate, bump_registry_version
+from app.stats import rebuild_counters
+from app.schema import create_schema
 from datetime import date
 import sys
 
@@ -192,9 +194,10 @@ def create_sample_data():
 
 def main():
     """Main function"""
-    app = create_app()
+    app = create_app(warm_up=False)
     
     with app.app_context():
+        create_schema()
         try:
             # Check if data already exists
             if Institution.query.count() > 0 or Certificate.query.count() > 0:
@@ -203,10 +206,13 @@ def main():
                     print("Cancelled.")
                     return
                 
-                # Clear existing data
+                # Clear existing data (bulk deletes skip model events, so update
+                # the registry version and dashboard counters explicitly)
                 Certificate.query.delete()
                 Institution.query.delete()
+                bump_registry_version(db.session.connection())
                 db.session.commit()
+                rebuild_counters()
                 print("Cleared existing sample data.")
             
             create_sample_data()
@@ -22,6 +22,9 @@ if [ ! -f "certificates.db" ]; then
     python setup_sample_data.py
 fi
 
+# Create missing tables and bring existing ones up to date
+python manage.py upgrade-schema
+
 # Start the application
 echo "🚀 Starting application on http://localhost:5000"
 echo "Press Ctrl+C to stop the server"
@@ -0,0 +1,124 @@
+from app.models import StatCounter, Institution, VerificationLog, ArchivedLog
+from app import db
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import event, func, inspect, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+def increment_counters(increments, connection=None):
+    """Add deltas to counters in the current transaction.
+    
+    ``increments`` maps (bucket, metric) to a delta. Counters are upserted so
+    concurrent writers never lose an increment.
+    """
+    increments = {key: delta for key, delta in increments.items() if delta}
+    if not increments:
+        return
+    
+    executor = connection if connection is not None else db.session
+    bind = connection if connection is not None else db.session.get_bind()
+    dialect = bind.dialect.name
+    table = StatCounter.__table__
+    
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        statement = insert(table)
+        # One executemany for all counters, in key order so concurrent writers lock rows alike
+        executor.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.bucket, table.c.metric],
+            set_={'value': table.c.value + statement.excluded.value}
+        ), [{'bucket': bucket, 'metric': metric, 'value': delta}
+            for (bucket, metric), delta in sorted(increments.items())])
+    else:
+        for (bucket, metric), delta in sorted(increments.items()):
+            result = executor.execute(
+                update(table).where(table.c.bucket == bucket, table.c.metric == metric)
+                .values(value=table.c.value + delta)
+            )
+            if result.rowcount == 0:
+                executor.execute(table.insert().values(bucket=bucket, metric=metric, value=delta))
+
+def verification_increments(statuses, day=None):
+    """Counter deltas for a set of verification statuses logged on a day"""
+    day = (day or datetime.utcnow()).strftime('%Y-%m-%d')
+    increments = Counter()
+    for status in statuses:
+        for bucket in ('all', day):
+            increments[(bucket, 'verifications.total')] += 1
+            increments[(bucket, f'verifications.{status}')] += 1
+    return increments
+
+def record_verifications(statuses, day=None):
+    """Count logged verifications in the current transaction"""
+    increment_counters(verification_increments(statuses, day))
+
+@event.listens_for(Institution, 'after_insert')
+def _institution_added(mapper, connection, target):
+    increment_counters({('all', 'institutions.total'): 1,
+                        ('all', 'institutions.active'): 1 if target.is_active is not False else 0}, connection)
+
+@event.listens_for(Institution, 'after_update')
+def _institution_updated(mapper, connection, target):
+    history = inspect(target).attrs.is_active.history
+    if history.has_changes():
+        was_active = bool(history.deleted[0]) if history.deleted else False
+        increment_counters({('all', 'institutions.active'): int(bool(target.is_active)) - int(was_active)}, connection)
+
+@event.listens_for(Institution, 'after_delete')
+def _institution_deleted(mapper, connection, target):
+    increment_counters({('all', 'institutions.total'): -1,
+                        ('all', 'institutions.active'): -1 if target.is_active else 0}, connection)
+
+def read_stats(session=None):
+    """Dashboard statistics in a single query"""
+    session = session or db.session
+    counters = dict(session.query(StatCounter.metric, StatCounter.value).filter_by(bucket='all').all())
+    return {
+        'total_verifications': counters.get('verifications.total', 0),
+        'valid_count': counters.get('verifications.VALID', 0),
+        'invalid_count': counters.get('verifications.INVALID', 0),
+        'suspicious_count': counters.get('verifications.SUSPICIOUS', 0),
+        'error_count': counters.get('verifications.ERROR', 0),
+        'total_institutions': counters.get('institutions.total', 0),
+        'active_institutions': counters.get('institutions.active', 0)
+    }
+
+def read_daily_stats(days=30, session=None):
+    """Per-day verification counts for the most recent days, newest first"""
+    session = session or db.session
+    buckets = [bucket for (bucket,) in session.query(StatCounter.bucket)
+               .filter(StatCounter.bucket != 'all', StatCounter.metric == 'verifications.total')
+               .order_by(StatCounter.bucket.desc()).limit(days)]
+    
+    daily = {bucket: {} for bucket in buckets}
+    if buckets:
+        rows = session.query(StatCounter).filter(StatCounter.bucket.in_(buckets)).all()
+        for row in rows:
+            daily[row.bucket][row.metric.split('.', 1)[1]] = row.value
+    
+    return [dict(daily[bucket], day=bucket) for bucket in buckets]
+
+def rebuild_counters():
+    """Recompute every counter from verification logs (hot and archived) and institutions.
+    
+    Run while no verifications are being written, since it replaces the table.
+    """
+    increments = Counter()
+    
+    for model in (VerificationLog, ArchivedLog):
+        day = func.date(model.created_at)
+        rows = db.session.query(day, model.verification_status, func.count()) \
+            .group_by(day, model.verification_status).all()
+        for log_day, status, count in rows:
+            for bucket in ('all', str(log_day)[:10]):
+                increments[(bucket, 'verifications.total')] += count
+                increments[(bucket, f'verifications.{status}')] += count
+    
+    increments[('all', 'institutions.total')] = Institution.query.count()
+    increments[('all', 'institutions.active')] = Institution.query.filter_by(is_active=True).count()
+    
+    StatCounter.query.delete()
+    increment_counters(increments)
+    db.session.commit()
+    
+    return len(increments)
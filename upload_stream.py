@@ -0,0 +1,49 @@
+from flask import Request, current_app
+from werkzeug.datastructures import iter_multi_items
+import tempfile
+import hashlib
+
+class HashingSpooledFile(tempfile.SpooledTemporaryFile):
+    """Upload buffer that hashes data as it is written.
+    
+    The upload stays in memory and only spills to a temporary file once it grows
+    past ``max_size`` bytes.
+    """
+    
+    def __init__(self, max_size):
+        super().__init__(max_size=max_size, mode='w+b')
+        self.sha256 = hashlib.sha256()
+    
+    def write(self, data):
+        self.sha256.update(data)
+        return super().write(data)
+    
+    @property
+    def file_hash(self):
+        return self.sha256.hexdigest()
+
+class UploadRequest(Request):
+    """Request that receives uploaded files into hashing buffers"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpooledFile(current_app.config.get('UPLOAD_SPOOL_SIZE', 4 * 1024 * 1024))
+    
+    def close(self):
+        # Detached buffers are still being read by a streamed response and are closed by it
+        files = self.__dict__.get('files')
+        for _key, value in iter_multi_items(files or ()):
+            if not getattr(value.stream, 'detached', False):
+                value.close()
+
+def upload_hash(file_storage):
+    """SHA-256 computed while the upload was received, or None if it was not hashed"""
+    return getattr(file_storage.stream, 'file_hash', None)
+
+def detach_upload(file_storage):
+    """Keep an upload's buffer open after the request is closed and return it.
+    
+    Used by streamed responses that read uploads after the view has returned; the
+    caller is responsible for closing the buffer.
+    """
+    file_storage.stream.detached = True
+    return file_storage.stream
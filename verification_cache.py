@@ -0,0 +1,95 @@
+from app.models import VerificationLog
+from collections import OrderedDict
+from flask import current_app, has_app_context
+import threading
+import copy
+
+class VerificationCache:
+    """Verification results keyed by uploaded file hash and registry version.
+    
+    The in-memory tier is an LRU of complete responses. The persistent tier is the
+    verification_logs table: a log for the same file hash written at the same registry
+    version is turned back into a response. Any change to a certificate or institution
+    bumps the registry version, so stale results are never served; they simply stop
+    being looked up and age out of the LRU.
+    """
+    
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+    
+    def get(self, file_hash, registry_version, result_from_log):
+        """Return a cached response (without log_id) or None.
+        
+        ``result_from_log`` rebuilds a response from a VerificationLog for the persistent tier.
+        """
+        key = (file_hash, registry_version)
+        
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.memory_hits += 1
+                return copy.deepcopy(result)
+        
+        log = VerificationLog.query.filter(
+            VerificationLog.file_hash == file_hash,
+            VerificationLog.registry_version == registry_version,
+            VerificationLog.verification_status != 'ERROR'
+        ).order_by(VerificationLog.id.desc()).first()
+        
+        result = result_from_log(log) if log else None
+        with self.lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.persistent_hits += 1
+        
+        self.put(file_hash, registry_version, result)
+        return copy.deepcopy(result)
+    
+    def put(self, file_hash, registry_version, result):
+        """Remember a freshly computed response"""
+        result = copy.deepcopy(result)
+        result.pop('log_id', None)
+        
+        with self.lock:
+            self.entries[(file_hash, registry_version)] = result
+            self.entries.move_to_end((file_hash, registry_version))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def stats(self):
+        """Hit and miss counters for monitoring"""
+        with self.lock:
+            lookups = self.memory_hits + self.persistent_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'memory_hits': self.memory_hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.persistent_hits) / lookups if lookups else 0.0
+            }
+
+_cache_lock = threading.Lock()
+
+def get_verification_cache():
+    """Return the application's verification cache, or None when caching is disabled"""
+    if not has_app_context() or not current_app.config.get('VERIFICATION_CACHE_ENABLED', True):
+        return None
+    
+    cache = current_app.extensions.get('verification_cache')
+    if cache is None:
+        with _cache_lock:
+            cache = current_app.extensions.get('verification_cache')
+            if cache is None:
+                cache = VerificationCache(current_app.config.get('VERIFICATION_CACHE_SIZE', 1024))
+                current_app.extensions['verification_cache'] = cache
+    
+    return cache
@@ -1,35 +1,176 @@
-from app.models import Certificate, Institution, VerificationLog, SuspiciousActivity
+from app.models import Certificate, Institution, VerificationLog, SuspiciousActivity, RegistryVersion
 from app.ocr_utils import DocumentProcessor
+from app.ocr_pool import get_ocr_pool, get_preprocess_options
+from app.name_index import get_name_index, refresh_name_index
+from app.verification_cache import get_verification_cache
+from app.institution_cache import get_institution_cache
+from app.write_behind import get_write_buffer
+from app.stats import record_verifications
+from app.duplicates import record_submissions, files_submissions, certificates_claims, claim_keys
+from app.metrics import stage, trace_stages, record_outcomes, verification_seconds
+from app.match_keys import normalize_text, number_serial, phonetic_key, series_end
 from app import db
-from fuzzywuzzy import fuzz, process
+from flask import current_app, has_app_context
+from fuzzywuzzy import fuzz, process, utils as fuzz_utils
+from sqlalchemy import and_, insert, or_
+from functools import lru_cache
+import numpy as np
 import re
+import threading
 from datetime import datetime
 import os
 
+@lru_cache(maxsize=65536)
+def token_sort_key(text):
+    """The string fuzzywuzzy's token_sort_ratio compares: processed, with tokens sorted"""
+    return " ".join(sorted(fuzz_utils.full_process(text, force_ascii=True).split())).strip()
+
+class ScoringBackend:
+    """Scores one extracted value against a column of candidate strings in one call.
+    
+    Every method returns an integer NumPy array holding, element for element, the
+    score fuzzywuzzy gives that pair, so thresholds behave the same on any backend.
+    """
+    
+    name = None
+    
+    def ratio(self, value, choices):
+        raise NotImplementedError
+    
+    def token_sort_ratio(self, value, choices):
+        raise NotImplementedError
+    
+    def name_similarity(self, value, choices):
+        """Highest of ratio, token sort ratio and partial ratio for each choice"""
+        raise NotImplementedError
+
+class FuzzyWuzzyBackend(ScoringBackend):
+    """Reference backend scoring one pair at a time with fuzzywuzzy"""
+    
+    name = 'fuzzywuzzy'
+    
+    def _scores(self, scorer, value, choices):
+        return np.fromiter((scorer(value, choice) for choice in choices), dtype=np.int64, count=len(choices))
+    
+    def ratio(self, value, choices):
+        return self._scores(fuzz.ratio, value, choices)
+    
+    def token_sort_ratio(self, value, choices):
+        return self._scores(fuzz.token_sort_ratio, value, choices)
+    
+    def name_similarity(self, value, choices):
+        return np.maximum(np.maximum(self.ratio(value, choices), self.token_sort_ratio(value, choices)),
+                          self._scores(fuzz.partial_ratio, value, choices))
+
+class RapidFuzzBackend(ScoringBackend):
+    """Backend scoring a whole column per call with RapidFuzz's cdist.
+    
+    fuzzywuzzy's ratio is 100 * Levenshtein.ratio rounded half to even, and
+    Levenshtein.ratio is RapidFuzz's normalized Indel similarity, so ratio and
+    token sort ratio are reproduced exactly with np.rint.
+    """
+    
+    name = 'rapidfuzz'
+    
+    def __init__(self):
+        from rapidfuzz import fuzz as rapid_fuzz, process as rapid_process
+        from rapidfuzz.distance import Indel
+        
+        self.cdist = rapid_process.cdist
+        self.indel_similarity = Indel.normalized_similarity
+        self.partial_ratio_bound = rapid_fuzz.partial_ratio
+    
+    def _indel(self, value, choices):
+        similarity = self.cdist([value], [choice or '' for choice in choices],
+                                scorer=self.indel_similarity, dtype=np.float64, workers=1)[0]
+        scores = np.rint(100 * similarity).astype(np.int64)
+        
+        # fuzzywuzzy scores a missing value as 0
+        missing = [index for index, choice in enumerate(choices) if choice is None]
+        scores[missing] = 0
+        return scores
+    
+    def ratio(self, value, choices):
+        return self._indel(value, choices)
+    
+    def token_sort_ratio(self, value, choices):
+        return self._indel(token_sort_key(value),
+                           [token_sort_key(choice) if choice is not None else None for choice in choices])
+    
+    def name_similarity(self, value, choices):
+        best = np.maximum(self.ratio(value, choices), self.token_sort_ratio(value, choices))
+        
+        # RapidFuzz's partial_ratio tries every alignment while fuzzywuzzy only tries those
+        # suggested by matching blocks, so it is an upper bound; only the choices where
+        # partial ratio could be the highest score are scored exactly with fuzzywuzzy
+        bound = self.cdist([value], [choice or '' for choice in choices],
+                           scorer=self.partial_ratio_bound, dtype=np.float64, workers=1)[0]
+        for index in np.nonzero(bound > best)[0]:
+            best[index] = max(best[index], fuzz.partial_ratio(value, choices[index]))
+        
+        return best
+
+SCORING_BACKENDS = {
+    'fuzzywuzzy': FuzzyWuzzyBackend,
+    'rapidfuzz': RapidFuzzBackend
+}
+
+_scoring_backends = {}
+
+def get_scoring_backend(name=None):
+    """Return the named scoring backend (SCORING_BACKEND by default), shared per process.
+    
+    Falls back to fuzzywuzzy when RapidFuzz is not installed.
+    """
+    if name is None:
+        name = current_app.config.get('SCORING_BACKEND', 'rapidfuzz') if has_app_context() else 'rapidfuzz'
+    
+    backend = _scoring_backends.get(name)
+    if backend is None:
+        try:
+            backend = SCORING_BACKENDS[name]()
+        except ImportError:
+            print(f"Error loading scoring backend {name}, using fuzzywuzzy")
+            backend = FuzzyWuzzyBackend()
+        _scoring_backends[name] = backend
+    
+    return backend
+
+# Certificate columns score_certificates reads, enough to rank candidates before loading them
+SCORED_COLUMNS = (Certificate.id, Certificate.certificate_number_key, Certificate.student_name,
+                  Certificate.student_name_key, Certificate.roll_number_key, Certificate.course_name,
+                  Certificate.course_name_key, Certificate.passing_year)
+
 class CertificateVerifier:
     """Main verification engine for certificate authenticity"""
     
-    def __init__(self):
-        self.processor = DocumentProcessor()
+    def __init__(self, scoring_backend=None):
+        self.pid = os.getpid()
+        self.processor = DocumentProcessor(ocr_pool=get_ocr_pool(), **get_preprocess_options())
+        self.cache = get_verification_cache()
+        self.institutions = get_institution_cache()
+        self.write_buffer = get_write_buffer(self.record_results)
+        self.scorer = get_scoring_backend(scoring_backend)
         
         # Thresholds for matching
         self.name_threshold = 80  # Fuzzy matching threshold for names
         self.course_threshold = 75  # Fuzzy matching threshold for courses
         self.minimum_confidence = 60  # Minimum confidence for valid certificate
+        
+        # Upper bound on certificates loaded and scored in full per verification, and on
+        # name index hits ranked before that (the hits are ranked by name alone)
+        self.candidate_limit = 200
+        self.name_hit_limit = 5000
     
     def normalize_text(self, text):
-        """Normalize text for better matching"""
-        if not text:
-            return ""
-        
-        # Convert to lowercase and remove extra spaces
-        normalized = re.sub(r'\s+', ' ', text.lower().strip())
-        
-        # Remove common prefixes and suffixes
-        normalized = re.sub(r'^(mr\.?|ms\.?|dr\.?)\s+', '', normalized)
-        normalized = re.sub(r'\s+(jr\.?|sr\.?|ii|iii)$', '', normalized)
-        
-        return normalized
+        """Normalize text for better matching (the same rules as the stored match keys)"""
+        return normalize_text(text)
+    
+    def institution_of(self, cert):
+        """Institution of a certificate from the institution cache instead of a lazy load"""
+        if self.institutions is None:
+            return cert.institution
+        return self.institutions.get(cert.institution_id)
     
     def fuzzy_match_name(self, extracted_name, db_name):
         """Perform fuzzy matching on names"""
@@ -40,7 +181,10 @@ class CertificateVerifier:
         norm_extracted = self.normalize_text(extracted_name)
         norm_db = self.normalize_text(db_name)
         
-        # Calculate similarity score
+        return self.name_similarity(norm_extracted, norm_db)
+    
+    def name_similarity(self, norm_extracted, norm_db):
+        """Similarity of two already normalized names"""
         ratio = fuzz.ratio(norm_extracted, norm_db)
         token_ratio = fuzz.token_sort_ratio(norm_extracted, norm_db)
         partial_ratio = fuzz.partial_ratio(norm_extracted, norm_db)
@@ -60,75 +204,183 @@ class CertificateVerifier:
         # Calculate similarity score
         return fuzz.token_sort_ratio(norm_extracted, norm_db)
     
-    def find_matching_certificates(self, extracted_data):
-        """Find potential matching certificates in the database"""
-        potential_matches = []
+    def extracted_match_keys(self, extracted_data):
+        """Normalize the extracted fields once per document, like the certificates' match keys"""
+        return {
+            'certificate_number': extracted_data['certificate_number'].upper() if 'certificate_number' in extracted_data else None,
+            'roll_number': extracted_data['roll_number'].upper() if 'roll_number' in extracted_data else None,
+            'student_name': self.normalize_text(extracted_data.get('student_name')),
+            'course': self.normalize_text(extracted_data.get('course'))
+        }
+    
+    def find_candidate_certificates(self, extracted_data):
+        """Retrieve a bounded set of candidate certificates through indexed lookups.
         
-        # Get all certificates from database
-        all_certificates = Certificate.query.all()
+        Every block is read in full as the narrow columns scoring needs, and only the
+        candidate_limit best scoring rows are loaded, so a block larger than the limit
+        never loses the certificate a full scan would rank first.
+        """
+        blocks = []
         
-        for cert in all_certificates:
-            match_score = 0
-            match_details = {}
+        # 1. Exact certificate number hits, then the partial matches: other certificates from
+        #    the same series (e.g. RU/2023/BSC/) for OCR errors in the serial, and certificates
+        #    with the same serial in any series for OCR errors in the series (RV/ for RU/)
+        certificate_number = extracted_data.get('certificate_number', '').strip().upper()
+        if certificate_number:
+            cert_number_key = Certificate.certificate_number_key
+            blocks.append(cert_number_key == certificate_number)
             
-            # Check certificate number (exact match preferred)
-            if 'certificate_number' in extracted_data:
-                if extracted_data['certificate_number'].upper() == cert.certificate_number.upper():
-                    match_score += 40  # High weight for exact cert number match
-                    match_details['certificate_number_match'] = 'EXACT'
-                else:
-                    # Partial match for certificate number
-                    partial_score = fuzz.ratio(extracted_data['certificate_number'].upper(), 
-                                             cert.certificate_number.upper())
-                    if partial_score > 80:
-                        match_score += 20
-                        match_details['certificate_number_match'] = 'PARTIAL'
-            
-            # Check student name
-            if 'student_name' in extracted_data:
-                name_score = self.fuzzy_match_name(extracted_data['student_name'], cert.student_name)
-                if name_score > self.name_threshold:
-                    match_score += 25
-                    match_details['name_match_score'] = name_score
-            
-            # Check roll number
-            if 'roll_number' in extracted_data and cert.student_roll_number:
-                if extracted_data['roll_number'].upper() == cert.student_roll_number.upper():
-                    match_score += 20
-                    match_details['roll_number_match'] = 'EXACT'
-            
-            # Check course name
-            if 'course' in extracted_data:
-                course_score = self.fuzzy_match_course(extracted_data['course'], cert.course_name)
-                if course_score > self.course_threshold:
-                    match_score += 15
-                    match_details['course_match_score'] = course_score
+            end = series_end(certificate_number)
+            if end > 0:
+                series = certificate_number[:end + 1]
+                blocks.append(and_(cert_number_key >= series,
+                                   cert_number_key < series[:-1] + chr(ord(series[-1]) + 1)))
+                blocks.append(Certificate.certificate_serial_key == number_serial(certificate_number))
+        
+        # 2. Exact roll number hits
+        roll_number = extracted_data.get('roll_number', '').strip().upper()
+        if roll_number:
+            blocks.append(Certificate.roll_number_key == roll_number)
+        
+        # 3. Name hits from the in-memory trigram index, or failing that a block on name
+        #    tokens or sound. Passing year and course only rank the block: a name and course
+        #    match reaches the minimum score in any year. Without a name, a year block
+        #    cannot reach it, so none is read.
+        if extracted_data.get('student_name') and current_app.config.get('NAME_INDEX_ENABLED', True):
+            name_index = get_name_index(self.normalize_text)
+            hits = name_index.search(extracted_data['student_name'], self.scorer.name_similarity,
+                                     threshold=self.name_threshold, top_k=self.name_hit_limit)
+            if hits:
+                blocks.append(Certificate.id.in_([cert_id for cert_id, _ in hits]))
+        else:
+            student_name_key = self.normalize_text(extracted_data.get('student_name', ''))
+            name_tokens = [token for token in student_name_key.split() if len(token) >= 3]
+            if name_tokens:
+                blocks.append(or_(
+                    Certificate.student_name_phonetic == phonetic_key(student_name_key),
+                    *[Certificate.student_name_key.contains(token, autoescape=True) for token in name_tokens]
+                ))
+        
+        if not blocks:
+            return []
+        
+        # One statement for all blocks; registry order so ties between equal scores resolve as before
+        rows = db.session.query(*SCORED_COLUMNS).filter(or_(*blocks)).order_by(Certificate.id).all()
+        if not rows:
+            return []
+        if len(rows) > self.candidate_limit:
+            scores, _ = self.score_certificates(extracted_data, rows, with_details=False)
+            best = np.argsort(-scores, kind='stable')[:self.candidate_limit]
+            rows = [rows[index] for index in sorted(best)]
+        
+        certs = {cert.id: cert for cert in Certificate.query.filter(Certificate.id.in_([row.id for row in rows]))}
+        return [certs[row.id] for row in rows if row.id in certs]
+    
+    def score_certificate(self, extracted_data, cert, keys=None):
+        """Score a single certificate against the extracted data"""
+        scores, details = self.score_certificates(extracted_data, [cert], keys)
+        return int(scores[0]), details[0]
+    
+    def score_certificates(self, extracted_data, certs, keys=None, minimum_score=None, with_details=True):
+        """Score certificates against the extracted data as arrays.
+        
+        Each field is scored against the whole candidate column with one scoring backend
+        call. ``keys`` are the extracted_match_keys of the document; certificates are
+        compared through their stored match keys, so no row is normalized here.
+        Returns the score array and the match details of each certificate, or None
+        for certificates scoring below ``minimum_score``; with ``with_details=False`` only
+        the scores. Certificates may be any rows carrying the scored columns.
+        """
+        if keys is None:
+            keys = self.extracted_match_keys(extracted_data)
+        
+        count = len(certs)
+        match_score = np.zeros(count, dtype=np.int64)
+        columns = []  # (detail name, mask, value per certificate) in the order details are reported
+        
+        # Check certificate number (exact match preferred)
+        if 'certificate_number' in extracted_data:
+            cert_numbers = [cert.certificate_number_key for cert in certs]
+            exact = np.array([cert_number == keys['certificate_number'] for cert_number in cert_numbers], dtype=bool)
             
-            # Check passing year
-            if 'year' in extracted_data:
-                try:
-                    extracted_year = int(extracted_data['year'])
-                    if extracted_year == cert.passing_year:
-                        match_score += 10
-                        match_details['year_match'] = 'EXACT'
-                    elif abs(extracted_year - cert.passing_year) <= 1:
-                        match_score += 5  # Allow 1 year difference
-                        match_details['year_match'] = 'CLOSE'
-                except ValueError:
-                    pass
+            # Partial match for certificate number
+            partial = ~exact & (self.scorer.ratio(keys['certificate_number'], cert_numbers) > 80)
             
-            # If there's a reasonable match, add to potential matches
-            if match_score >= 30:  # Minimum threshold for consideration
-                potential_matches.append({
-                    'certificate': cert,
-                    'match_score': match_score,
-                    'match_details': match_details
-                })
+            match_score += np.where(exact, 40, np.where(partial, 20, 0))  # High weight for exact cert number match
+            columns.append(('certificate_number_match', exact | partial, np.where(exact, 'EXACT', 'PARTIAL')))
         
-        # Sort by match score (highest first)
-        potential_matches.sort(key=lambda x: x['match_score'], reverse=True)
+        # Check student name
+        if 'student_name' in extracted_data:
+            if extracted_data['student_name']:
+                # Certificates without a name score 0, as in fuzzy_match_name
+                name_score = self.scorer.name_similarity(keys['student_name'],
+                                                         [cert.student_name_key if cert.student_name else None for cert in certs])
+            else:
+                name_score = np.zeros(count, dtype=np.int64)
+            name_match = name_score > self.name_threshold
+            match_score += np.where(name_match, 25, 0)
+            columns.append(('name_match_score', name_match, name_score))
+        
+        # Check roll number
+        if 'roll_number' in extracted_data:
+            roll_match = np.array([bool(cert.roll_number_key) and cert.roll_number_key == keys['roll_number']
+                                   for cert in certs], dtype=bool)
+            match_score += np.where(roll_match, 20, 0)
+            columns.append(('roll_number_match', roll_match, np.full(count, 'EXACT')))
+        
+        # Check course name
+        if 'course' in extracted_data:
+            if extracted_data['course']:
+                course_score = self.scorer.token_sort_ratio(keys['course'],
+                                                            [cert.course_name_key if cert.course_name else None for cert in certs])
+            else:
+                course_score = np.zeros(count, dtype=np.int64)
+            course_match = course_score > self.course_threshold
+            match_score += np.where(course_match, 15, 0)
+            columns.append(('course_match_score', course_match, course_score))
         
-        return potential_matches
+        # Check passing year
+        if 'year' in extracted_data:
+            try:
+                extracted_year = int(extracted_data['year'])
+                year_difference = np.abs(np.array([cert.passing_year for cert in certs], dtype=np.int64) - extracted_year)
+                match_score += np.where(year_difference == 0, 10, np.where(year_difference <= 1, 5, 0))  # Allow 1 year difference
+                columns.append(('year_match', year_difference <= 1, np.where(year_difference == 0, 'EXACT', 'CLOSE')))
+            except ValueError:
+                pass
+        
+        if not with_details:
+            return match_score, None
+        
+        # Only build detail dictionaries for certificates that are reported
+        details = []
+        for index in range(count):
+            if minimum_score is not None and match_score[index] < minimum_score:
+                details.append(None)
+                continue
+            details.append({name: values[index].item() for name, mask, values in columns if mask[index]})
+        
+        return match_score, details
+    
+    def find_matching_certificates(self, extracted_data):
+        """Find potential matching certificates in the database"""
+        # Only score the indexed candidate set instead of the whole registry
+        candidates = self.find_candidate_certificates(extracted_data)
+        if not candidates:
+            return []
+        
+        scores, details = self.score_certificates(extracted_data, candidates, minimum_score=30)
+        
+        # If there's a reasonable match, add to potential matches
+        keep = np.nonzero(scores >= 30)[0]  # Minimum threshold for consideration
+        
+        # Sort by match score (highest first); the stable sort keeps registry order for ties
+        order = keep[np.argsort(-scores[keep], kind='stable')]
+        return [{
+            'certificate': candidates[index],
+            'match_score': int(scores[index]),
+            'match_details': details[index]
+        } for index in order]
     
     def detect_anomalies(self, extracted_data, matched_certificate=None):
         """Detect various types of anomalies in the certificate"""
@@ -168,16 +420,17 @@ class CertificateVerifier:
             cert = matched_certificate['certificate']
             
             # Check if institution is active
-            if not cert.institution.is_active:
+            if not self.institution_of(cert).is_active:
                 flags.append('INACTIVE_INSTITUTION')
             
             # Check for exact matches that should be identical
             if ('certificate_number' in extracted_data and 
-                extracted_data['certificate_number'].upper() == cert.certificate_number.upper()):
+                extracted_data['certificate_number'].upper() == cert.certificate_number_key):
                 
                 # If cert number matches exactly, other details should too
                 if ('student_name' in extracted_data and 
-                    self.fuzzy_match_name(extracted_data['student_name'], cert.student_name) < 95):
+                    (not extracted_data['student_name'] or
+                     self.name_similarity(self.normalize_text(extracted_data['student_name']), cert.student_name_key) < 95)):
                     flags.append('CERT_NUMBER_NAME_MISMATCH')
                 
                 if ('year' in extracted_data and 
@@ -215,37 +468,143 @@ class CertificateVerifier:
         else:
             return 'INVALID', 40
     
-    def verify_certificate(self, file_path, filename, ip_address=None, user_agent=None):
-        """Main verification method"""
+    def build_result(self, verification_status, confidence_score, extracted_data, flags, best_match=None):
+        """Build the verification response (without log_id)"""
+        result = {
+            'status': verification_status,
+            'confidence_score': confidence_score,
+            'extracted_data': extracted_data,
+            'flags': flags
+        }
         
-        try:
-            # Process the document
-            processing_result = self.processor.process_document(file_path, filename)
-            
-            if 'error' in processing_result:
-                # Log error
-                log = VerificationLog(
-                    uploaded_filename=filename,
-                    verification_status='ERROR',
-                    extracted_data={'error': processing_result['error']},
-                    ip_address=ip_address,
-                    user_agent=user_agent
-                )
-                db.session.add(log)
-                db.session.commit()
-                
-                return {
-                    'status': 'ERROR',
-                    'message': 'Failed to process document',
-                    'error': processing_result['error']
-                }
-            
-            extracted_data = processing_result['extracted_data']
-            forgery_flags = processing_result['forgery_flags']
-            
-            # Find matching certificates
+        if best_match:
+            cert = best_match['certificate']
+            result['matched_certificate'] = {
+                'id': cert.id,
+                'certificate_number': cert.certificate_number,
+                'student_name': cert.student_name,
+                'course_name': cert.course_name,
+                'institution_name': self.institution_of(cert).name,
+                'passing_year': cert.passing_year,
+                'match_score': best_match['match_score'],
+                'match_details': best_match['match_details']
+            }
+        
+        return result
+    
+    def result_from_log(self, log):
+        """Rebuild the response for an earlier verification of the same file"""
+        best_match = None
+        if log.matched_certificate_id:
+            cert = db.session.get(Certificate, log.matched_certificate_id)
+            if cert is None:
+                return None
+            match_score, match_details = self.score_certificate(log.extracted_data or {}, cert)
+            best_match = {'certificate': cert, 'match_score': match_score, 'match_details': match_details}
+        
+        return self.build_result(log.verification_status, log.confidence_score,
+                                 log.extracted_data or {}, log.flags or [], best_match)
+    
+    def log_row(self, result, filename, file_hash, registry_version, ip_address=None, user_agent=None):
+        """verification_logs column values for a response"""
+        if result['status'] == 'ERROR':
+            return dict(
+                uploaded_filename=filename,
+                file_hash=file_hash,
+                verification_status='ERROR',
+                extracted_data={'error': result['error']},
+                ip_address=ip_address,
+                user_agent=user_agent,
+                stage_timings=result.get('stage_timings')
+            )
+        
+        return dict(
+            uploaded_filename=filename,
+            file_hash=file_hash,
+            registry_version=registry_version,
+            extracted_data=result['extracted_data'],
+            verification_status=result['status'],
+            confidence_score=result['confidence_score'],
+            matched_certificate_id=result['matched_certificate']['id'] if 'matched_certificate' in result else None,
+            flags=result['flags'],
+            ip_address=ip_address,
+            user_agent=user_agent,
+            stage_timings=result.get('stage_timings')
+        )
+    
+    def record_results(self, entries, ip_address=None, user_agent=None):
+        """Write verification logs and suspicious activities for many responses in one transaction.
+        
+        ``entries`` are (result, filename, file_hash, registry_version) tuples, optionally
+        followed by the entry's own ip_address and user_agent; the responses are returned
+        with their log_id. Logs, activities and counters each take one bulk statement
+        instead of a round trip per ORM object.
+        """
+        rows = []
+        for result, filename, file_hash, registry_version, *client in entries:
+            rows.append(self.log_row(result, filename, file_hash, registry_version,
+                                     *(client or (ip_address, user_agent))))
+        
+        # One batched insert for all logs, returning their IDs in entry order; a trigger
+        # adds them to the search index within the same statement
+        log_ids = db.session.scalars(
+            insert(VerificationLog).returning(VerificationLog.id, sort_by_parameter_order=True), rows
+        ).all()
+        
+        # Create suspicious activity records if needed
+        activities = []
+        for (result, *_), log_id in zip(entries, log_ids):
+            if result['status'] in ['INVALID', 'SUSPICIOUS']:
+                for flag in result['flags']:
+                    activities.append(dict(
+                        verification_log_id=log_id,
+                        activity_type=flag,
+                        description=f"Detected {flag} in certificate verification",
+                        severity='HIGH' if result['status'] == 'INVALID' else 'MEDIUM'
+                    ))
+        
+        # Their IDs are never needed, so all rows go in one executemany
+        if activities:
+            db.session.execute(insert(SuspiciousActivity), activities)
+        
+        # Dashboard counters are updated in the same transaction as the logs
+        record_verifications([result['status'] for result, *_ in entries])
+        if self.duplicate_detection_enabled():
+            record_submissions([(row['file_hash'], row['ip_address'], row['extracted_data'], None) for row in rows])
+        db.session.commit()
+        record_outcomes([result['status'] for result, *_ in entries],
+                        [flag for result, *_ in entries for flag in result.get('flags', [])])
+        
+        return [dict(result, log_id=log_id) for (result, *_), log_id in zip(entries, log_ids)]
+    
+    def record_result(self, result, filename, file_hash, registry_version, ip_address=None, user_agent=None):
+        """Write the verification log and suspicious activities for a response.
+        
+        With the write-behind buffer enabled the entry joins the buffer's next transaction
+        instead (see app.write_behind for when it is durable).
+        """
+        entry = (result, filename, file_hash, registry_version, ip_address, user_agent)
+        if self.write_buffer is not None:
+            return self.write_buffer.record(entry)
+        return self.record_results([entry])[0]
+    
+    def evaluate_document(self, processing_result):
+        """Match processed document data against the registry and build the response"""
+        if 'error' in processing_result:
+            return {
+                'status': 'ERROR',
+                'message': 'Failed to process document',
+                'error': processing_result['error']
+            }
+        
+        extracted_data = processing_result['extracted_data']
+        forgery_flags = processing_result['forgery_flags']
+        
+        # Find matching certificates
+        with stage('match'):
             potential_matches = self.find_matching_certificates(extracted_data)
-            
+        
+        with stage('score'):
             # Detect anomalies
             best_match = potential_matches[0] if potential_matches else None
             anomaly_flags = self.detect_anomalies(extracted_data, best_match)
@@ -255,73 +614,142 @@ class CertificateVerifier:
                 potential_matches, anomaly_flags, forgery_flags
             )
             
-            # Create verification log
-            log = VerificationLog(
-                uploaded_filename=filename,
-                file_hash=processing_result['file_hash'],
-                extracted_data=extracted_data,
-                verification_status=verification_status,
-                confidence_score=confidence_score,
-                matched_certificate_id=best_match['certificate'].id if best_match else None,
-                flags=anomaly_flags + forgery_flags,
-                ip_address=ip_address,
-                user_agent=user_agent
-            )
+            # Prepare response
+            return self.build_result(verification_status, confidence_score, extracted_data,
+                                     anomaly_flags + forgery_flags, best_match)
+    
+    def verify_certificate(self, source, filename, ip_address=None, user_agent=None, file_hash=None):
+        """Main verification method for a file path or binary file object"""
+        
+        with trace_stages() as trace:
+            result = self._verify_certificate(source, filename, ip_address, user_agent, file_hash, trace)
+        
+        verification_seconds.observe(trace.elapsed(), result['status'])
+        return result
+    
+    def with_stage_timings(self, result, trace):
+        """The response with its stage breakdown so far, when logs should carry it"""
+        if has_app_context() and current_app.config.get('METRICS_LOG_STAGE_TIMINGS', False):
+            return dict(result, stage_timings=trace.timings())
+        return result
+    
+    def duplicate_detection_enabled(self):
+        return has_app_context() and current_app.config.get('DUPLICATE_DETECTION_ENABLED', True)
+    
+    def with_submissions(self, result, file_hash):
+        """The response with earlier uploads of the file and conflicting claims on its number.
+        
+        Certificate numbers presented with a student name that would not match the name
+        on this upload are flagged CERT_NUMBER_NAME_CONFLICT; the flag does not change
+        the status. Both answers come from index lookups, not from scanning the logs.
+        """
+        return self.with_submissions_batch([(result, file_hash)])[0]
+    
+    def with_submissions_batch(self, entries):
+        """with_submissions for many (result, file_hash) pairs, with grouped lookups.
+        
+        Three statements at most whatever the number of results. Uploads recorded with the
+        same batch are not seen by each other, as if they had been verified at once.
+        """
+        checked = [(result, file_hash) for result, file_hash in entries if result['status'] != 'ERROR' and file_hash]
+        if not self.duplicate_detection_enabled() or not checked:
+            return [result for result, _ in entries]
+        
+        keys = {id(result): claim_keys(result['extracted_data']) for result, _ in checked}
+        submissions = files_submissions([file_hash for _, file_hash in checked])
+        claims = certificates_claims([key[0] for key in keys.values() if key])
+        
+        answers = []
+        for result, file_hash in entries:
+            if result['status'] == 'ERROR' or not file_hash:
+                answers.append(result)
+                continue
             
-            db.session.add(log)
-            db.session.flush()  # To get the log ID
+            # A cached response carries the flag its first upload was given
+            flags = [flag for flag in result['flags'] if flag != 'CERT_NUMBER_NAME_CONFLICT']
+            conflicts = []
+            key = keys[id(result)]
+            if key and claims.get(key[0]):
+                number_claims = claims[key[0]]
+                scores = self.scorer.name_similarity(key[1], [claim.student_name_key for claim in number_claims])
+                conflicts = [claim for claim, score in zip(number_claims, scores) if score < self.name_threshold]
+            if conflicts:
+                flags.append('CERT_NUMBER_NAME_CONFLICT')
             
-            # Create suspicious activity records if needed
-            if verification_status in ['INVALID', 'SUSPICIOUS']:
-                for flag in anomaly_flags + forgery_flags:
-                    suspicious_activity = SuspiciousActivity(
-                        verification_log_id=log.id,
-                        activity_type=flag,
-                        description=f"Detected {flag} in certificate verification",
-                        severity='HIGH' if verification_status == 'INVALID' else 'MEDIUM'
-                    )
-                    db.session.add(suspicious_activity)
+            answers.append(dict(result, flags=flags, submissions=submissions[file_hash],
+                                conflicting_names=[claim.to_dict() for claim in conflicts]))
+        return answers
+    
+    def sync_registry(self, registry_version):
+        """Bring in-memory registry state up to the version results are cached under"""
+        if self.institutions is not None:
+            self.institutions.all(registry_version)
+        if current_app.config.get('NAME_INDEX_ENABLED', True):
+            refresh_name_index(registry_version)
+    
+    def _verify_certificate(self, source, filename, ip_address, user_agent, file_hash, trace):
+        try:
+            # Uploads are hashed while they are received; other sources are hashed here
+            if file_hash is None:
+                with stage('hash'):
+                    file_hash = self.processor.hash_source(source)
             
-            db.session.commit()
+            # Re-uploads of an already verified file skip OCR and matching entirely
+            with stage('cache_lookup'):
+                registry_version = RegistryVersion.current()
+                cached = None
+                if self.cache is not None:
+                    cached = self.cache.get(file_hash, registry_version, self.result_from_log)
+            if cached is not None:
+                with stage('duplicates'):
+                    cached = self.with_submissions(cached, file_hash)
+                with stage('record'):
+                    return dict(self.record_result(self.with_stage_timings(cached, trace), filename, file_hash,
+                                                   registry_version, ip_address, user_agent), cache_hit=True)
             
-            # Prepare response
-            result = {
-                'status': verification_status,
-                'confidence_score': confidence_score,
-                'extracted_data': extracted_data,
-                'flags': anomaly_flags + forgery_flags,
-                'log_id': log.id
-            }
+            # Process the document and match it against the registry
+            self.sync_registry(registry_version)
+            processing_result = self.processor.process_document(source, filename, file_hash=file_hash)
+            result = self.evaluate_document(processing_result)
             
-            if best_match:
-                cert = best_match['certificate']
-                result['matched_certificate'] = {
-                    'id': cert.id,
-                    'certificate_number': cert.certificate_number,
-                    'student_name': cert.student_name,
-                    'course_name': cert.course_name,
-                    'institution_name': cert.institution.name,
-                    'passing_year': cert.passing_year,
-                    'match_score': best_match['match_score'],
-                    'match_details': best_match['match_details']
-                }
+            if self.cache is not None and result['status'] != 'ERROR':
+                self.cache.put(file_hash, registry_version, result)
             
-            return result
+            # After the cache, which must not hold what later uploads change
+            with stage('duplicates'):
+                result = self.with_submissions(result, file_hash)
+            
+            with stage('record'):
+                return dict(self.record_result(self.with_stage_timings(result, trace), filename, file_hash,
+                                               registry_version, ip_address, user_agent), cache_hit=False)
             
         except Exception as e:
+            db.session.rollback()
+            
             # Log unexpected errors
-            log = VerificationLog(
-                uploaded_filename=filename,
-                verification_status='ERROR',
-                extracted_data={'error': str(e)},
-                ip_address=ip_address,
-                user_agent=user_agent
-            )
-            db.session.add(log)
-            db.session.commit()
+            self.record_result(self.with_stage_timings({'status': 'ERROR', 'error': str(e)}, trace),
+                               filename, file_hash, None, ip_address, user_agent)
             
             return {
                 'status': 'ERROR',
                 'message': 'Unexpected error during verification',
                 'error': str(e)
             }
+
+_verifier_lock = threading.Lock()
+
+def get_verifier():
+    """Return the application's verifier, created once per process and shared by its threads.
+    
+    The verifier keeps no state between verifications. Its OCR pool and write-behind
+    thread do not survive a fork, so a forked worker process builds its own verifier.
+    """
+    verifier = current_app.extensions.get('verifier')
+    if verifier is None or verifier.pid != os.getpid():
+        with _verifier_lock:
+            verifier = current_app.extensions.get('verifier')
+            if verifier is None or verifier.pid != os.getpid():
+                verifier = CertificateVerifier()
+                current_app.extensions['verifier'] = verifier
+    
+    return verifier
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Verify every certificate in a directory and print one JSON result per line
+    
+    python verify_batch.py scans/ > results.ndjson
+"""
+
+from app import create_app
+from app.routes import allowed_file
+from app.batch_verification import BatchVerifier
+import argparse
+import json
+import os
+import sys
+
+def list_files(directory):
+    """All files below a directory, in a stable order"""
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in sorted(names):
+            files.append((name, os.path.join(root, name)))
+    return sorted(files, key=lambda item: item[1])
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Verify all certificates in a directory')
+    parser.add_argument('directory', help='Directory of PDF/PNG/JPG certificates')
+    parser.add_argument('--ocr-threads', type=int, help='Parallel OCR threads (default: BATCH_OCR_THREADS)')
+    parser.add_argument('--batch-size', type=int, help='Logs written per transaction (default: BATCH_WRITE_SIZE)')
+    args = parser.parse_args()
+    
+    if not os.path.isdir(args.directory):
+        print(f"Not a directory: {args.directory}", file=sys.stderr)
+        sys.exit(1)
+    
+    app = create_app(warm_up=False)
+    
+    with app.app_context():
+        batch = BatchVerifier(ocr_threads=args.ocr_threads or app.config['BATCH_OCR_THREADS'],
+                              batch_size=args.batch_size or app.config['BATCH_WRITE_SIZE'],
+                              is_allowed=allowed_file)
+        
+        for result in batch.verify(list_files(args.directory), user_agent='verify_batch.py'):
+            print(json.dumps(result), flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+from flask import current_app
+import gc
+import os
+import threading
+import time
+
+# background: warm up in a thread after start; preload: warm up shared state before
+# create_app returns (gunicorn --preload forks afterwards); lazy: build on first use
+WARMUP_MODES = ('background', 'preload', 'lazy')
+
+# Registry lookup run once so its statements are compiled before the first upload
+SAMPLE_FIELDS = {
+    'certificate_number': 'WARMUP/0000',
+    'student_name': 'Warm Up Sample',
+    'roll_number': 'WARMUP0000',
+    'course': 'Bachelor of Science',
+    'year': '2000'
+}
+
+def _institutions():
+    from app.institution_cache import get_institution_cache
+    get_institution_cache().all()
+
+def _name_index():
+    from app.name_index import get_name_index
+    from app.match_keys import normalize_text
+    if current_app.config.get('NAME_INDEX_ENABLED', True):
+        get_name_index(normalize_text)
+
+def _scoring():
+    from app.verification_engine import get_scoring_backend
+    get_scoring_backend().name_similarity('warm up sample', ['warm up sample', 'sample warm up'])
+
+def _document_processing():
+    from app.ocr_utils import DocumentProcessor
+    from PIL import Image
+    
+    processor = DocumentProcessor()
+    processor.extract_data_patterns('Certificate No: WARMUP/0000\nThis is to certify that Warm Up Sample')
+    processor.preprocess_images([Image.new('L', (256, 256), 255)])
+
+def _verifier():
+    from app.verification_engine import get_verifier
+    get_verifier()
+
+def _match():
+    from app.verification_engine import get_verifier
+    from app import db
+    try:
+        get_verifier().find_matching_certificates(dict(SAMPLE_FIELDS))
+    finally:
+        db.session.rollback()
+
+# Shared state survives a fork copy-on-write; process state (the verifier with its OCR
+# pool and write-behind thread) is started in each worker process
+SHARED_STEPS = [('institutions', _institutions), ('name_index', _name_index), ('scoring', _scoring),
+                ('document_processing', _document_processing)]
+PROCESS_STEPS = [('verifier', _verifier), ('match', _match)]
+
+class WarmUp:
+    """Warm-up of the engine objects of one application, reported by /healthz/ready"""
+    
+    def __init__(self, app, mode='background'):
+        self.app = app
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.shared_ready = False
+        self.pid = None  # Process whose warm-up finished, or is running
+        self.status = 'pending'  # pending, running, ready or failed
+        self.steps = {}  # Step name -> milliseconds
+        self.seconds = None
+        self.error = None
+    
+    def ready(self):
+        return self.mode == 'lazy' or (self.status == 'ready' and self.pid == os.getpid())
+    
+    def run(self, shared_only=False):
+        """Run the remaining steps in this thread; returns whether they all succeeded"""
+        with self.lock:
+            self.pid = os.getpid()
+            self.status = 'running'
+        
+        started = time.perf_counter()
+        steps = [] if self.shared_ready else list(SHARED_STEPS)
+        if not shared_only:
+            steps += PROCESS_STEPS
+        try:
+            with self.app.app_context():
+                for name, step in steps:
+                    step_started = time.perf_counter()
+                    step()
+                    self.steps[name] = round((time.perf_counter() - step_started) * 1000, 3)
+        except Exception as e:
+            print(f"Error warming up: {str(e)}")
+            with self.lock:
+                self.status = 'failed'
+                self.error = str(e)
+            return False
+        
+        with self.lock:
+            self.shared_ready = True
+            self.error = None
+            self.seconds = time.perf_counter() - started
+            self.status = 'pending' if shared_only else 'ready'
+        return True
+    
+    def start(self):
+        """Warm up in a background thread unless this process is ready or already warming up"""
+        with self.lock:
+            if self.mode == 'lazy' or (self.pid == os.getpid() and self.status in ('running', 'ready')):
+                return
+            # The thread runs until this process is ready; run() claims it for this process
+            self.pid = os.getpid()
+            self.status = 'running'
+        threading.Thread(target=self.run, name='warm-up', daemon=True).start()
+    
+    def preload(self):
+        """Build the shared state before workers are forked, so they share it copy-on-write"""
+        if not self.run(shared_only=True):
+            return
+        
+        # Forked workers must open their own database connections
+        with self.app.app_context():
+            from app import db
+            for engine in db.engines.values():
+                engine.dispose()
+        
+        # Keep the collector from touching (and so copying) the preloaded objects in workers
+        gc.freeze()
+    
+    def to_dict(self):
+        with self.lock:
+            ready = self.ready()
+            return {
+                'status': 'ready' if ready else ('failed' if self.status == 'failed' else 'warming_up'),
+                'mode': self.mode,
+                'pid': os.getpid(),
+                'shared_ready': self.shared_ready,
+                'steps': dict(self.steps),
+                'seconds': self.seconds,
+                'error': self.error
+            }
+
+def init_warm_up(app):
+    """Warm the application up as WARMUP_MODE says; call at the end of create_app"""
+    mode = app.config.get('WARMUP_MODE', 'background')
+    if mode not in WARMUP_MODES:
+        raise ValueError(f"Unsupported warm-up mode: {mode}")
+    warm_up = WarmUp(app, mode)
+    app.extensions['warm_up'] = warm_up
+    
+    if warm_up.mode == 'preload':
+        warm_up.preload()
+    elif warm_up.mode == 'background':
+        warm_up.start()
+    return warm_up
+
+def get_warm_up():
+    """Return the application's warm-up, starting this process's part when it has not run yet"""
+    warm_up = current_app.extensions.get('warm_up')
+    if warm_up is None:
+        warm_up = current_app.extensions['warm_up'] = WarmUp(current_app._get_current_object(), 'lazy')
+    elif not warm_up.ready():
+        # Workers forked from a preloaded master start their own verifier here, and a
+        # failed warm-up (say the database was not up yet) is retried
+        warm_up.start()
+    return warm_up
@@ -0,0 +1,161 @@
+from app import db
+from concurrent.futures import Future
+from flask import current_app, has_app_context
+import atexit
+import os
+import threading
+import time
+
+_buffer_lock = threading.Lock()
+
+class WriteBehindBuffer:
+    """Groups the verification logs of many requests into one transaction.
+    
+    Entries are handed to a background thread that writes up to ``batch_size`` of them
+    with one call to ``write`` (CertificateVerifier.record_results). When responses
+    wait for the commit, the thread takes whatever is pending as soon as it is free, so
+    requests arriving during one write share the next transaction. Otherwise it
+    collects entries until the batch is full or the oldest has waited ``flush_interval``
+    seconds.
+    
+    Durability:
+    
+    - ``wait=True`` (group commit): ``record`` blocks until the transaction holding the
+      entry has committed and returns the response with its log_id. An acknowledged
+      verification is exactly as durable as with a commit per request; a request waits
+      for at most the write in progress plus its own batch. If the batch fails, every
+      request in it gets the exception.
+    - ``wait=False``: ``record`` returns at once with ``log_id`` None. Entries are
+      committed within ``flush_interval`` plus the batch write; a crash in that window
+      loses them, and so does a failed batch (the error is printed). ``close()``, also
+      run at interpreter exit, writes whatever is still buffered.
+    """
+    
+    def __init__(self, app, write, batch_size=100, flush_interval=0.05, wait=True):
+        self.app = app
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.wait = wait
+        
+        self.pending = []  # (entry, future) in arrival order
+        self.oldest = None  # monotonic time the oldest pending entry arrived
+        self.condition = threading.Condition()
+        self.closed = False
+        self.pid = os.getpid()
+        
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+        
+        self.thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+    
+    def submit(self, entry):
+        """Queue an entry; the returned future resolves to the recorded response"""
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('Write-behind buffer is closed')
+            if not self.pending:
+                self.oldest = time.monotonic()
+            self.pending.append((entry, future))
+            self.condition.notify()
+        return future
+    
+    def record(self, entry):
+        """Record an entry as described in the class docstring"""
+        future = self.submit(entry)
+        if self.wait:
+            return future.result()
+        return dict(entry[0], log_id=None)
+    
+    def _next_batch(self):
+        """Block until a batch is due; an empty list means the buffer was closed and drained"""
+        with self.condition:
+            while True:
+                if self.pending and (self.wait or self.closed or len(self.pending) >= self.batch_size):
+                    break
+                if self.closed:
+                    return []
+                if self.pending:
+                    remaining = self.oldest + self.flush_interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                else:
+                    self.condition.wait()
+            
+            batch = self.pending[:self.batch_size]
+            self.pending = self.pending[self.batch_size:]
+            self.oldest = time.monotonic() if self.pending else None
+            return batch
+    
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self._write(batch)
+    
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                results = self.write([entry for entry, _ in batch])
+            except Exception as e:
+                db.session.rollback()
+                self.failed += len(batch)
+                print(f"Error writing {len(batch)} buffered verification logs: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+        
+        self.batches += 1
+        self.written += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+    
+    def close(self, timeout=None):
+        """Stop accepting entries and wait until everything buffered is written"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.thread.is_alive() and threading.current_thread() is not self.thread:
+            self.thread.join(timeout)
+    
+    def stats(self):
+        with self.condition:
+            pending = len(self.pending)
+        return {
+            'pending': pending,
+            'batches': self.batches,
+            'written': self.written,
+            'failed': self.failed,
+            'wait': self.wait
+        }
+
+def get_write_buffer(write):
+    """Return the application's write-behind buffer, or None when it is disabled.
+    
+    ``write`` records a list of entries in one transaction; it is only used when the
+    buffer is created.
+    """
+    if not has_app_context() or not current_app.config.get('WRITE_BEHIND_ENABLED', False):
+        return None
+    
+    buffer = current_app.extensions.get('write_behind')
+    # The writer thread does not survive a fork, so a worker process starts its own buffer
+    if buffer is None or buffer.pid != os.getpid():
+        with _buffer_lock:
+            buffer = current_app.extensions.get('write_behind')
+            if buffer is None or buffer.pid != os.getpid():
+                buffer = WriteBehindBuffer(
+                    current_app._get_current_object(), write,
+                    batch_size=current_app.config.get('WRITE_BEHIND_BATCH_SIZE', 100),
+                    flush_interval=current_app.config.get('WRITE_BEHIND_INTERVAL', 0.05),
+                    wait=current_app.config.get('WRITE_BEHIND_WAIT', True)
+                )
+                current_app.extensions['write_behind'] = buffer
+    
+    return buffer